@@ -0,0 +1,163 @@
+"""
+Catálogo compacto de productos (struct-of-arrays)
+Guarda precio, eco-score, nutrición, cantidad, categoría y restricciones
+alimentarias (máscara de bits) en arreglos
+contiguos de NumPy más un índice id -> posición, para que los algoritmos
+trabajen con operaciones vectorizadas y búsquedas O(1)
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+def calculate_nutrition_score(protein: float = 0, calories: float = 0, fat: float = 0) -> float:
+    """
+    Score nutricional simple (0-100) a partir de macronutrientes
+    """
+    score = (protein or 0) * 0.4 + (calories or 0) / 20 - (fat or 0) * 0.3
+    return max(0, min(100, score))
+
+
+class ProductCatalog:
+    """
+    Catálogo de productos en arreglos paralelos.
+    
+    La posición i de cada arreglo corresponde al mismo producto; records[i]
+    es el objeto original (dict o Product) con que se construyó el catálogo.
+    Los productos sin categoría tienen category_code -1.
+    """
+    
+    __slots__ = (
+        "ids", "prices", "eco_scores", "nutrition_scores", "quantities",
+        "total_prices", "total_eco_scores", "total_nutrition",
+        "category_codes", "categories", "dietary_flags", "records", "_index", "_category_index"
+    )
+    
+    def __init__(self, ids: Sequence[int], prices: Sequence[float],
+                 eco_scores: Sequence[float], nutrition_scores: Sequence[float],
+                 quantities: Sequence[int], categories: Sequence[str],
+                 records: Sequence = None, dietary_flags: Sequence[int] = None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.prices = np.asarray(prices, dtype=float)
+        self.eco_scores = np.asarray(eco_scores, dtype=float)
+        self.nutrition_scores = np.asarray(nutrition_scores, dtype=float)
+        self.quantities = np.asarray(quantities, dtype=float)
+        
+        # Totales por producto (considerando cantidad), usados por el optimizador
+        self.total_prices = self.prices * self.quantities
+        self.total_eco_scores = self.eco_scores * self.quantities
+        self.total_nutrition = self.nutrition_scores * self.quantities
+        
+        # Categorías codificadas como enteros
+        self.categories: List[str] = sorted({c for c in categories if c})
+        self._category_index: Dict[str, int] = {c: i for i, c in enumerate(self.categories)}
+        self.category_codes = np.array(
+            [self._category_index[c] if c else -1 for c in categories], dtype=np.int32
+        )
+        
+        # Restricciones alimentarias de cada producto (0 = ninguna conocida)
+        self.dietary_flags = (
+            np.zeros(len(self.ids), dtype=np.int64) if dietary_flags is None
+            else np.asarray(dietary_flags, dtype=np.int64)
+        )
+        
+        self.records = list(records) if records is not None else [None] * len(self.ids)
+        self._index: Dict[int, int] = {int(pid): i for i, pid in enumerate(self.ids)}
+    
+    @classmethod
+    def from_records(cls, records: List[Dict], default_eco_score: float = 50.0) -> "ProductCatalog":
+        """
+        Construye el catálogo desde diccionarios de productos.
+        Usa nutrition_score si el diccionario lo trae (columna guardada) y si
+        no lo calcula desde protein, calories y fat
+        """
+        return cls(
+            ids=[r.get('id', -1) for r in records],
+            prices=[r.get('price', 0) for r in records],
+            eco_scores=[r.get('eco_score', default_eco_score) for r in records],
+            nutrition_scores=[
+                r['nutrition_score'] if 'nutrition_score' in r else
+                calculate_nutrition_score(r.get('protein', 0), r.get('calories', 0), r.get('fat', 0))
+                for r in records
+            ],
+            quantities=[r.get('quantity', 1) for r in records],
+            categories=[r.get('category') or '' for r in records],
+            records=records,
+            dietary_flags=[r.get('dietary_flags') or 0 for r in records]
+        )
+    
+    @classmethod
+    def from_products(cls, products: Iterable) -> "ProductCatalog":
+        """
+        Construye el catálogo desde objetos Product del algoritmo de mochila
+        """
+        products = list(products)
+        return cls(
+            ids=[p.id for p in products],
+            prices=[p.price for p in products],
+            eco_scores=[p.eco_score for p in products],
+            nutrition_scores=[p.nutrition_score for p in products],
+            quantities=[p.quantity for p in products],
+            categories=[p.category or '' for p in products],
+            records=products,
+            dietary_flags=[p.dietary_flags for p in products]
+        )
+    
+    def take(self, positions: Sequence[int], multipliers: Sequence[int] = None,
+             ids: Sequence[int] = None) -> "ProductCatalog":
+        """
+        Nuevo catálogo con las filas indicadas (se permiten repeticiones).
+        multipliers escala la cantidad de cada fila; se usa para representar
+        paquetes de varias unidades de un mismo producto. ids reemplaza los
+        ids de las filas nuevas (por defecto se conservan los originales)
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        quantities = self.quantities[positions]
+        if multipliers is not None:
+            quantities = quantities * np.asarray(multipliers, dtype=float)
+        
+        catalog = object.__new__(ProductCatalog)
+        catalog.ids = self.ids[positions] if ids is None else np.asarray(ids, dtype=np.int64)
+        catalog.prices = self.prices[positions]
+        catalog.eco_scores = self.eco_scores[positions]
+        catalog.nutrition_scores = self.nutrition_scores[positions]
+        catalog.quantities = quantities
+        catalog.total_prices = catalog.prices * quantities
+        catalog.total_eco_scores = catalog.eco_scores * quantities
+        catalog.total_nutrition = catalog.nutrition_scores * quantities
+        # Las categorías conservan sus códigos
+        catalog.category_codes = self.category_codes[positions]
+        catalog.categories = self.categories
+        catalog._category_index = self._category_index
+        catalog.dietary_flags = self.dietary_flags[positions]
+        catalog.records = [self.records[i] for i in positions.tolist()]
+        # Con repeticiones el índice apunta a la primera fila de cada id
+        catalog._index = {}
+        for i, pid in enumerate(catalog.ids.tolist()):
+            catalog._index.setdefault(pid, i)
+        return catalog
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def position(self, product_id: int) -> Optional[int]:
+        """
+        Posición de un producto en el catálogo (O(1)), None si no existe
+        """
+        return self._index.get(product_id)
+    
+    def category_code(self, category: Optional[str]) -> Optional[int]:
+        """
+        Código entero de una categoría; -1 para "sin categoría" y None si no existe
+        """
+        if not category:
+            return -1
+        return self._category_index.get(category)
+    
+    def compatible(self, required_flags: int) -> np.ndarray:
+        """
+        Máscara booleana de los productos que cumplen todas las restricciones
+        alimentarias de required_flags (un AND vectorizado)
+        """
+        return (self.dietary_flags & required_flags) == required_flags
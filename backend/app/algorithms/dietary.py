@@ -0,0 +1,74 @@
+"""
+Restricciones alimentarias como máscara de bits (un bit por restricción)
+Product.dietary_flags guarda las restricciones que cumple cada producto y un
+producto sirve para un pedido si (dietary_flags & pedido) == pedido: un solo
+AND en SQL, en el arreglo del catálogo o por candidato en el índice de sustitutos.
+"""
+
+from typing import Iterable, List
+
+VEGETARIAN = 1
+VEGAN = 2
+GLUTEN_FREE = 4
+
+# Nombres aceptados por la API y en products_chile.json
+DIETARY_RESTRICTIONS = {
+    "vegetarian": VEGETARIAN,
+    "vegan": VEGAN,
+    "gluten_free": GLUTEN_FREE
+}
+
+# Etiquetas de OpenFoodFacts (labels_tags e ingredients_analysis_tags)
+OPENFOODFACTS_TAGS = {
+    "en:vegetarian": VEGETARIAN,
+    "en:vegan": VEGAN,
+    "en:no-gluten": GLUTEN_FREE,
+    "en:gluten-free": GLUTEN_FREE
+}
+
+
+def _implied(flags: int) -> int:
+    """
+    Agrega las restricciones implícitas (lo vegano también es vegetariano)
+    """
+    if flags & VEGAN:
+        flags |= VEGETARIAN
+    return flags
+
+
+def dietary_mask(restrictions: Iterable[str]) -> int:
+    """
+    Máscara de una lista de nombres de restricciones (ver DIETARY_RESTRICTIONS).
+    Lanza ValueError con un nombre desconocido
+    """
+    flags = 0
+    for name in restrictions or ():
+        key = name.strip().lower().replace("-", "_")
+        if key not in DIETARY_RESTRICTIONS:
+            raise ValueError(f"Restricción alimentaria desconocida: {name}")
+        flags |= DIETARY_RESTRICTIONS[key]
+    return _implied(flags)
+
+
+def flags_from_tags(tags: Iterable[str]) -> int:
+    """
+    Máscara a partir de las etiquetas de OpenFoodFacts (se ignoran las demás)
+    """
+    flags = 0
+    for tag in tags or ():
+        flags |= OPENFOODFACTS_TAGS.get(str(tag).lower(), 0)
+    return _implied(flags)
+
+
+def restriction_names(flags: int) -> List[str]:
+    """
+    Nombres de las restricciones encendidas en la máscara
+    """
+    return [name for name, bit in DIETARY_RESTRICTIONS.items() if (flags or 0) & bit]
+
+
+def satisfies(flags: int, required: int) -> bool:
+    """
+    True si la máscara del producto cumple todas las restricciones pedidas
+    """
+    return ((flags or 0) & required) == required
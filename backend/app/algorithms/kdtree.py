@@ -0,0 +1,115 @@
+"""
+Árbol k-d para búsqueda de vecinos más cercanos (distancia euclidiana)
+Se construye una vez sobre un conjunto de puntos (por ejemplo los vectores
+de macronutrientes normalizados de una categoría) y responde consultas k-NN
+recorriendo primero los nodos más cercanos: cada nodo guarda la caja que
+contiene a sus puntos y se descarta cuando la caja está más lejos que el
+k-ésimo vecino encontrado. Las consultas aceptan un filtro por punto, así
+los vecinos que no cumplen (precio, eco-score) no ocupan lugares del k.
+"""
+
+import heapq
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+
+class KDTree:
+    """
+    Árbol k-d en arreglos: order reordena los puntos para que cada nodo
+    cubra un tramo contiguo [start, end). Las hojas tienen a lo más leaf_size
+    puntos; los nodos internos dividen por la mediana de la dimensión más ancha
+    """
+    
+    __slots__ = ("points", "order", "leaf_size", "_start", "_end", "_children", "_lower", "_upper")
+    
+    def __init__(self, points: np.ndarray, leaf_size: int = 16):
+        points = np.asarray(points, dtype=float)
+        self.points = points[:, None] if points.ndim == 1 else points
+        self.order = np.arange(len(self.points))
+        self.leaf_size = max(1, leaf_size)
+        self._start: List[int] = []
+        self._end: List[int] = []
+        self._children: List[Tuple[int, int]] = []
+        self._lower: List[np.ndarray] = []
+        self._upper: List[np.ndarray] = []
+        if len(self.points):
+            self._build()
+    
+    def __len__(self) -> int:
+        return len(self.points)
+    
+    def _add_node(self, start: int, end: int) -> int:
+        members = self.points[self.order[start:end]]
+        self._start.append(start)
+        self._end.append(end)
+        self._children.append((-1, -1))
+        self._lower.append(members.min(axis=0))
+        self._upper.append(members.max(axis=0))
+        return len(self._start) - 1
+    
+    def _build(self):
+        stack = [self._add_node(0, len(self.points))]
+        while stack:
+            node = stack.pop()
+            start, end = self._start[node], self._end[node]
+            widths = self._upper[node] - self._lower[node]
+            if end - start <= self.leaf_size or not widths.any():
+                continue
+            
+            # Mediana de la dimensión más ancha
+            dim = int(np.argmax(widths))
+            segment = self.order[start:end]
+            mid = (end - start) // 2
+            self.order[start:end] = segment[np.argpartition(self.points[segment, dim], mid)]
+            
+            left = self._add_node(start, start + mid)
+            right = self._add_node(start + mid, end)
+            self._children[node] = (left, right)
+            stack.extend((left, right))
+    
+    def _box_distance(self, node: int, point: np.ndarray) -> float:
+        gap = np.maximum(self._lower[node] - point, 0) + np.maximum(point - self._upper[node], 0)
+        return float(np.sqrt(gap @ gap))
+    
+    def query(self, point: np.ndarray, k: int = 1,
+              accept: Optional[Callable[[int], bool]] = None) -> List[Tuple[int, float]]:
+        """
+        Los k puntos más cercanos a point que cumplen accept (índice del
+        punto -> bool), como pares (índice, distancia) de menor a mayor
+        distancia (empates por índice)
+        """
+        if k <= 0 or not len(self.points):
+            return []
+        point = np.asarray(point, dtype=float)
+        
+        # found: max-heap (distancia negada) con los mejores k hasta ahora
+        found: List[Tuple[float, int]] = []
+        pending = [(self._box_distance(0, point), 0)]
+        while pending:
+            bound, node = heapq.heappop(pending)
+            if len(found) == k and bound > -found[0][0]:
+                break
+            
+            left, right = self._children[node]
+            if left >= 0:
+                for child in (left, right):
+                    heapq.heappush(pending, (self._box_distance(child, point), child))
+                continue
+            
+            members = self.order[self._start[node]:self._end[node]]
+            offsets = self.points[members] - point
+            distances = np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
+            for j in np.argsort(distances, kind='stable').tolist():
+                distance = float(distances[j])
+                if len(found) == k and distance > -found[0][0]:
+                    break
+                i = int(members[j])
+                if accept is not None and not accept(i):
+                    continue
+                if len(found) < k:
+                    heapq.heappush(found, (-distance, -i))
+                elif (-distance, -i) > found[0]:
+                    heapq.heapreplace(found, (-distance, -i))
+        
+        return sorted(((-i, -d) for d, i in found), key=lambda pair: (pair[1], pair[0]))
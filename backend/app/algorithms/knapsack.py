@@ -6,12 +6,33 @@ Para optimización de listas de compras considerando:
 - Valor nutricional (maximizar)
 """
 
-from typing import List, Dict, Tuple
-import random
+from typing import List, Dict, Optional, Tuple, Sequence, Union
+import bisect
+import time
+
+import numpy as np
+
+from app.algorithms.catalog import ProductCatalog
+from app.algorithms.local_search import hill_climb
+from app.algorithms.parallel import get_process_pool, get_thread_pool
+from app.algorithms.pruning import prune_candidates
+from app.algorithms.sharding import backtrack_frontiers, frontier_from_table, merge_frontiers
+from app.algorithms.subset_sum import max_spend
+
+# Modos de optimización soportados
+OPTIMIZATION_MODES = ("genetic", "exact", "branch_and_bound", "multiple_choice", "fptas", "sharded")
+
+# Holgura extra de la tabla del modo exacto cuando se guarda para reoptimizar:
+# permite reutilizarla si el presupuesto sube hasta un 25%
+WARM_START_HEADROOM = 0.25
 
 class Product:
+    __slots__ = ("id", "name", "price", "eco_score", "nutrition_score", "quantity", "category",
+                 "dietary_flags")
+    
     def __init__(self, id: int, name: str, price: float, eco_score: float, 
-                 nutrition_score: float, quantity: int = 1, category: str = ''):
+                 nutrition_score: float, quantity: int = 1, category: str = '',
+                 dietary_flags: int = 0):
         self.id = id
         self.name = name
         self.price = price
@@ -19,6 +40,7 @@ class Product:
         self.nutrition_score = nutrition_score
         self.quantity = quantity
         self.category = category
+        self.dietary_flags = dietary_flags
     
     def total_price(self):
         return self.price * self.quantity
@@ -29,6 +51,48 @@ class Product:
     def total_nutrition(self):
         return self.nutrition_score * self.quantity
 
+class SolverState:
+    """
+    Estado de una optimización para reoptimizar en caliente (warm start).
+    Modo "exact": tabla de programación dinámica (dp, keep) sobre los candidatos.
+    Modo "genetic": población final, con una columna por candidato.
+    Con poda guarda además el conjunto de candidatos antes de podar (pool),
+    los que quedaron y la capacidad usada para podar: con el mismo pool y
+    una capacidad menor o igual se reutilizan los mismos candidatos, así la
+    tabla sigue sirviendo aunque la poda dependa del presupuesto.
+    """
+    __slots__ = ("mode", "weights", "candidate_ids", "population",
+                 "table_weights", "table_values", "unit", "capacity", "dp", "keep",
+                 "pool", "pruned_ids", "prune_capacity")
+    
+    def __init__(self, mode: str, weights: Tuple[float, float, float],
+                 candidate_ids: np.ndarray, population: np.ndarray = None,
+                 table_weights: np.ndarray = None, unit: int = 1, capacity: int = 0,
+                 dp: np.ndarray = None, keep: np.ndarray = None,
+                 table_values: np.ndarray = None):
+        self.mode = mode
+        self.weights = weights
+        self.candidate_ids = candidate_ids
+        self.population = population
+        self.table_weights = table_weights
+        self.table_values = table_values
+        self.unit = unit
+        self.capacity = capacity
+        self.dp = dp
+        self.keep = keep
+        self.pool = None
+        self.pruned_ids = None
+        self.prune_capacity = 0.0
+    
+    @property
+    def nbytes(self) -> int:
+        """
+        Memoria aproximada de los arreglos del estado
+        """
+        arrays = (self.candidate_ids, self.population, self.table_weights,
+                  self.table_values, self.dp, self.keep, self.pruned_ids)
+        return sum(array.nbytes for array in arrays if array is not None)
+
 class MultiObjectiveKnapsack:
     def __init__(self, budget: float, eco_weight: float = 0.3, 
                  nutrition_weight: float = 0.2, price_weight: float = 0.5):
@@ -36,6 +100,17 @@ class MultiObjectiveKnapsack:
         self.eco_weight = eco_weight
         self.nutrition_weight = nutrition_weight
         self.price_weight = price_weight
+        # Estado de la última optimización (solo si se pidió keep_state)
+        self.solver_state: Optional[SolverState] = None
+        self.warm_started = False
+        # Candidatos descartados por la poda de la última optimización (None = sin poda)
+        self.pruned: Optional[int] = None
+    
+    def objective_weights(self) -> Tuple[float, float, float]:
+        """
+        Pesos del objetivo (precio, eco-score, nutrición)
+        """
+        return (self.price_weight, self.eco_weight, self.nutrition_weight)
     
     def fitness(self, products: List[Product]) -> float:
         """
@@ -64,152 +139,1437 @@ class MultiObjectiveKnapsack:
         
         return fitness
     
-    def optimize(self, available_products: List[Product], 
+    def batch_fitness(self, selection: np.ndarray, prices: np.ndarray,
+                      eco_scores: np.ndarray, nutrition_scores: np.ndarray,
+                      fixed_totals: Sequence[float] = None) -> np.ndarray:
+        """
+        Fitness de toda una población en una sola multiplicación matriz-vector.
+        
+        selection: matriz (población × productos) booleana o de cantidades
+        prices, eco_scores, nutrition_scores: vectores por producto
+        fixed_totals: (precio, eco, nutrición) sumados de los productos presentes
+                      en todas las soluciones (requeridos)
+        
+        Misma semántica que fitness(): penalización de -1000 si se excede el presupuesto
+        """
+        attributes = np.column_stack([prices, eco_scores, nutrition_scores])
+        totals = np.asarray(selection, dtype=float) @ attributes
+        
+        if fixed_totals is not None:
+            totals += fixed_totals
+        
+        total_price, total_eco, total_nutrition = totals.T
+        
+        price_score = (self.budget - total_price) / self.budget if self.budget > 0 else 0.0
+        fitness = (
+            self.price_weight * price_score +
+            self.eco_weight * total_eco / 100.0 +
+            self.nutrition_weight * total_nutrition / 100.0
+        )
+        
+        return np.where(total_price > self.budget, -1000.0, fitness)
+    
+    def item_value(self, product: Product) -> float:
+        """
+        Aporte de un producto a la calidad de la lista (eco + nutrición),
+        independiente del presupuesto
+        """
+        return (
+            self.eco_weight * product.total_eco_score() / 100.0 +
+            self.nutrition_weight * product.total_nutrition() / 100.0
+        )
+    
+    def item_values(self, catalog: ProductCatalog) -> np.ndarray:
+        """
+        item_value() de todos los productos del catálogo
+        """
+        return (
+            self.eco_weight * catalog.total_eco_scores / 100.0 +
+            self.nutrition_weight * catalog.total_nutrition / 100.0
+        )
+    
+    def fitness_of(self, catalog: ProductCatalog, positions: List[int]) -> float:
+        """
+        fitness() de una solución expresada como posiciones del catálogo
+        """
+        selection = np.zeros((1, len(catalog)), dtype=bool)
+        selection[0, positions] = True
+        return float(self.batch_fitness(
+            selection, catalog.total_prices, catalog.total_eco_scores, catalog.total_nutrition
+        )[0])
+    
+    def optimize(self, available_products: List[Product],
                  required_products: List[Product] = None,
-                 iterations: int = 1000) -> Tuple[List[Product], Dict]:
+                 iterations: int = 1000, mode: str = "genetic",
+                 workers: int = 1, deadline_ms: Optional[float] = None,
+                 category_limit: int = 1, epsilon: float = 0.1, prune: bool = False,
+                 max_candidates: Optional[int] = None,
+                 local_search_ms: Optional[float] = None,
+                 seed: Optional[int] = None) -> Tuple[List[Product], Dict]:
         """
-        Algoritmo genético para optimizar la lista de compras
+        Optimiza la lista de compras
+        mode: "genetic" = algoritmo genético, "exact" = programación dinámica 0/1,
+              "branch_and_bound" = branch-and-bound anytime,
+              "multiple_choice" = a lo más un producto por categoría,
+              "fptas" = aproximación garantizada (1 - epsilon),
+              "sharded" = óptimo exacto resolviendo cada categoría por separado
+        iterations: máximo de generaciones del algoritmo genético
+        workers: islas del algoritmo genético a ejecutar en paralelo (procesos)
+                 o categorías resueltas a la vez en modo "sharded" (hilos)
+        deadline_ms: tiempo máximo del branch-and-bound (retorna el mejor incumbente)
+        category_limit: productos máximos por categoría en modo "multiple_choice"
+        epsilon: tolerancia del modo "fptas" (0 < epsilon < 1)
+        prune / max_candidates: poda de candidatos dominados (ver optimize_catalog)
+        local_search_ms: tiempo máximo de la búsqueda local posterior (None = sin ella)
+        seed: semilla del algoritmo genético (mismo resultado con la misma semilla y workers)
         """
+        if mode not in OPTIMIZATION_MODES:
+            raise ValueError(f"Modo de optimización inválido: {mode}")
+        
         if not available_products:
-            return [], {
-                "total_cost": 0,
-                "eco_score": 0,
-                "savings": self.budget,
-                "total_products": 0,
-                "budget_usage": 0
-            }
+            return [], self._empty_metrics()
         
         # Inicializar productos requeridos
         if required_products is None:
             required_products = []
         
-        # LIMPIAR productos requeridos: mantener solo el mejor de cada categoría
-        cleaned_required = []
-        category_best = {}
-        
-        for p in required_products:
-            category = p.category if p.category else ''
-            if category:
-                if category not in category_best or p.eco_score > category_best[category].eco_score:
-                    category_best[category] = p
-            else:
-                cleaned_required.append(p)
-        
-        # Agregar los mejores de cada categoría
-        cleaned_required.extend(category_best.values())
-        required_products = cleaned_required
-        
-        best_solution = required_products.copy()
-        best_fitness = self.fitness(best_solution)
-        
-        # Algoritmo genético simple
-        for _ in range(iterations):
-            # Crear solución candidata
-            candidate = required_products.copy()
+        catalog = ProductCatalog.from_products(list(required_products) + list(available_products))
+        positions, metrics = self.optimize_catalog(
+            catalog, range(len(required_products)), iterations=iterations, mode=mode,
+            workers=workers, deadline_ms=deadline_ms, category_limit=category_limit,
+            epsilon=epsilon, prune=prune, max_candidates=max_candidates,
+            local_search_ms=local_search_ms, seed=seed
+        )
+        return [catalog.records[i] for i in positions], metrics
+    
+    def optimize_catalog(self, catalog: ProductCatalog, required_positions: Sequence[int] = (),
+                         iterations: int = 1000, mode: str = "genetic",
+                         workers: int = 1, deadline_ms: Optional[float] = None,
+                         max_quantities: Optional[Sequence[int]] = None,
+                         category_limit: int = 1,
+                         category_limits: Optional[Dict[str, int]] = None,
+                         warm_start: Optional[SolverState] = None,
+                         keep_state: bool = False, epsilon: float = 0.1, prune: bool = False,
+                         max_candidates: Optional[int] = None,
+                         local_search_ms: Optional[float] = None,
+                         frontier_cache=None, seed: Optional[int] = None,
+                         dietary_flags: int = 0) -> Tuple[List[int], Dict]:
+        """
+        Optimiza directamente sobre un ProductCatalog.
+        required_positions: posiciones del catálogo que deben estar en la lista
+        max_quantities: unidades máximas por posición del catálogo (None = 1 de cada uno)
+        category_limit / category_limits: productos máximos por categoría en el
+        modo "multiple_choice" (por defecto / por nombre de categoría)
+        warm_start: estado de una optimización anterior (modos "exact" y
+        "genetic"); keep_state guarda el nuevo estado en self.solver_state
+        epsilon: tolerancia del modo "fptas" (0 < epsilon < 1)
+        prune: descarta antes de optimizar los candidatos dominados dentro de su
+        categoría que no pueden estar en el óptimo (las métricas incluyen "pruned")
+        max_candidates: conserva a lo más esa cantidad de candidatos, los de
+        mayor valor por peso (heurístico; implica la poda)
+        local_search_ms: al terminar cualquier modo, busca mejoras locales
+        (agregar, quitar o intercambiar una unidad) durante a lo más ese tiempo;
+        las métricas incluyen "local_search_moves"
+        frontier_cache: caché (con get / put) de fronteras por categoría del
+        modo "sharded"; una frontera se reutiliza mientras los productos de su
+        categoría no cambien
+        seed: semilla del algoritmo genético (None = no determinista)
+        dietary_flags: restricciones alimentarias (ver app/algorithms/dietary.py)
+        que deben cumplir los productos agregados; los requeridos se conservan
+        Retorna las posiciones elegidas y las métricas. Con max_quantities una
+        posición aparece repetida tantas veces como unidades se compran
+        """
+        if mode not in OPTIMIZATION_MODES:
+            raise ValueError(f"Modo de optimización inválido: {mode}")
+        
+        if mode == "fptas" and not 0 < epsilon < 1:
+            raise ValueError("epsilon debe estar entre 0 y 1")
+        
+        if max_candidates is not None and max_candidates < 1:
+            raise ValueError("max_candidates debe ser al menos 1")
+        
+        if local_search_ms is not None and local_search_ms < 0:
+            raise ValueError("local_search_ms no puede ser negativo")
+        
+        self.pruned = None
+        prune = prune or max_candidates is not None
+        required_positions = np.asarray(list(required_positions), dtype=np.int64)
+        required = _clean_required(catalog, required_positions)
+        allowed = catalog.compatible(dietary_flags) if dietary_flags else None
+        candidates = self._candidate_pool(catalog, required_positions, required, allowed)
+        
+        limits = None
+        if mode == "multiple_choice":
+            if max_quantities is not None and np.max(max_quantities, initial=1) > 1:
+                raise ValueError("El modo multiple_choice no soporta cantidades múltiples")
+            limits = self._category_quota(catalog, required, category_limit, category_limits)
+            positions = self._optimize_multiple_choice(
+                catalog, required, required_positions, category_limit, category_limits,
+                prune=prune, max_candidates=max_candidates, allowed=allowed
+            )
+            metrics = self._metrics(catalog, positions)
+            # La búsqueda local parte de todos los no requeridos (respetando los cupos)
+            candidates = np.ones(len(catalog), dtype=bool) if allowed is None else allowed.copy()
+            candidates[required_positions] = False
+            candidates = np.flatnonzero(candidates)
+        else:
+            if prune:
+                units = None if max_quantities is None else np.asarray(max_quantities)[candidates]
+                remaining = self.budget - catalog.total_prices[required].sum()
+                pool = (
+                    catalog.ids[candidates].tobytes(),
+                    None if units is None else np.asarray(units, dtype=np.int64).tobytes(),
+                    max_candidates
+                )
+                if (warm_start is not None and warm_start.pool == pool
+                        and remaining <= warm_start.prune_capacity):
+                    # Los candidatos de la poda guardada (podar con más capacidad deja más)
+                    kept = np.sort(np.array(
+                        [catalog.position(pid) for pid in warm_start.pruned_ids.tolist()], dtype=np.int64
+                    ))
+                    candidates, self.pruned = kept, len(candidates) - len(kept)
+                    prune_capacity = warm_start.prune_capacity
+                else:
+                    # Con keep_state se poda con la holgura de la tabla para que el
+                    # estado sirva también para presupuestos algo mayores
+                    prune_capacity = remaining * (1 + WARM_START_HEADROOM) if keep_state else remaining
+                    candidates, self.pruned = prune_candidates(
+                        catalog, candidates, prune_capacity,
+                        self.item_values(catalog), units=units, max_candidates=max_candidates
+                    )
+            
+            if max_quantities is not None:
+                max_quantities = np.asarray(max_quantities, dtype=np.int64)
+                if max_quantities[candidates].max(initial=1) <= 1 and max_quantities[required].max(initial=1) <= 1:
+                    max_quantities = None
+            
+            positions, metrics = self._dispatch(
+                catalog, required, candidates, mode, iterations, workers, deadline_ms,
+                max_quantities, warm_start, keep_state, epsilon, frontier_cache, seed
+            )
+            # Solo a un estado nuevo: el de warm_start ya está guardado (y
+            # contado por bytes) en la caché de estados y no se modifica
+            if prune and keep_state and self.solver_state is not None and self.solver_state is not warm_start:
+                self.solver_state.pool = pool
+                self.solver_state.pruned_ids = catalog.ids[candidates]
+                self.solver_state.prune_capacity = prune_capacity
+        
+        if local_search_ms:
+            positions, moves = self._local_search(
+                catalog, positions, required, candidates, max_quantities, limits, local_search_ms
+            )
+            if moves:
+                metrics.update(self._metrics(catalog, positions))
+            metrics["local_search_moves"] = moves
+        
+        return positions, metrics
+    
+    def _dispatch(self, catalog: ProductCatalog, required: List[int], candidates: np.ndarray,
+                  mode: str, iterations: int, workers: int, deadline_ms: Optional[float],
+                  max_quantities: Optional[np.ndarray], warm_start: Optional[SolverState],
+                  keep_state: bool, epsilon: float, frontier_cache=None,
+                  seed: Optional[int] = None) -> Tuple[List[int], Dict]:
+        """
+        Ejecuta el modo pedido (salvo "multiple_choice") sobre los candidatos
+        ya filtrados. Con max_quantities usa la mochila acotada
+        """
+        if max_quantities is not None:
+            return self._optimize_bounded(
+                catalog, required, candidates, max_quantities, iterations, mode, workers,
+                deadline_ms=deadline_ms, warm_start=warm_start, keep_state=keep_state,
+                epsilon=epsilon, frontier_cache=frontier_cache, seed=seed
+            )
+        
+        if mode == "exact":
+            positions = self._optimize_exact(catalog, required, candidates, warm_start, keep_state)
+            metrics = self._metrics(catalog, positions)
+            if keep_state:
+                metrics["warm_start"] = self.warm_started
+            return positions, metrics
+        
+        if mode == "branch_and_bound":
+            positions, gap = self._optimize_branch_and_bound(catalog, required, candidates, deadline_ms)
+            metrics = self._metrics(catalog, positions)
+            metrics["optimality_gap"] = round(gap, 6)
+            return positions, metrics
+        
+        if mode == "fptas":
+            positions, gap = self._optimize_fptas(catalog, required, candidates, epsilon)
+            metrics = self._metrics(catalog, positions)
+            metrics["epsilon"] = epsilon
+            metrics["optimality_gap"] = round(gap, 6)
+            return positions, metrics
+        
+        if mode == "sharded":
+            positions, shards, cached = self._optimize_sharded(
+                catalog, required, candidates, workers, frontier_cache
+            )
+            metrics = self._metrics(catalog, positions)
+            metrics["shards"] = shards
+            metrics["cached_shards"] = cached
+            return positions, metrics
+        
+        positions, generations = self._optimize_genetic(
+            catalog, required, candidates, iterations, workers=workers,
+            warm_start=warm_start, keep_state=keep_state, seed=seed
+        )
+        metrics = self._metrics(catalog, positions)
+        metrics["generations"] = generations
+        if keep_state:
+            metrics["warm_start"] = self.warm_started
+        return positions, metrics
+    
+    def _local_search(self, catalog: ProductCatalog, positions: List[int], required: List[int],
+                      candidates: np.ndarray, max_quantities: Optional[np.ndarray],
+                      limits: Optional[np.ndarray], time_limit_ms: float) -> Tuple[List[int], int]:
+        """
+        Post-optimización por búsqueda local (agregar / quitar / intercambiar)
+        sobre la solución de cualquier modo. Los requeridos no se tocan.
+        Retorna las nuevas posiciones (repetidas por unidad) y los movimientos aplicados
+        """
+        if self.budget <= 0:
+            return positions, 0
+        
+        required_set = set(required)
+        fixed = [i for i in positions if i in required_set]
+        chosen = np.array([i for i in positions if i not in required_set], dtype=np.int64)
+        pool = np.union1d(candidates, chosen)
+        units = np.bincount(np.searchsorted(pool, chosen), minlength=len(pool))
+        caps = np.ones(len(pool), dtype=np.int64) if max_quantities is None else max_quantities[pool]
+        
+        prices = catalog.total_prices[pool]
+        gains = self.item_values(catalog)[pool] - self.price_weight * prices / self.budget
+        capacity = self.budget - catalog.total_prices[fixed].sum()
+        codes = catalog.category_codes[pool] if limits is not None else None
+        
+        units, moves = hill_climb(
+            gains, prices, units, np.maximum(caps, units), capacity,
+            codes=codes, limits=limits, time_limit_ms=time_limit_ms
+        )
+        if not moves:
+            return positions, 0
+        return fixed + np.repeat(pool, units).tolist(), moves
+    
+    def sweep_catalog(self, catalog: ProductCatalog, required_positions: Sequence[int],
+                      budgets: Sequence[float]) -> List[Tuple[List[int], Dict]]:
+        """
+        Soluciones exactas para varios presupuestos con una sola tabla de
+        programación dinámica: se construye para el mayor presupuesto y cada
+        presupuesto menor solo elige su gasto óptimo y reconstruye su solución.
+        Retorna (posiciones, métricas) en el mismo orden de budgets
+        """
+        solvers = [
+            MultiObjectiveKnapsack(budget, self.eco_weight, self.nutrition_weight, self.price_weight)
+            for budget in budgets
+        ]
+        required_positions = np.asarray(list(required_positions), dtype=np.int64)
+        required = _clean_required(catalog, required_positions)
+        candidates = self._candidate_pool(catalog, required_positions, required)
+        
+        solutions = [None] * len(solvers)
+        state = None
+        for index in sorted(range(len(solvers)), key=lambda i: -solvers[i].budget):
+            solver = solvers[index]
+            positions = solver._optimize_exact(
+                catalog, required, candidates, warm_start=state, keep_state=True, headroom=0.0
+            )
+            state = solver.solver_state or state
+            solutions[index] = (positions, solver._metrics(catalog, positions))
+        
+        return solutions
+    
+    def _candidate_pool(self, catalog: ProductCatalog, required_positions: np.ndarray,
+                        required: List[int], allowed: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Posiciones de productos que pueden agregarse a la lista: se descartan los
+        requeridos y los que son peores (eco-score) que el requerido de su misma categoría.
+        allowed: máscara de productos permitidos (restricciones alimentarias)
+        """
+        # Mejor eco-score requerido por categoría (la última celda es "sin categoría")
+        required_best = np.full(len(catalog.categories) + 1, -np.inf)
+        for i in required:
+            code = catalog.category_codes[i]
+            if code >= 0:
+                required_best[code] = max(required_best[code], catalog.eco_scores[i])
+        
+        mask = catalog.eco_scores > required_best[catalog.category_codes]
+        if allowed is not None:
+            mask &= allowed
+        mask[required_positions] = False
+        return np.flatnonzero(mask)
+    
+    def _optimize_genetic(self, catalog: ProductCatalog, required: List[int],
+                          candidates: np.ndarray, iterations: int,
+                          workers: int = 1, warm_start: Optional[SolverState] = None,
+                          keep_state: bool = False, seed: Optional[int] = None) -> Tuple[List[int], int]:
+        """
+        Algoritmo genético sobre los candidatos del catálogo.
+        
+        Con workers > 1 se ejecutan varias islas independientes en el pool de
+        procesos compartido, cada una con su propio flujo aleatorio derivado de
+        una SeedSequence. Se conserva la mejor isla (en empate, la de menor
+        índice), por lo que el resultado no depende del orden de ejecución.
+        Con seed la SeedSequence es fija y el resultado es reproducible.
+        
+        Con warm_start la población inicial es la población final anterior,
+        proyectada sobre los candidatos actuales (los productos que ya no son
+        candidatos se quitan y los nuevos parten en 0); como parte cerca del
+        óptimo se detiene tras la mitad de generaciones sin mejora.
+        Retorna la mejor solución y las generaciones usadas por esa isla.
+        """
+        self.warm_started = False
+        capacity = self.budget - catalog.total_prices[required].sum()
+        if capacity < 0 or len(candidates) == 0:
+            return list(required), 0
+        
+        candidate_ids = catalog.ids[candidates]
+        initial_population = None
+        if (warm_start is not None and warm_start.mode == "genetic"
+                and warm_start.weights == self.objective_weights()):
+            _, new_columns, old_columns = np.intersect1d(
+                candidate_ids, warm_start.candidate_ids, assume_unique=True, return_indices=True
+            )
+            # Sin candidatos en común la población guardada no aporta: arranque en frío
+            if len(new_columns):
+                initial_population = np.zeros((len(warm_start.population), len(candidates)), dtype=bool)
+                initial_population[:, new_columns] = warm_start.population[:, old_columns]
+                self.warm_started = True
+        search_options = {"initial_population": initial_population}
+        if initial_population is not None:
+            search_options["stall_generations"] = 25
+        
+        arrays = (
+            catalog.total_prices[candidates],
+            catalog.total_eco_scores[candidates],
+            catalog.total_nutrition[candidates],
+            self.item_values(catalog)[candidates],
+            [
+                catalog.total_prices[required].sum(),
+                catalog.total_eco_scores[required].sum(),
+                catalog.total_nutrition[required].sum()
+            ]
+        )
+        
+        if workers > 1:
+            rngs = [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(workers)]
+            pool = get_process_pool()
+            futures = [
+                pool.submit(
+                    _genetic_search, self.budget, self.objective_weights(), *arrays,
+                    capacity, iterations, rng, **search_options
+                )
+                for rng in rngs
+            ]
+            results = [future.result() for future in futures]
+            # max() conserva el primero en caso de empate
+            best_genome, _, generations, population = max(results, key=lambda result: result[1])
+        else:
+            best_genome, _, generations, population = _genetic_search(
+                self.budget, self.objective_weights(), *arrays,
+                capacity, iterations, np.random.default_rng(seed), **search_options
+            )
+        
+        if keep_state:
+            self.solver_state = SolverState(
+                "genetic", self.objective_weights(), candidate_ids, population=population
+            )
+        
+        return list(required) + candidates[best_genome].tolist(), generations
+    
+    @staticmethod
+    def _tournament(scores: np.ndarray, count: int, rng: np.random.Generator,
+                    size: int = 3) -> np.ndarray:
+        """
+        Selección por torneo: para cada uno de `count` cupos, el mejor de
+        `size` individuos al azar
+        """
+        contestants = rng.integers(0, len(scores), size=(count, size))
+        winners = np.argmax(scores[contestants], axis=1)
+        return contestants[np.arange(count), winners]
+    
+    @staticmethod
+    def _random_population(population_size: int, prices: np.ndarray, capacity: float,
+                           rng: np.random.Generator) -> np.ndarray:
+        """
+        Población inicial: cada individuo agrega productos en su propio orden
+        aleatorio mientras quepan en el presupuesto
+        """
+        population = np.zeros((population_size, len(prices)), dtype=bool)
+        orders = np.argsort(rng.random(population.shape), axis=1)
+        spent = np.zeros(population_size)
+        rows = np.arange(population_size)
+        
+        for column in orders.T:
+            fits = spent + prices[column] <= capacity
+            population[rows[fits], column[fits]] = True
+            spent[fits] += prices[column[fits]]
+        
+        return population
+    
+    @staticmethod
+    def _repair(population: np.ndarray, prices: np.ndarray, capacity: float,
+                repair_order: np.ndarray, fill_order: np.ndarray):
+        """
+        Repara los individuos que exceden el presupuesto quitando los productos
+        de menor densidad, y luego aprovecha el presupuesto sobrante agregando
+        los de mayor densidad que aún quepan. Opera sobre toda la población a la vez.
+        """
+        spent = population.astype(float) @ prices
+        
+        # Quitar, en orden de reparación, productos hasta cubrir el exceso: un
+        # producto se quita si lo acumulado antes de él aún no cubre el exceso
+        excess = spent - capacity
+        over = excess > 0
+        if over.any():
+            ordered = population[over][:, repair_order]
+            ordered_prices = ordered * prices[repair_order]
+            removed_before = np.cumsum(ordered_prices, axis=1) - ordered_prices
+            ordered &= ~(removed_before < excess[over, None])
+            population[np.ix_(over, repair_order)] = ordered
+            spent[over] = ordered.astype(float) @ prices[repair_order]
+        
+        # Solo vale la pena revisar los productos que caben en la mayor holgura
+        slack = capacity - spent.min()
+        for j in fill_order[prices[fill_order] <= slack]:
+            add = ~population[:, j] & (spent + prices[j] <= capacity)
+            population[add, j] = True
+            spent[add] += prices[j]
+    
+    def _optimize_bounded(self, catalog: ProductCatalog, required: List[int],
+                          candidates: np.ndarray, max_quantities: np.ndarray,
+                          iterations: int, mode: str, workers: int,
+                          deadline_ms: Optional[float] = None,
+                          warm_start: Optional[SolverState] = None,
+                          keep_state: bool = False,
+                          epsilon: float = 0.1, frontier_cache=None,
+                          seed: Optional[int] = None) -> Tuple[List[int], Dict]:
+        """
+        Mochila acotada (varias unidades por producto) por división binaria.
+        
+        Cada producto con hasta q unidades se reemplaza por paquetes de
+        1, 2, 4, ..., resto unidades: cualquier cantidad 0..q es una suma única
+        de paquetes, así el problema sigue siendo 0/1 con O(n·log q) ítems
+        (el modo exacto queda en O(n·log q·W) en vez de O(n·q·W)).
+        Los requeridos entran con 1 unidad fija y paquetes para las extra.
+        
+        Cada paquete recibe un id propio (negativo, derivado del id del producto,
+        del número de paquete y de su tamaño) para que el estado guardado para
+        warm start identifique paquetes y no productos.
+        """
+        rows = list(required)
+        sizes = [1] * len(required)
+        piece_ids = [self._piece_id(catalog.ids[pos], 0, 1) for pos in required]
+        extra_units = [(pos, max_quantities[pos] - 1) for pos in required]
+        extra_units += [(pos, max_quantities[pos]) for pos in candidates.tolist()]
+        
+        for pos, units in extra_units:
+            size = 1
+            while units > 0:
+                piece = min(size, units)
+                rows.append(pos)
+                sizes.append(piece)
+                piece_ids.append(self._piece_id(catalog.ids[pos], size.bit_length(), piece))
+                units -= piece
+                size *= 2
+        
+        expanded = catalog.take(rows, sizes, ids=piece_ids)
+        expanded_required = list(range(len(required)))
+        pieces = np.arange(len(required), len(rows), dtype=np.int64)
+        
+        if mode == "exact":
+            chosen = self._optimize_exact(expanded, expanded_required, pieces, warm_start, keep_state)
+        elif mode == "branch_and_bound":
+            chosen, gap = self._optimize_branch_and_bound(expanded, expanded_required, pieces, deadline_ms)
+        elif mode == "fptas":
+            chosen, gap = self._optimize_fptas(expanded, expanded_required, pieces, epsilon)
+        elif mode == "sharded":
+            chosen, shards, cached = self._optimize_sharded(
+                expanded, expanded_required, pieces, workers, frontier_cache
+            )
+        else:
+            chosen, generations = self._optimize_genetic(
+                expanded, expanded_required, pieces, iterations, workers=workers,
+                warm_start=warm_start, keep_state=keep_state, seed=seed
+            )
+        
+        # Volver a posiciones del catálogo original, repetidas por unidad
+        positions = []
+        for row in sorted(chosen):
+            positions.extend([rows[row]] * sizes[row])
+        
+        metrics = self._metrics(catalog, positions)
+        if mode in ("branch_and_bound", "fptas"):
+            metrics["optimality_gap"] = round(gap, 6)
+        if mode == "fptas":
+            metrics["epsilon"] = epsilon
+        elif mode == "sharded":
+            metrics["shards"] = shards
+            metrics["cached_shards"] = cached
+        elif mode == "genetic":
+            metrics["generations"] = generations
+        if keep_state and mode in ("exact", "genetic"):
+            metrics["warm_start"] = self.warm_started
+        return positions, metrics
+    
+    @staticmethod
+    def _piece_id(product_id: int, number: int, size: int) -> int:
+        """
+        Id negativo de un paquete: product_id en los bits altos, luego el
+        tamaño del paquete y su número (0 = unidad fija de un requerido)
+        """
+        return -((int(product_id) << 32) | (int(size) << 6) | number) - 1
+    
+    def _optimize_exact(self, catalog: ProductCatalog, required: List[int],
+                        candidates: np.ndarray, warm_start: Optional[SolverState] = None,
+                        keep_state: bool = False, headroom: Optional[float] = None) -> List[int]:
+        """
+        Mochila 0/1 exacta por programación dinámica sobre unidades enteras de CLP.
+        
+        El fitness es lineal en los productos elegidos:
+            fitness = price_weight * (budget - costo) / budget + sum(item_value)
+        por lo que basta conocer, para cada gasto exacto s, la mayor suma de
+        item_value alcanzable. Se usa un arreglo 1-D que se reescribe por
+        producto (rolling array) y una matriz de bits para reconstruir la solución.
+        
+        La tabla sirve para cualquier presupuesto menor o igual al usado al
+        construirla: con warm_start se reutiliza si los candidatos son los mismos
+        y el nuevo presupuesto cabe. Con keep_state se construye con holgura
+        (headroom, por defecto WARM_START_HEADROOM).
+        """
+        self.warm_started = False
+        remaining = self.budget - catalog.total_prices[required].sum()
+        if remaining < 0:
+            return list(required)
+        
+        values = self.item_values(catalog)
+        prices = catalog.total_prices
+        
+        # Productos sin valor nunca mejoran el fitness; los gratuitos con valor siempre convienen
+        candidates = candidates[values[candidates] > 0]
+        solution = list(required) + candidates[prices[candidates] <= 0].tolist()
+        candidates = candidates[prices[candidates] > 0]
+        
+        weights, unit, capacity = self._integer_weights(prices[candidates], remaining)
+        if headroom is None:
+            headroom = WARM_START_HEADROOM if keep_state else 0.0
+        table_capacity = capacity + int(capacity * headroom)
+        
+        # La tabla guardada sirve si tiene los mismos candidatos (los que caben
+        # en ella) con los mismos pesos y valores con que se construyó
+        state = warm_start
+        self.warm_started = False
+        if (state is not None and state.mode == "exact"
+                and state.weights == self.objective_weights()
+                and state.unit == unit and capacity <= state.capacity):
+            usable = weights <= state.capacity
+            self.warm_started = (
+                np.array_equal(state.candidate_ids, catalog.ids[candidates[usable]])
+                and np.array_equal(state.table_weights, weights[usable])
+                and np.array_equal(state.table_values, values[candidates[usable]])
+            )
+        if self.warm_started:
+            table_capacity = state.capacity
+        
+        fits = weights <= table_capacity
+        candidates, weights = candidates[fits], weights[fits]
+        if len(candidates) == 0 or capacity <= 0:
+            return solution
+        
+        candidate_ids = catalog.ids[candidates]
+        if not self.warm_started:
+            dp, keep = self._exact_table(weights, values[candidates], table_capacity)
+            state = SolverState(
+                "exact", self.objective_weights(), candidate_ids, table_weights=weights,
+                unit=unit, capacity=table_capacity, dp=dp, keep=keep,
+                table_values=values[candidates]
+            )
+        if keep_state:
+            self.solver_state = state
+        
+        spend = self._best_spend(state.dp, capacity, unit)
+        solution.extend(candidates[self._backtrack(state.keep, state.table_weights, spend)].tolist())
+        return solution
+    
+    @staticmethod
+    def _exact_table(weights: np.ndarray, values: np.ndarray,
+                     capacity: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Tabla de la mochila 0/1: dp[s] = mejor suma de valores gastando
+        exactamente s unidades, y keep[i, s] indica si el producto i mejoró dp[s]
+        """
+        dp = np.full(capacity + 1, -np.inf)
+        dp[0] = 0.0
+        keep = np.zeros((len(weights), capacity + 1), dtype=bool)
+        
+        for i, (weight, value) in enumerate(zip(weights.tolist(), values.tolist())):
+            # El lado derecho se calcula con el arreglo anterior, así cada producto se usa una vez
+            candidate = dp[:capacity + 1 - weight] + value
+            improved = candidate > dp[weight:]
+            dp[weight:][improved] = candidate[improved]
+            keep[i, weight:] = improved
+        
+        return dp, keep
+    
+    def _best_spend(self, dp: np.ndarray, capacity: int, unit: int) -> int:
+        """
+        Gasto (en unidades de la tabla, hasta capacity) que maximiza el fitness
+        completo, incluyendo el término de ahorro
+        """
+        spend_penalty = self.price_weight * np.arange(capacity + 1) * unit / self.budget
+        return int(np.argmax(dp[:capacity + 1] - spend_penalty))
+    
+    @staticmethod
+    def _backtrack(keep: np.ndarray, weights: np.ndarray, spend: int) -> List[int]:
+        """
+        Reconstruye desde la matriz de decisiones los productos (índices de la
+        tabla) que suman exactamente spend
+        """
+        chosen = []
+        for i in range(len(weights) - 1, -1, -1):
+            if keep[i, spend]:
+                chosen.append(i)
+                spend -= int(weights[i])
+        return chosen
+    
+    def _optimize_sharded(self, catalog: ProductCatalog, required: List[int],
+                          candidates: np.ndarray, workers: int = 1,
+                          frontier_cache=None) -> Tuple[List[int], int, int]:
+        """
+        Mochila 0/1 exacta resuelta por categorías (ver app.algorithms.sharding):
+        cada categoría (y el grupo sin categoría) construye su frontera
+        gasto/valor con su propia tabla, en paralelo en el pool de hilos si
+        workers > 1, y las fronteras se combinan por elección múltiple.
+        
+        Con frontier_cache la clave de una frontera son los productos de la
+        categoría (ids, precios y valores) y los pesos del objetivo: cualquier
+        cambio en esos productos genera otra clave. Se construye con la
+        holgura de WARM_START_HEADROOM para servir a presupuestos algo mayores.
+        Retorna las posiciones, la cantidad de categorías y cuántas salieron de la caché
+        """
+        remaining = self.budget - catalog.total_prices[required].sum()
+        if remaining < 0:
+            return list(required), 0, 0
+        
+        values = self.item_values(catalog)
+        prices = catalog.total_prices
+        
+        candidates = candidates[values[candidates] > 0]
+        solution = list(required) + candidates[prices[candidates] <= 0].tolist()
+        candidates = candidates[prices[candidates] > 0]
+        
+        weights, unit, capacity = self._integer_weights(prices[candidates], remaining)
+        fits = weights <= capacity
+        candidates, weights = candidates[fits], weights[fits]
+        if len(candidates) == 0 or capacity <= 0:
+            return solution, 0, 0
+        
+        # Los gastos de las fronteras van en CLP para no depender de la unidad global
+        spend_limit = capacity * unit
+        table_limit = spend_limit + int(spend_limit * WARM_START_HEADROOM) if frontier_cache is not None else spend_limit
+        codes = catalog.category_codes[candidates]
+        groups = [np.flatnonzero(codes == code) for code in np.unique(codes).tolist()]
+        
+        def build(members):
+            clp_weights = weights[members] * unit
+            key = None
+            if frontier_cache is not None:
+                key = (
+                    "frontier", self.eco_weight, self.nutrition_weight,
+                    catalog.ids[candidates[members]].tobytes(), clp_weights.tobytes(),
+                    values[candidates[members]].tobytes()
+                )
+                frontier = frontier_cache.get(key)
+                if frontier is not None and frontier.capacity >= spend_limit:
+                    return frontier, True
+            
+            group_unit = max(1, int(np.gcd.reduce(clp_weights)))
+            group_weights = clp_weights // group_unit
+            dp, keep = self._exact_table(group_weights, values[candidates[members]], table_limit // group_unit)
+            frontier = frontier_from_table(dp, keep, group_weights, group_unit)
+            if key is not None:
+                frontier_cache.put(key, frontier)
+            return frontier, False
+        
+        if workers > 1 and len(groups) > 1:
+            built = list(get_thread_pool().map(build, groups))
+        else:
+            built = [build(members) for members in groups]
+        frontiers = [frontier for frontier, _ in built]
+        
+        dp, choice = merge_frontiers(frontiers, unit, capacity)
+        spend = self._best_spend(dp, capacity, unit)
+        for g, point in backtrack_frontiers(frontiers, choice, unit, spend):
+            solution.extend(candidates[groups[g][frontiers[g].members(point)]].tolist())
+        
+        return solution, len(groups), sum(cached for _, cached in built)
+    
+    def _category_quota(self, catalog: ProductCatalog, required: List[int],
+                        category_limit: int = 1,
+                        category_limits: Optional[Dict[str, int]] = None) -> np.ndarray:
+        """
+        Cupos por código de categoría descontando los requeridos
+        """
+        limits = np.full(len(catalog.categories), category_limit, dtype=np.int64)
+        for category, limit in (category_limits or {}).items():
+            code = catalog.category_code(category)
+            if code is not None and code >= 0:
+                limits[code] = limit
+        for i in required:
+            if catalog.category_codes[i] >= 0:
+                limits[catalog.category_codes[i]] -= 1
+        return limits
+    
+    def _optimize_multiple_choice(self, catalog: ProductCatalog, required: List[int],
+                                  required_positions: np.ndarray,
+                                  category_limit: int = 1,
+                                  category_limits: Optional[Dict[str, int]] = None,
+                                  prune: bool = False,
+                                  max_candidates: Optional[int] = None,
+                                  allowed: Optional[np.ndarray] = None) -> List[int]:
+        """
+        Mochila de elección múltiple: el catálogo se agrupa por categoría y en
+        cada grupo se eligen a lo más k productos (k = 0, 1, ...), contando los
+        requeridos de la categoría. Los productos sin categoría no tienen límite.
+        
+        Programación dinámica por grupos sobre unidades enteras de CLP:
+        layers[j][s] = mejor suma de item_value eligiendo j productos del grupo
+        actual y gastando exactamente s. Con k = 1 cuesta O(total_productos·W).
+        
+        prune: además de la poda por presupuesto, descarta los productos con al
+        menos k dominadores en su grupo (nunca entran en el óptimo)
+        allowed: máscara de productos permitidos (restricciones alimentarias)
+        """
+        remaining = self.budget - catalog.total_prices[required].sum()
+        if remaining < 0:
+            return list(required)
+        
+        values = self.item_values(catalog)
+        prices = catalog.total_prices
+        
+        limits = self._category_quota(catalog, required, category_limit, category_limits)
+        
+        candidates = np.ones(len(catalog), dtype=bool) if allowed is None else allowed.copy()
+        candidates[required_positions] = False
+        candidates = np.flatnonzero(candidates & (values > 0))
+        if prune:
+            candidates, self.pruned = prune_candidates(
+                catalog, candidates, remaining, values, limits=limits, max_candidates=max_candidates
+            )
+        weights, unit, capacity = self._integer_weights(prices[candidates], remaining)
+        fits = weights <= capacity
+        candidates, weights = candidates[fits], weights[fits]
+        solution = list(required)
+        if len(candidates) == 0 or capacity < 0:
+            return solution
+        
+        codes = catalog.category_codes[candidates]
+        groups = []
+        for code in np.unique(codes).tolist():
+            members = np.flatnonzero(codes == code)
+            limit = len(members) if code < 0 else max(0, min(int(limits[code]), len(members)))
+            if limit > 0:
+                groups.append((members, limit))
+        
+        dp = np.full(capacity + 1, -np.inf)
+        dp[0] = 0.0
+        history = []
+        
+        for members, limit in groups:
+            # Sin restricción efectiva basta una capa (mochila 0/1 dentro del grupo)
+            unlimited = limit >= len(members)
+            layer_count = 1 if unlimited else limit
+            layers = [dp] + [np.full(capacity + 1, -np.inf) for _ in range(layer_count)]
+            if unlimited:
+                layers[1] = dp.copy()
+            keep = np.zeros((len(members), layer_count + 1, capacity + 1), dtype=bool)
             
-            # Obtener categorías de productos requeridos para evitar duplicados de menor calidad
-            required_categories = {}
-            for p in required_products:
-                category = p.category if p.category else ''
-                if category and (category not in required_categories or p.eco_score > required_categories[category]):
-                    required_categories[category] = p.eco_score
+            for m, member in enumerate(members.tolist()):
+                weight, value = int(weights[member]), float(values[candidates[member]])
+                for j in range(layer_count, 0, -1):
+                    # Capa j: viene de la capa j-1 antes de este producto (o de sí misma si no hay límite)
+                    source = layers[j] if unlimited else layers[j - 1]
+                    candidate = source[:capacity + 1 - weight] + value
+                    improved = candidate > layers[j][weight:]
+                    layers[j][weight:][improved] = candidate[improved]
+                    keep[m, j, weight:] = improved
+            
+            stacked = np.vstack(layers)
+            chosen_layer = np.argmax(stacked, axis=0)
+            dp = stacked[chosen_layer, np.arange(capacity + 1)]
+            history.append((members, unlimited, keep, chosen_layer))
+        
+        # Gasto que maximiza el fitness completo (incluye el término de ahorro)
+        spend_penalty = self.price_weight * np.arange(capacity + 1) * unit / self.budget
+        spend = int(np.argmax(dp - spend_penalty))
+        
+        # Backtracking grupo por grupo (en orden inverso)
+        for members, unlimited, keep, chosen_layer in reversed(history):
+            j = int(chosen_layer[spend])
+            for m in range(len(members) - 1, -1, -1):
+                if j == 0:
+                    break
+                if keep[m, j, spend]:
+                    member = members[m]
+                    solution.append(int(candidates[member]))
+                    spend -= int(weights[member])
+                    if not unlimited:
+                        j -= 1
+        
+        return solution
+    
+    def _integer_weights(self, prices: np.ndarray, remaining: float) -> Tuple[np.ndarray, int, int]:
+        """
+        Pesos enteros en CLP para la programación dinámica (redondeando hacia
+        arriba para no exceder el presupuesto), reducidos por su máximo común
+        divisor para achicar la tabla. Retorna pesos, unidad y capacidad
+        """
+        weights = np.ceil(prices).astype(np.int64)
+        unit = max(1, int(np.gcd.reduce(weights))) if len(weights) else 1
+        return weights // unit, unit, int(remaining) // unit
+    
+    def _optimize_fptas(self, catalog: ProductCatalog, required: List[int],
+                        candidates: np.ndarray, epsilon: float = 0.1) -> Tuple[List[int], float]:
+        """
+        Esquema de aproximación totalmente polinomial (FPTAS) sobre el aporte
+        lineal de cada producto (item_value - price_weight * precio / budget).
+        
+        Los aportes se escalan por K = epsilon * LB / n, con LB una cota
+        inferior (greedy o el mejor producto individual, LB >= OPT / 2), y se
+        resuelve dp[v] = menor costo para alcanzar el valor escalado v. Como
+        OPT <= 2·LB la tabla tiene a lo más 2n/epsilon columnas: O(n²/epsilon).
+        El error de redondeo es a lo más n·K <= epsilon·OPT.
+        
+        Retorna las posiciones y la brecha alcanzada respecto a la mejor cota
+        superior conocida (relajación fraccional o valor / (1 - epsilon)),
+        en la misma escala que optimality_gap de branch_and_bound
+        """
+        remaining = self.budget - catalog.total_prices[required].sum()
+        if remaining < 0:
+            return list(required), 0.0
+        
+        prices = catalog.total_prices
+        gains = self.item_values(catalog) - self.price_weight * prices / self.budget
+        
+        # Solo interesan productos que mejoran el fitness; los gratuitos se toman siempre
+        candidates = candidates[gains[candidates] > 0]
+        solution = list(required) + candidates[prices[candidates] <= 0].tolist()
+        candidates = candidates[(prices[candidates] > 0) & (prices[candidates] <= remaining)]
+        
+        base_fitness = self.fitness_of(catalog, solution)
+        if len(candidates) == 0:
+            return solution, 0.0
+        
+        # Orden por densidad: cota inferior greedy y cota superior fraccional
+        order = candidates[np.argsort(-gains[candidates] / prices[candidates], kind='stable')]
+        weights, values = prices[order], gains[order]
+        lower_bound = max(self._greedy_value(weights, values, remaining), values.max())
+        upper_bound = self._fractional_bound(weights, values, remaining)
+        
+        n = len(order)
+        scale = epsilon * lower_bound / n
+        scaled = np.floor(values / scale).astype(np.int64)
+        columns = int(upper_bound / scale) + 1
+        
+        # dp[v] = menor costo para sumar exactamente v en valor escalado.
+        # keep guarda una fila de bits empaquetados por producto (8x menos memoria)
+        dp = np.full(columns + 1, np.inf)
+        dp[0] = 0.0
+        keep = []
+        in_table = np.flatnonzero(scaled > 0)
+        for i in in_table.tolist():
+            shift = int(scaled[i])
+            candidate = dp[:columns + 1 - shift] + weights[i]
+            improved = candidate < dp[shift:]
+            dp[shift:][improved] = candidate[improved]
+            keep.append(np.packbits(np.concatenate([np.zeros(shift, dtype=bool), improved])))
+        
+        # Mayor valor escalado que cabe en el presupuesto y reconstrucción
+        value = int(np.flatnonzero(dp <= remaining).max())
+        chosen = np.zeros(n, dtype=bool)
+        for row in range(len(in_table) - 1, -1, -1):
+            if value == 0:
+                break
+            if (keep[row][value >> 3] >> (7 - (value & 7))) & 1:
+                item = in_table[row]
+                chosen[item] = True
+                value -= int(scaled[item])
+        
+        # Los productos de aporte menor a K quedan fuera de la tabla: completar en orden de densidad
+        spent = weights[chosen].sum()
+        for i in np.flatnonzero(~chosen).tolist():
+            if spent + weights[i] <= remaining:
+                chosen[i] = True
+                spent += weights[i]
+        
+        solution.extend(order[chosen].tolist())
+        found = float(values[chosen].sum())
+        upper = base_fitness + min(upper_bound, found / (1 - epsilon))
+        lower = base_fitness + found
+        gap = (upper - lower) / abs(upper) if upper else 0.0
+        return solution, max(0.0, gap)
+    
+    @staticmethod
+    def _greedy_value(weights: np.ndarray, values: np.ndarray, capacity: float) -> float:
+        """
+        Valor del greedy por densidad (los productos vienen ordenados):
+        agrega cada producto que todavía quepa
+        """
+        spent, total = 0.0, 0.0
+        for weight, value in zip(weights.tolist(), values.tolist()):
+            if spent + weight <= capacity:
+                spent += weight
+                total += value
+        return total
+    
+    @staticmethod
+    def _fractional_bound(weights: np.ndarray, values: np.ndarray, capacity: float) -> float:
+        """
+        Cota de Dantzig (relajación fraccional) con los productos ordenados por densidad
+        """
+        prefix_weights = np.cumsum(weights)
+        whole = int(np.searchsorted(prefix_weights, capacity, side='right'))
+        bound = float(values[:whole].sum())
+        if whole < len(weights):
+            used = prefix_weights[whole - 1] if whole else 0.0
+            bound += values[whole] * (capacity - used) / weights[whole]
+        return bound
+    
+    def _optimize_branch_and_bound(self, catalog: ProductCatalog, required: List[int],
+                                   candidates: np.ndarray,
+                                   deadline_ms: Optional[float] = None) -> Tuple[List[int], float]:
+        """
+        Branch-and-bound anytime para la mochila 0/1 con presupuesto real (sin
+        discretizar precios).
+        
+        Con el presupuesto fijo el fitness es lineal: cada producto aporta
+        item_value - price_weight * precio / budget. Los productos se ordenan por
+        densidad (aporte / precio) y cada nodo se acota con la relajación
+        fraccional (cota de Dantzig), calculada en O(log n) con sumas prefijas.
+        
+        Si se alcanza deadline_ms se retorna la mejor solución encontrada
+        (incumbente) junto a su brecha de optimalidad relativa:
+            (cota superior - fitness incumbente) / cota superior
+        Retorna las posiciones elegidas y la brecha (0.0 = óptimo demostrado)
+        """
+        start = time.perf_counter()
+        remaining = self.budget - catalog.total_prices[required].sum()
+        if remaining < 0:
+            return list(required), 0.0
+        
+        prices = catalog.total_prices
+        gains = self.item_values(catalog) - self.price_weight * prices / self.budget
+        
+        # Solo interesan productos que mejoran el fitness; los gratuitos se toman siempre
+        candidates = candidates[gains[candidates] > 0]
+        solution = list(required) + candidates[prices[candidates] <= 0].tolist()
+        candidates = candidates[(prices[candidates] > 0) & (prices[candidates] <= remaining)]
+        
+        base_fitness = self.fitness_of(catalog, solution)
+        if len(candidates) == 0:
+            return solution, 0.0
+        
+        # Orden por densidad descendente
+        order = candidates[np.argsort(-gains[candidates] / prices[candidates], kind='stable')]
+        weights = prices[order].tolist()
+        values = gains[order].tolist()
+        n = len(order)
+        prefix_weights = [0.0] + np.cumsum(weights).tolist()
+        prefix_values = [0.0] + np.cumsum(values).tolist()
+        
+        def upper_bound(level: int, value: float, weight: float) -> float:
+            # Relajación fraccional: productos enteros mientras quepan y una fracción del siguiente
+            room = remaining - weight
+            last = bisect.bisect_right(prefix_weights, prefix_weights[level] + room, lo=level) - 1
+            bound = value + prefix_values[last] - prefix_values[level]
+            if last < n:
+                bound += values[last] * (room - (prefix_weights[last] - prefix_weights[level])) / weights[last]
+            return bound
+        
+        # Incumbente inicial: greedy por densidad
+        best_value, best_chosen = 0.0, None
+        weight = 0.0
+        for i in range(n):
+            if weight + weights[i] <= remaining:
+                weight += weights[i]
+                best_value += values[i]
+                best_chosen = (i, best_chosen)
+        
+        # DFS explícita; cada nodo guarda su cota para poder calcular la brecha si se corta.
+        # Los elegidos se guardan como lista enlazada (índice, padre) para no copiar
+        deadline = start + deadline_ms / 1000.0 if deadline_ms is not None else None
+        stack = [(upper_bound(0, 0.0, 0.0), 0, 0.0, 0.0, None)]
+        nodes = 0
+        
+        while stack:
+            bound, level, value, weight, chosen = stack.pop()
+            if bound <= best_value + 1e-12:
+                continue
             
-            # Agregar productos aleatorios que no excedan presupuesto
-            available = [p for p in available_products if p not in candidate]
-            random.shuffle(available)
+            nodes += 1
+            if deadline is not None and nodes % 256 == 0 and time.perf_counter() >= deadline:
+                stack.append((bound, level, value, weight, chosen))
+                break
             
-            for product in available:
-                # Evitar agregar productos de la misma categoría con peor eco-score
-                product_category = product.category if product.category else ''
-                if product_category and product_category in required_categories:
-                    if product.eco_score <= required_categories[product_category]:
-                        continue  # Skip productos peores de la misma categoría
-                
-                temp_solution = candidate + [product]
-                total_cost = sum(p.total_price() for p in temp_solution)
-                
-                if total_cost <= self.budget:
-                    candidate.append(product)
-                    # Actualizar la mejor opción de esta categoría
-                    if product_category and (product_category not in required_categories or product.eco_score > required_categories[product_category]):
-                        required_categories[product_category] = product.eco_score
+            if level == n:
+                best_value, best_chosen = value, chosen
+                continue
             
-            # Evaluar fitness
-            candidate_fitness = self.fitness(candidate)
+            # Rama "no tomar" (se explora después)
+            skip_bound = upper_bound(level + 1, value, weight)
+            if skip_bound > best_value + 1e-12:
+                stack.append((skip_bound, level + 1, value, weight, chosen))
             
-            # Actualizar mejor solución
-            if candidate_fitness > best_fitness:
-                best_solution = candidate
-                best_fitness = candidate_fitness
-        
-        # Calcular métricas finales
-        total_cost = sum(p.total_price() for p in best_solution)
-        total_eco = sum(p.total_eco_score() for p in best_solution)
+            # Rama "tomar" (se explora primero)
+            if weight + weights[level] <= remaining:
+                take_value = value + values[level]
+                take_chosen = (level, chosen)
+                if take_value > best_value:
+                    best_value, best_chosen = take_value, take_chosen
+                stack.append((bound, level + 1, take_value, weight + weights[level], take_chosen))
+        
+        while best_chosen is not None:
+            index, best_chosen = best_chosen
+            solution.append(int(order[index]))
+        
+        # Brecha de optimalidad con la mayor cota entre los nodos abiertos
+        open_bound = max((node[0] for node in stack), default=best_value)
+        upper = base_fitness + max(open_bound, best_value)
+        lower = base_fitness + best_value
+        gap = (upper - lower) / abs(upper) if upper else 0.0
+        return solution, max(0.0, gap)
+    
+    def _empty_metrics(self) -> Dict:
+        return {
+            "total_cost": 0,
+            "eco_score": 0,
+            "savings": self.budget,
+            "total_products": 0,
+            "budget_usage": 0
+        }
+    
+    def _metrics(self, catalog: ProductCatalog, positions: List[int]) -> Dict:
+        """
+        Calcula métricas finales de una solución
+        """
+        total_cost = float(catalog.total_prices[positions].sum())
+        total_eco = float(catalog.total_eco_scores[positions].sum())
         savings = self.budget - total_cost
         
         metrics = {
             "total_cost": round(total_cost, 2),
-            "eco_score": round(total_eco / len(best_solution) if best_solution else 0, 2),
+            "eco_score": round(total_eco / len(positions) if positions else 0, 2),
             "savings": round(savings, 2),
-            "total_products": len(best_solution),
+            "total_products": len(positions),
             "budget_usage": round((total_cost / self.budget) * 100, 2) if self.budget > 0 else 0
         }
+        if self.pruned is not None:
+            metrics["pruned"] = self.pruned
         
-        return best_solution, metrics
+        return metrics
 
-def optimize_shopping_list(products: List[Dict], budget: float, 
-                          required_product_ids: List[int] = None) -> Dict:
+def _genetic_search(budget: float, weights: Tuple[float, float, float],
+                    prices: np.ndarray, eco_scores: np.ndarray,
+                    nutrition_scores: np.ndarray, values: np.ndarray,
+                    fixed_totals: Sequence[float], capacity: float,
+                    iterations: int, rng: np.random.Generator,
+                    population_size: int = 40,
+                    stall_generations: int = 50,
+                    initial_population: Optional[np.ndarray] = None
+                    ) -> Tuple[np.ndarray, float, int, np.ndarray]:
     """
-    Función helper para optimizar lista de compras
+    Algoritmo genético con población codificada como máscara de bits:
+    selección por torneo, cruce uniforme, mutación, reparación de soluciones
+    que exceden el presupuesto y elitismo.
+    
+    Es una función de módulo para que cada isla del pool de procesos reciba
+    solo el presupuesto, los pesos (precio, eco-score, nutrición) y los
+    arreglos, y no el optimizador con su estado.
+    iterations es el máximo de generaciones; la búsqueda se detiene antes si
+    el mejor fitness no mejora durante stall_generations generaciones.
+    initial_population (opcional) reemplaza a la población aleatoria inicial.
+    Retorna la mejor máscara, su fitness, las generaciones efectivamente
+    usadas y la población final.
     """
-    # Convertir diccionarios a objetos Product
-    product_objects = []
-    for p in products:
-        # Calcular score nutricional simple
-        nutrition_score = (
-            (p.get('protein', 0) * 0.4) +
-            (p.get('calories', 0) / 20) -
-            (p.get('fat', 0) * 0.3)
-        )
-        nutrition_score = max(0, min(100, nutrition_score))
-        
-        product_objects.append(
-            Product(
-                id=p['id'],
-                name=p['name'],
-                price=p['price'],
-                eco_score=p.get('eco_score', 50.0),
-                nutrition_score=nutrition_score,
-                quantity=p.get('quantity', 1),
-                category=p.get('category', '')
-            )
-        )
+    price_weight, eco_weight, nutrition_weight = weights
+    optimizer = MultiObjectiveKnapsack(budget, eco_weight, nutrition_weight, price_weight)
+    n = len(prices)
+    
+    def evaluate(population):
+        return optimizer.batch_fitness(population, prices, eco_scores, nutrition_scores, fixed_totals)
     
-    # Separar productos requeridos
-    required = []
-    available = []
+    # Orden de reparación: se quitan primero los de menor valor por peso y se
+    # agregan primero los de mayor, solo si su valor supera lo que su precio
+    # le resta al término de ahorro (si no, conviene dejar presupuesto sin gastar)
+    density = values / np.maximum(prices, 1e-9)
+    repair_order = np.argsort(density)
+    net_gain = values - (price_weight * prices / budget if budget > 0 else 0.0)
+    fill_order = repair_order[::-1][net_gain[repair_order[::-1]] > 0]
     
-    if required_product_ids:
-        for p in product_objects:
-            if p.id in required_product_ids:
-                required.append(p)
-            else:
-                available.append(p)
-    else:
-        available = product_objects
+    population = optimizer._random_population(population_size, prices, capacity, rng)
+    if initial_population is not None:
+        # Se reparan por si el presupuesto bajó o cambiaron los candidatos
+        warm = initial_population[:population_size].copy()
+        optimizer._repair(warm, prices, capacity, repair_order, fill_order)
+        population[:len(warm)] = warm
+    scores = evaluate(population)
+    
+    best = int(np.argmax(scores))
+    best_genome = population[best].copy()
+    best_fitness = scores[best]
+    
+    elite = max(1, population_size // 20)
+    n_children = population_size - elite
+    mutation_rate = 1.0 / n
+    stall = 0
+    generations = 0
+    
+    while generations < iterations and stall < stall_generations:
+        generations += 1
+        
+        # Elitismo: los mejores pasan directo a la siguiente generación
+        elites = population[np.argsort(scores)[::-1][:elite]]
+        
+        parents_a = population[optimizer._tournament(scores, n_children, rng)]
+        parents_b = population[optimizer._tournament(scores, n_children, rng)]
+        
+        # Cruce uniforme + mutación por inversión de bits
+        children = np.where(rng.random((n_children, n)) < 0.5, parents_a, parents_b)
+        children ^= rng.random((n_children, n)) < mutation_rate
+        
+        optimizer._repair(children, prices, capacity, repair_order, fill_order)
+        
+        population = np.concatenate([elites, children])
+        scores = evaluate(population)
+        
+        generation_best = int(np.argmax(scores))
+        if scores[generation_best] > best_fitness + 1e-12:
+            best_genome = population[generation_best].copy()
+            best_fitness = scores[generation_best]
+            stall = 0
+        else:
+            stall += 1
+    
+    return best_genome, float(best_fitness), generations, population
+
+def sweep_shopping_list(products: Union[List[Dict], ProductCatalog], budgets: Sequence[float],
+                        required_product_ids: List[int] = None) -> List[Dict]:
+    """
+    Función helper: listas óptimas (modo exacto) para varios presupuestos
+    resolviendo una sola vez. Cada resultado tiene budget, products,
+    quantities y metrics, como optimize_shopping_list
+    """
+    catalog = products if isinstance(products, ProductCatalog) else ProductCatalog.from_records(products)
+    
+    required_positions = _required_positions(catalog, required_product_ids)
+    
+    optimizer = MultiObjectiveKnapsack(max(budgets))
+    solutions = optimizer.sweep_catalog(catalog, required_positions, budgets)
+    
+    return [
+        {
+            "budget": budget,
+            "products": [catalog.records[i] for i in positions],
+            "quantities": {int(catalog.ids[i]): 1 for i in positions},
+            "metrics": metrics
+        }
+        for budget, (positions, metrics) in zip(budgets, solutions)
+    ]
+
+def _required_positions(catalog: ProductCatalog, required_product_ids: Optional[List[int]]) -> List[int]:
+    """
+    Posiciones de los productos requeridos (búsqueda O(1) por id)
+    """
+    return sorted(
+        pos for pos in (catalog.position(pid) for pid in set(required_product_ids or []))
+        if pos is not None
+    )
+
+def _clean_required(catalog: ProductCatalog, required_positions: np.ndarray) -> List[int]:
+    """
+    LIMPIAR productos requeridos: mantener solo el mejor de cada categoría
+    """
+    cleaned_required = []
+    category_best = {}
+    
+    for i in np.asarray(required_positions, dtype=np.int64).tolist():
+        code = catalog.category_codes[i]
+        if code >= 0:
+            if code not in category_best or catalog.eco_scores[i] > catalog.eco_scores[category_best[code]]:
+                category_best[code] = i
+        else:
+            cleaned_required.append(i)
+    
+    # Agregar los mejores de cada categoría
+    cleaned_required.extend(category_best.values())
+    return cleaned_required
+
+def _quantity_caps(catalog: ProductCatalog, max_quantity: int,
+                   max_quantities: Optional[Dict[int, int]]) -> Optional[np.ndarray]:
+    """
+    Unidades máximas por posición (solo se arma el arreglo si alguna supera 1)
+    """
+    if max_quantity <= 1 and not any(q > 1 for q in (max_quantities or {}).values()):
+        return None
+    quantity_caps = np.full(len(catalog), max(1, max_quantity), dtype=np.int64)
+    for pid, cap in (max_quantities or {}).items():
+        pos = catalog.position(pid)
+        if pos is not None:
+            quantity_caps[pos] = max(1, cap)
+    return quantity_caps
+
+def required_cost(catalog: ProductCatalog, required_product_ids: Optional[List[int]]) -> float:
+    """
+    Costo de los requeridos que conserva el optimizador (el mejor por
+    categoría, con la cantidad de cada uno en el catálogo, como lo cuenta el
+    optimizador). Es la única cuenta que necesita el rechazo previo a
+    /optimize; el gasto máximo queda para check_shopping_list_feasibility
+    """
+    required = _clean_required(catalog, _required_positions(catalog, required_product_ids))
+    return float(catalog.total_prices[required].sum()) if required else 0.0
+
+def check_shopping_list_feasibility(products: Union[List[Dict], ProductCatalog], budget: float,
+                                    required_product_ids: List[int] = None,
+                                    max_quantity: int = 1,
+                                    max_quantities: Optional[Dict[int, int]] = None) -> Dict:
+    """
+    Consulta rápida (suma de subconjuntos con bitsets, ver subset_sum.py)
+    previa a la optimización completa, con los mismos requeridos y candidatos
+    que usa el optimizador:
+    - feasible: los productos requeridos caben en el presupuesto
+    - required_cost: costo de los requeridos (ver required_cost)
+    - max_spend: mayor gasto total posible sin exceder el presupuesto,
+      requeridos incluidos (sin considerar cupos por categoría)
+    """
+    catalog = products if isinstance(products, ProductCatalog) else ProductCatalog.from_records(products)
+    optimizer = MultiObjectiveKnapsack(budget)
+    required_positions = np.asarray(_required_positions(catalog, required_product_ids), dtype=np.int64)
+    required = _clean_required(catalog, required_positions)
+    cost = float(catalog.total_prices[required].sum()) if required else 0.0
+    
+    result = {
+        "budget": budget,
+        "feasible": cost <= budget,
+        "required_cost": cost,
+        "max_spend": None
+    }
+    if result["feasible"]:
+        # Con cantidades, los requeridos también pueden sumar unidades extra
+        candidates = optimizer._candidate_pool(catalog, required_positions, required)
+        caps = _quantity_caps(catalog, max_quantity, max_quantities)
+        counts = None
+        if caps is not None:
+            counts = np.concatenate([caps[required] - 1, caps[candidates]])
+            candidates = np.concatenate([np.asarray(required, dtype=np.int64), candidates])
+        extra = max_spend(catalog.total_prices[candidates], budget - cost, counts)
+        result["max_spend"] = cost + extra
+    return result
+
+def optimize_shopping_list(products: Union[List[Dict], ProductCatalog], budget: float,
+                          required_product_ids: List[int] = None,
+                          mode: str = "genetic", workers: int = 1,
+                          deadline_ms: Optional[float] = None,
+                          max_quantity: int = 1,
+                          max_quantities: Optional[Dict[int, int]] = None,
+                          category_limit: int = 1,
+                          category_limits: Optional[Dict[str, int]] = None,
+                          warm_start: Optional[SolverState] = None,
+                          keep_state: bool = False, epsilon: float = 0.1,
+                          prune: bool = False, max_candidates: Optional[int] = None,
+                          local_search_ms: Optional[float] = None,
+                          frontier_cache=None, seed: Optional[int] = None,
+                          dietary_flags: int = 0) -> Dict:
+    """
+    Función helper para optimizar lista de compras
+    products: diccionarios de productos o un ProductCatalog ya construido
+    mode: ver OPTIMIZATION_MODES
+    workers: procesos para el modo genético (islas en paralelo)
+    deadline_ms: tiempo máximo para el modo "branch_and_bound"
+    max_quantity: unidades máximas por producto
+    max_quantities: máximo por id de producto (reemplaza a max_quantity)
+    category_limit / category_limits: productos por categoría en modo "multiple_choice"
+    warm_start / keep_state: reoptimización en caliente; con keep_state el
+    resultado incluye "state" para la próxima llamada
+    epsilon: tolerancia del modo "fptas"
+    prune / max_candidates: poda de candidatos dominados antes de optimizar
+    local_search_ms: tiempo máximo de la búsqueda local posterior
+    frontier_cache: caché de fronteras por categoría del modo "sharded"
+    seed: semilla del algoritmo genético
+    dietary_flags: restricciones alimentarias de los productos agregados
+    Retorna los productos elegidos, la cantidad de unidades por id y las métricas
+    """
+    catalog = products if isinstance(products, ProductCatalog) else ProductCatalog.from_records(products)
+    
+    required_positions = _required_positions(catalog, required_product_ids)
+    quantity_caps = _quantity_caps(catalog, max_quantity, max_quantities)
     
     # Optimizar
     optimizer = MultiObjectiveKnapsack(budget)
-    optimized_products, metrics = optimizer.optimize(available, required)
+    positions, metrics = optimizer.optimize_catalog(
+        catalog, required_positions, mode=mode, workers=workers, deadline_ms=deadline_ms,
+        max_quantities=quantity_caps, category_limit=category_limit,
+        category_limits=category_limits, warm_start=warm_start, keep_state=keep_state,
+        epsilon=epsilon, prune=prune, max_candidates=max_candidates,
+        local_search_ms=local_search_ms, frontier_cache=frontier_cache, seed=seed,
+        dietary_flags=dietary_flags
+    )
     
-    # Convertir de vuelta a diccionarios
-    result_products = []
-    for p in optimized_products:
-        original = next((prod for prod in products if prod['id'] == p.id), None)
-        if original:
-            result_products.append(original)
+    # Las posiciones vienen repetidas por unidad
+    quantities = {}
+    for i in positions:
+        pid = int(catalog.ids[i])
+        quantities[pid] = quantities.get(pid, 0) + 1
     
-    return {
-        "products": result_products,
+    result = {
+        "products": [catalog.records[i] for i in dict.fromkeys(positions)],
+        "quantities": quantities,
         "metrics": metrics
     }
+    if keep_state:
+        result["state"] = optimizer.solver_state
+    return result
+
+def _optimize_jobs(catalog: ProductCatalog, jobs: Sequence[Dict], mode: str,
+                   max_quantity: int) -> List[Dict]:
+    """
+    Resuelve una porción del lote sobre el mismo catálogo (se ejecuta en un
+    proceso del pool o en el proceso actual)
+    """
+    return [
+        optimize_shopping_list(
+            catalog, job["budget"], job.get("required_product_ids"), mode=mode,
+            max_quantity=max_quantity, max_quantities=job.get("max_quantities")
+        )
+        for job in jobs
+    ]
+
+def optimize_shopping_lists(products: Union[List[Dict], ProductCatalog], jobs: Sequence[Dict],
+                            mode: str = "genetic", workers: int = 1,
+                            max_quantity: int = 1) -> List[Dict]:
+    """
+    Función helper para optimizar muchas listas con un solo catálogo.
+    jobs: diccionarios con budget y, opcionalmente, required_product_ids y
+          max_quantities (mismos significados que en optimize_shopping_list)
+    workers: con workers > 1 el lote se reparte en porciones contiguas en el
+             pool de procesos compartido; el catálogo viaja una vez por porción
+    Retorna un resultado por job, en el mismo orden
+    """
+    if mode not in OPTIMIZATION_MODES:
+        raise ValueError(f"Modo de optimización inválido: {mode}")
+    
+    catalog = products if isinstance(products, ProductCatalog) else ProductCatalog.from_records(products)
+    jobs = list(jobs)
+    
+    if workers <= 1 or len(jobs) <= 1:
+        return _optimize_jobs(catalog, jobs, mode, max_quantity)
+    
+    chunk_size = -(-len(jobs) // workers)
+    pool = get_process_pool()
+    futures = [
+        pool.submit(_optimize_jobs, catalog, jobs[start:start + chunk_size], mode, max_quantity)
+        for start in range(0, len(jobs), chunk_size)
+    ]
+    
+    results = []
+    for future in futures:
+        results.extend(future.result())
+    return results
@@ -0,0 +1,94 @@
+"""
+Búsqueda local de post-optimización (hill climbing)
+Parte de la solución de cualquier modo del optimizador y aplica el mejor
+movimiento entre agregar una unidad, quitar una unidad o intercambiar una
+unidad por otra, hasta llegar a un óptimo local o agotar el tiempo.
+
+El fitness es lineal en las unidades elegidas, así que el cambio de fitness
+de cada movimiento es la diferencia de ganancias (item_value - peso del
+precio) y se evalúa sin recalcular la lista completa.
+"""
+
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def hill_climb(gains: np.ndarray, prices: np.ndarray, units: np.ndarray,
+               caps: np.ndarray, capacity: float,
+               codes: Optional[np.ndarray] = None, limits: Optional[np.ndarray] = None,
+               time_limit_ms: float = 50.0, max_moves: int = 10000) -> Tuple[np.ndarray, int]:
+    """
+    Mejor mejora sobre cantidades enteras (0 <= units <= caps) con
+    units·prices <= capacity.
+    codes / limits: códigos de categoría (-1 = sin categoría) y productos
+    distintos permitidos por código; los movimientos respetan esos cupos
+    Retorna las nuevas unidades y la cantidad de movimientos aplicados
+    """
+    units = np.array(units, dtype=np.int64)
+    deadline = time.perf_counter() + time_limit_ms / 1000.0
+    spent = float(units @ prices)
+    
+    # Sin categorías (limits vacío) no hay cupos que revisar
+    counts = None
+    if limits is not None and limits.size:
+        chosen = codes[(units > 0) & (codes >= 0)]
+        counts = np.bincount(chosen, minlength=len(limits))
+    
+    moves = 0
+    while moves < max_moves and time.perf_counter() < deadline:
+        slack = capacity - spent
+        open_units = units < caps
+        has_quota = np.ones(len(units), dtype=bool)
+        if counts is not None:
+            safe_codes = np.maximum(codes, 0)
+            has_quota = (codes < 0) | (units > 0) | (counts[safe_codes] < limits[safe_codes])
+        
+        best_delta, drop, add = 1e-12, None, None
+        
+        # Agregar una unidad que quepa en el presupuesto restante
+        addable = open_units & has_quota & (prices <= slack + 1e-9) & (gains > best_delta)
+        if addable.any():
+            j = int(np.argmax(np.where(addable, gains, -np.inf)))
+            best_delta, drop, add = gains[j], None, j
+        
+        selected = np.flatnonzero(units > 0)
+        if len(selected):
+            # Quitar una unidad que resta más de lo que aporta
+            i = int(selected[np.argmin(gains[selected])])
+            if -gains[i] > best_delta:
+                best_delta, drop, add = -gains[i], i, None
+            
+            # Intercambiar una unidad por otra que cabe con lo que libera
+            targets = np.flatnonzero(open_units & (gains > gains[selected].min() + best_delta))
+            if len(targets):
+                delta = gains[targets][None, :] - gains[selected][:, None]
+                feasible = prices[targets][None, :] <= slack + prices[selected][:, None] + 1e-9
+                feasible &= targets[None, :] != selected[:, None]
+                if counts is not None:
+                    # Sin cupo en la categoría destino solo vale cambiar dentro de ella
+                    same = codes[targets][None, :] == codes[selected][:, None]
+                    feasible &= same | has_quota[targets][None, :]
+                delta = np.where(feasible, delta, -np.inf)
+                k = int(np.argmax(delta))
+                if delta.flat[k] > best_delta:
+                    row, column = divmod(k, len(targets))
+                    best_delta, drop, add = delta.flat[k], int(selected[row]), int(targets[column])
+        
+        if drop is None and add is None:
+            break
+        
+        if drop is not None:
+            units[drop] -= 1
+            spent -= prices[drop]
+            if counts is not None and units[drop] == 0 and codes[drop] >= 0:
+                counts[codes[drop]] -= 1
+        if add is not None:
+            if counts is not None and units[add] == 0 and codes[add] >= 0:
+                counts[codes[add]] += 1
+            units[add] += 1
+            spent += prices[add]
+        moves += 1
+    
+    return units, moves
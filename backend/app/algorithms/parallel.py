@@ -0,0 +1,60 @@
+"""
+Pools compartidos para los algoritmos de optimización
+Se crean una sola vez (de forma perezosa) y se reutilizan entre requests,
+evitando el costo de levantar procesos o hilos en cada llamada.
+El pool de procesos es para código Python puro (el algoritmo genético); el
+de hilos para trabajo en NumPy, que libera el GIL en sus operaciones.
+Los procesos se inician con "spawn": se crean desde un servidor con hilos y
+conexiones abiertas a la base de datos, que un fork copiaría a medias
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from app.config import OPTIMIZER_WORKERS
+
+_pool: Optional[ProcessPoolExecutor] = None
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Retorna el pool de procesos compartido, creándolo si no existe
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=OPTIMIZER_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+    return _pool
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    """
+    Retorna el pool de hilos compartido, creándolo si no existe
+    """
+    global _thread_pool
+    if _thread_pool is None:
+        with _pool_lock:
+            if _thread_pool is None:
+                _thread_pool = ThreadPoolExecutor(max_workers=OPTIMIZER_WORKERS)
+    return _thread_pool
+
+
+def shutdown_process_pool():
+    """
+    Cierra los pools de procesos y de hilos (al apagar la aplicación)
+    """
+    global _pool, _thread_pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+        if _thread_pool is not None:
+            _thread_pool.shutdown(wait=True)
+            _thread_pool = None
@@ -0,0 +1,214 @@
+"""
+Optimización multi-objetivo con frente de Pareto (NSGA-II)
+En lugar de colapsar costo, sostenibilidad y nutrición en un único fitness
+ponderado, devuelve todas las listas no dominadas de una sola ejecución para
+que el cliente elija el balance sin volver a optimizar
+"""
+
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from app.algorithms.catalog import ProductCatalog
+from app.algorithms.knapsack import MultiObjectiveKnapsack, _clean_required, _required_positions
+
+
+def non_dominated_sort(objectives: np.ndarray) -> np.ndarray:
+    """
+    Ordenamiento no dominado rápido (todos los objetivos se maximizan).
+    Retorna el número de frente de cada fila (0 = no dominado)
+    """
+    # dominates[i, j] = i domina a j
+    better_or_equal = (objectives[:, None, :] >= objectives[None, :, :]).all(axis=2)
+    strictly_better = (objectives[:, None, :] > objectives[None, :, :]).any(axis=2)
+    dominates = better_or_equal & strictly_better
+    
+    domination_count = dominates.sum(axis=0)
+    ranks = np.full(len(objectives), -1)
+    front = np.flatnonzero(domination_count == 0)
+    rank = 0
+    
+    while len(front):
+        ranks[front] = rank
+        # Quitar el frente actual: los que solo eran dominados por él pasan al siguiente
+        domination_count -= dominates[front].sum(axis=0)
+        domination_count[front] = -1
+        front = np.flatnonzero(domination_count == 0)
+        rank += 1
+    
+    return ranks
+
+
+def crowding_distance(objectives: np.ndarray) -> np.ndarray:
+    """
+    Distancia de hacinamiento de un frente: los extremos reciben infinito
+    """
+    n = len(objectives)
+    distance = np.zeros(n)
+    if n <= 2:
+        distance[:] = np.inf
+        return distance
+    
+    for column in objectives.T:
+        order = np.argsort(column)
+        span = column[order[-1]] - column[order[0]]
+        distance[order[0]] = distance[order[-1]] = np.inf
+        if span > 0:
+            distance[order[1:-1]] += (column[order[2:]] - column[order[:-2]]) / span
+    
+    return distance
+
+
+class ParetoKnapsack(MultiObjectiveKnapsack):
+    """
+    NSGA-II sobre la misma codificación en máscara de bits del algoritmo genético.
+    Objetivos: minimizar costo, maximizar eco-score y maximizar nutrición totales
+    """
+    
+    def __init__(self, budget: float, population_size: int = 60,
+                 generations: int = 200, stall_generations: int = 30):
+        super().__init__(budget)
+        self.population_size = population_size
+        self.generations = generations
+        self.stall_generations = stall_generations
+    
+    def pareto_front(self, catalog: ProductCatalog,
+                     required_positions: Sequence[int] = (),
+                     seed: Optional[int] = None) -> List[Dict]:
+        """
+        Retorna las soluciones no dominadas ordenadas por costo.
+        Cada solución tiene sus posiciones en el catálogo y sus métricas.
+        Con seed el frente es reproducible (None = no determinista)
+        """
+        required_positions = np.asarray(list(required_positions), dtype=np.int64)
+        required = _clean_required(catalog, required_positions)
+        candidates = self._candidate_pool(catalog, required_positions, required)
+        
+        capacity = self.budget - catalog.total_prices[required].sum()
+        if capacity < 0 or len(candidates) == 0:
+            return [self._solution(catalog, list(required))]
+        
+        rng = np.random.default_rng(seed)
+        prices = catalog.total_prices[candidates]
+        attributes = np.column_stack([
+            -prices, catalog.total_eco_scores[candidates], catalog.total_nutrition[candidates]
+        ])
+        values = self.item_values(catalog)[candidates]
+        repair_order = np.argsort(values / np.maximum(prices, 1e-9))
+        no_fill = np.array([], dtype=np.int64)
+        
+        def evaluate(population):
+            return population.astype(float) @ attributes
+        
+        # Población inicial con densidades variadas para cubrir todo el rango de costos
+        n = len(candidates)
+        densities = rng.random((self.population_size, 1))
+        population = rng.random((self.population_size, n)) < densities
+        self._repair(population, prices, capacity, repair_order, no_fill)
+        objectives = evaluate(population)
+        ranks, crowding = self._rank_and_crowding(objectives)
+        
+        front_signature = None
+        stall = 0
+        mutation_rate = 1.0 / n
+        
+        for _ in range(self.generations):
+            # Torneo binario por comparación de hacinamiento: menor frente y,
+            # en empate, mayor distancia (se convierte en un puntaje ordinal)
+            fitness_key = np.empty(self.population_size)
+            fitness_key[np.lexsort((crowding, -ranks))] = np.arange(self.population_size)
+            parents_a = population[self._tournament(fitness_key, self.population_size, rng, size=2)]
+            parents_b = population[self._tournament(fitness_key, self.population_size, rng, size=2)]
+            
+            children = np.where(rng.random((self.population_size, n)) < 0.5, parents_a, parents_b)
+            children ^= rng.random((self.population_size, n)) < mutation_rate
+            self._repair(children, prices, capacity, repair_order, no_fill)
+            
+            # Elitismo NSGA-II: padres + hijos, se conservan los mejores frentes
+            combined = np.concatenate([population, children])
+            combined_objectives = np.concatenate([objectives, evaluate(children)])
+            survivors = self._select_survivors(combined_objectives)
+            population = combined[survivors]
+            objectives = combined_objectives[survivors]
+            ranks, crowding = self._rank_and_crowding(objectives)
+            
+            # Criterio de parada: el frente no cambia durante stall_generations
+            signature = frozenset(map(tuple, np.round(objectives[ranks == 0], 6)))
+            if signature == front_signature:
+                stall += 1
+                if stall >= self.stall_generations:
+                    break
+            else:
+                front_signature = signature
+                stall = 0
+        
+        # Frente final sin duplicados, ordenado por costo
+        front = np.unique(population[ranks == 0], axis=0)
+        front = front[np.argsort(front.astype(float) @ prices)]
+        return [
+            self._solution(catalog, list(required) + candidates[genome].tolist())
+            for genome in front
+        ]
+    
+    def _rank_and_crowding(self, objectives: np.ndarray):
+        ranks = non_dominated_sort(objectives)
+        crowding = np.zeros(len(objectives))
+        for rank in np.unique(ranks):
+            members = np.flatnonzero(ranks == rank)
+            crowding[members] = crowding_distance(objectives[members])
+        return ranks, crowding
+    
+    def _select_survivors(self, objectives: np.ndarray) -> np.ndarray:
+        """
+        Selección de NSGA-II: frentes completos mientras quepan y el último
+        frente recortado por distancia de hacinamiento
+        """
+        ranks = non_dominated_sort(objectives)
+        survivors = []
+        
+        for rank in range(ranks.max() + 1):
+            members = np.flatnonzero(ranks == rank)
+            if len(survivors) + len(members) <= self.population_size:
+                survivors.extend(members.tolist())
+                continue
+            distance = crowding_distance(objectives[members])
+            remaining = self.population_size - len(survivors)
+            survivors.extend(members[np.argsort(-distance, kind='stable')[:remaining]].tolist())
+            break
+        
+        return np.array(survivors)
+    
+    def _solution(self, catalog: ProductCatalog, positions: List[int]) -> Dict:
+        metrics = self._metrics(catalog, positions)
+        # Totales crudos para que el cliente aplique sus propios pesos
+        metrics["total_eco"] = round(float(catalog.total_eco_scores[positions].sum()), 2)
+        metrics["total_nutrition"] = round(float(catalog.total_nutrition[positions].sum()), 2)
+        return {"positions": positions, "metrics": metrics}
+
+
+def pareto_shopping_lists(products: Union[List[Dict], ProductCatalog], budget: float,
+                          required_product_ids: List[int] = None,
+                          seed: Optional[int] = None) -> Dict:
+    """
+    Función helper: frente de Pareto de listas de compras.
+    Los productos se devuelven una sola vez y cada solución los referencia por id
+    """
+    catalog = products if isinstance(products, ProductCatalog) else ProductCatalog.from_records(products)
+    
+    required_positions = _required_positions(catalog, required_product_ids)
+    
+    optimizer = ParetoKnapsack(budget)
+    front = optimizer.pareto_front(catalog, required_positions, seed=seed)
+    
+    used_positions = sorted({pos for solution in front for pos in solution["positions"]})
+    
+    return {
+        "products": [catalog.records[i] for i in used_positions],
+        "solutions": [
+            {
+                "product_ids": [int(catalog.ids[i]) for i in solution["positions"]],
+                "metrics": solution["metrics"]
+            }
+            for solution in front
+        ]
+    }
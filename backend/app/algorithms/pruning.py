@@ -0,0 +1,99 @@
+"""
+Poda por dominancia del conjunto de candidatos
+Dentro de una categoría, el producto j domina a i si no cuesta más, no es
+peor en eco-score ni en nutrición y es estrictamente mejor en alguno de los
+tres. Cambiar una unidad de i por una de j nunca empeora la lista, así que i
+solo puede estar en una solución óptima si todos sus dominadores ya están
+con todas sus unidades (o, con cupo por categoría, si el cupo alcanza para
+ellos y para i). Los productos que no cumplen eso se descartan antes de
+optimizar sin perder el óptimo.
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.algorithms.catalog import ProductCatalog
+
+
+def dominance(catalog: ProductCatalog, positions: Sequence[int],
+              units: Optional[Sequence[int]] = None,
+              block_size: int = 512) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Para cada posición: cuántos productos de positions la dominan dentro de su
+    categoría y cuánto cuestan esos dominadores con todas sus unidades.
+    Los productos sin categoría no se comparan.
+    
+    Barrido por categoría en orden de precio (empates: mejor eco y nutrición
+    primero), de modo que los dominadores de un producto siempre aparecen
+    antes que él; cada bloque se compara solo con los anteriores
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    units = np.ones(len(positions)) if units is None else np.asarray(units, dtype=float)
+    counts = np.zeros(len(positions), dtype=np.int64)
+    costs = np.zeros(len(positions))
+    if len(positions) < 2:
+        return counts, costs
+    
+    prices = catalog.total_prices[positions]
+    eco = catalog.total_eco_scores[positions]
+    nutrition = catalog.total_nutrition[positions]
+    codes = catalog.category_codes[positions]
+    
+    order = np.lexsort((-nutrition, -eco, prices, codes))
+    boundaries = np.flatnonzero(np.diff(codes[order])) + 1
+    
+    for group in np.split(order, boundaries):
+        if codes[group[0]] < 0 or len(group) < 2:
+            continue
+        
+        p, e, n = prices[group], eco[group], nutrition[group]
+        unit_costs = units[group] * p
+        
+        for start in range(1, len(group), block_size):
+            stop = min(start + block_size, len(group))
+            rows = np.arange(start, stop)
+            earlier = np.arange(stop)[None, :] < rows[:, None]
+            not_worse = (e[None, :stop] >= e[rows, None]) & (n[None, :stop] >= n[rows, None])
+            better = (
+                (p[None, :stop] < p[rows, None]) |
+                (e[None, :stop] > e[rows, None]) |
+                (n[None, :stop] > n[rows, None])
+            )
+            dominated_by = earlier & not_worse & better
+            counts[group[rows]] = dominated_by.sum(axis=1)
+            costs[group[rows]] = dominated_by @ unit_costs[:stop]
+    
+    return counts, costs
+
+
+def prune_candidates(catalog: ProductCatalog, candidates: Sequence[int], capacity: float,
+                     values: np.ndarray, units: Optional[Sequence[int]] = None,
+                     limits: Optional[np.ndarray] = None,
+                     max_candidates: Optional[int] = None) -> Tuple[np.ndarray, int]:
+    """
+    Descarta los candidatos dominados que no pueden estar en ninguna solución
+    óptima:
+    - su precio más el de todas las unidades de sus dominadores excede capacity
+    - limits (cupo restante por código de categoría): tienen al menos tantos
+      dominadores como cupo su categoría
+    max_candidates: además conserva solo los de mayor valor por peso (recorte
+    heurístico, puede perder el óptimo)
+    values: item_values() del catálogo completo
+    Retorna los candidatos que quedan (ordenados) y cuántos se descartaron
+    """
+    candidates = np.asarray(candidates, dtype=np.int64)
+    counts, costs = dominance(catalog, candidates, units)
+    
+    prunable = (counts > 0) & (catalog.total_prices[candidates] + costs > capacity + 1e-9)
+    if limits is not None:
+        codes = catalog.category_codes[candidates]
+        categorized = codes >= 0
+        prunable[categorized] |= counts[categorized] >= np.maximum(limits[codes[categorized]], 1)
+    kept = candidates[~prunable]
+    
+    if max_candidates is not None and len(kept) > max_candidates:
+        density = values[kept] / np.maximum(catalog.total_prices[kept], 1e-9)
+        kept = np.sort(kept[np.argsort(-density, kind='stable')[:max_candidates]])
+    
+    return kept, len(candidates) - len(kept)
@@ -0,0 +1,101 @@
+"""
+Resolución por categorías (shards) combinada por elección múltiple
+Cada categoría se resuelve por separado como mochila 0/1 y se resume en su
+frontera gasto/valor: los gastos exactos cuyo mejor valor supera al de
+cualquier gasto menor. Las fronteras son independientes entre sí (se
+calculan en paralelo y pueden guardarse mientras la categoría no cambie) y
+se combinan con una programación dinámica de elección múltiple que toma un
+punto de la frontera de cada categoría. El resultado es el mismo óptimo
+global que la mochila exacta sobre todo el catálogo.
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+class CategoryFrontier:
+    """
+    Frontera gasto/valor de una categoría.
+    spends: gastos en CLP (ascendentes, el primero es 0); values: mejor suma
+    de item_value para cada gasto; masks: productos de cada punto (bits
+    empaquetados, en el orden en que se entregaron); capacity: gasto máximo
+    en CLP con que se construyó
+    """
+    
+    __slots__ = ("capacity", "spends", "values", "masks", "size")
+    
+    def __init__(self, capacity: int, spends: np.ndarray, values: np.ndarray,
+                 masks: np.ndarray, size: int):
+        self.capacity = capacity
+        self.spends = spends
+        self.values = values
+        self.masks = masks
+        self.size = size
+    
+    def members(self, point: int) -> np.ndarray:
+        """
+        Índices de los productos del punto indicado
+        """
+        return np.flatnonzero(np.unpackbits(self.masks[point], count=self.size))
+
+
+def frontier_from_table(dp: np.ndarray, keep: np.ndarray, weights: np.ndarray,
+                        unit: int) -> CategoryFrontier:
+    """
+    Frontera a partir de la tabla de la mochila 0/1 de una categoría
+    (dp y keep como los de MultiObjectiveKnapsack._exact_table).
+    Los productos de todos los puntos se reconstruyen a la vez, recorriendo
+    la matriz de decisiones una sola vez
+    """
+    best_before = np.concatenate([[-np.inf], np.maximum.accumulate(dp)[:-1]])
+    points = np.flatnonzero(dp > best_before)
+    
+    spend = points.copy()
+    masks = np.zeros((len(points), len(weights)), dtype=bool)
+    for i in range(len(weights) - 1, -1, -1):
+        taken = keep[i, spend]
+        masks[:, i] = taken
+        spend -= taken * int(weights[i])
+    
+    return CategoryFrontier(
+        (len(dp) - 1) * unit, points * unit, dp[points], np.packbits(masks, axis=1), len(weights)
+    )
+
+
+def merge_frontiers(frontiers: Sequence[CategoryFrontier], unit: int,
+                    capacity: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Elección múltiple sobre las fronteras (gastos en unidades de unit, hasta
+    capacity): dp[s] = mejor valor total gastando exactamente s y
+    choice[g, s] = punto elegido de la frontera g. O(total de puntos · capacity)
+    """
+    dp = np.full(capacity + 1, -np.inf)
+    dp[0] = 0.0
+    choice = np.zeros((len(frontiers), capacity + 1), dtype=np.int32)
+    
+    for g, frontier in enumerate(frontiers):
+        merged = np.full(capacity + 1, -np.inf)
+        weights = frontier.spends // unit
+        for k in range(int(np.searchsorted(weights, capacity, side='right'))):
+            weight = int(weights[k])
+            candidate = dp[:capacity + 1 - weight] + frontier.values[k]
+            improved = candidate > merged[weight:]
+            merged[weight:][improved] = candidate[improved]
+            choice[g, weight:][improved] = k
+        dp = merged
+    
+    return dp, choice
+
+
+def backtrack_frontiers(frontiers: Sequence[CategoryFrontier], choice: np.ndarray,
+                        unit: int, spend: int) -> List[Tuple[int, int]]:
+    """
+    Punto elegido (g, k) de cada frontera para el gasto total spend
+    """
+    picks = []
+    for g in range(len(frontiers) - 1, -1, -1):
+        k = int(choice[g, spend])
+        picks.append((g, k))
+        spend -= int(frontiers[g].spends[k]) // unit
+    return picks
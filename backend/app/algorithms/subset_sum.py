@@ -0,0 +1,76 @@
+"""
+Suma de subconjuntos con bitsets de enteros de Python (camino rápido)
+Responde consultas de factibilidad y gasto máximo sin resolver la mochila
+multi-objetivo: el bit s del entero está encendido si algún subconjunto de
+productos cuesta exactamente s unidades, y agregar un producto de peso w es
+bits | (bits << w). Cada desplazamiento opera sobre palabras de máquina,
+así que un catálogo completo se resuelve en microsegundos a milisegundos.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+CENTS = 100
+
+
+def integer_prices(prices: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Precios enteros en centavos (redondeando hacia arriba para no exceder el
+    presupuesto) reducidos por su máximo común divisor. Retorna pesos y unidad
+    (en centavos). Con precios enteros en CLP la unidad es al menos 100, así
+    que el bitset no crece respecto de contar en CLP
+    """
+    weights = np.ceil(np.round(np.asarray(prices, dtype=float) * CENTS, 6)).astype(np.int64)
+    unit = max(1, int(np.gcd.reduce(weights))) if len(weights) else 1
+    return weights // unit, unit
+
+
+def reachable_sums(weights: np.ndarray, capacity: int,
+                   counts: Optional[np.ndarray] = None) -> int:
+    """
+    Bitset de las sumas alcanzables hasta capacity (bit s = suma s posible).
+    counts: unidades máximas de cada peso (por defecto 1). Los pesos repetidos
+    se agrupan y cada grupo se divide en potencias de dos (1, 2, 4, ..., resto),
+    así que cada peso distinto cuesta O(log unidades) desplazamientos
+    """
+    if capacity < 0:
+        return 0
+    weights = np.asarray(weights, dtype=np.int64)
+    if counts is None:
+        counts = np.ones(len(weights), dtype=np.int64)
+    usable = (weights <= capacity) & (np.asarray(counts) > 0)
+    
+    # Unidades totales por peso distinto (los pesos 0 no cambian las sumas)
+    distinct, inverse = np.unique(weights[usable], return_inverse=True)
+    totals = np.bincount(inverse, weights=np.asarray(counts)[usable]).astype(np.int64)
+    
+    mask = (1 << (capacity + 1)) - 1
+    bits = 1
+    for weight, total in zip(distinct.tolist(), totals.tolist()):
+        if weight == 0:
+            continue
+        total = min(total, capacity // weight)
+        piece = 1
+        while total > 0:
+            take = min(piece, total)
+            bits |= (bits << (weight * take)) & mask
+            total -= take
+            piece *= 2
+        if bits >> capacity:
+            break
+    return bits
+
+
+def max_spend(prices: np.ndarray, capacity: float,
+              counts: Optional[np.ndarray] = None) -> float:
+    """
+    Mayor gasto en CLP que no supera capacity comprando a lo más counts
+    unidades de cada precio (capacity hacia abajo y precios hacia arriba, en centavos)
+    """
+    if capacity < 0:
+        return 0.0
+    weights, unit = integer_prices(prices)
+    budget = int(np.floor(np.round(capacity * CENTS, 6)))
+    bits = reachable_sums(weights, budget // unit, counts)
+    return (bits.bit_length() - 1) * unit / CENTS
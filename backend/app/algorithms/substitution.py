@@ -3,23 +3,202 @@ Algoritmo de Sustitución Inteligente de Productos
 Encuentra alternativas más sostenibles y económicas
 """
 
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple, Union
+import heapq
+
+import numpy as np
+
 from app.algorithms.sustainability import SustainabilityScorer
+from app.algorithms.catalog import ProductCatalog
+from app.algorithms.dietary import satisfies
+from app.algorithms.kdtree import KDTree
+from app.algorithms.sharding import CategoryFrontier, backtrack_frontiers, merge_frontiers
+
+# Umbrales por defecto: hasta 35% más caro y al menos 2 puntos más de eco-score
+# (son los de los sustitutos precalculados en product_substitutes)
+DEFAULT_MAX_PRICE_INCREASE = 0.35
+DEFAULT_MIN_SCORE_IMPROVEMENT = 2.0
+
+# Candidatos por item al sustituir la lista completa dentro del presupuesto y
+# máximo de asignaciones enumeradas por categoría
+LIST_SUBSTITUTE_CANDIDATES = 5
+MAX_CATEGORY_ASSIGNMENTS = 20000
+
+# Macronutrientes del vector de similitud nutricional
+NUTRIENT_FIELDS = ("calories", "protein", "fat", "carbs")
+
+def nutrient_vector(product) -> np.ndarray:
+    """
+    Macronutrientes de un producto (dict u objeto) en el orden de
+    NUTRIENT_FIELDS; los faltantes cuentan como 0
+    """
+    get = product.get if isinstance(product, dict) else lambda field: getattr(product, field, None)
+    return np.array([get(field) or 0 for field in NUTRIENT_FIELDS], dtype=float)
+
+class SubstituteIndex:
+    """
+    Índice de sustitutos sobre un ProductCatalog.
+    
+    Por categoría guarda las posiciones ordenadas por precio (el precio
+    máximo es una búsqueda binaria) y ordenadas por eco-score descendente
+    (la mejora mínima también). Cada consulta recorre solo el menor de los
+    dos prefijos: por eco-score se detiene al juntar max_results y por precio
+    se eligen los mejores con un heap. O(log n + k) en el caso típico en vez
+    de revisar todo el catálogo. Las restricciones alimentarias se revisan
+    con un AND sobre la máscara de cada candidato.
+    
+    Para la similitud nutricional los macronutrientes se normalizan al rango
+    [0, 1] del catálogo y cada categoría tiene un árbol k-d (se construye en
+    la primera consulta de esa categoría)
+    """
+    
+    __slots__ = ("catalog", "_groups", "_nutrients", "_nutrient_min", "_nutrient_range", "_trees")
+    
+    def __init__(self, catalog: ProductCatalog):
+        self.catalog = catalog
+        self._groups = {}
+        self._nutrients = None
+        self._nutrient_min = None
+        self._nutrient_range = None
+        self._trees = {}
+        
+        codes = catalog.category_codes
+        positions = np.arange(len(catalog))
+        # Empates: se conserva el orden del catálogo
+        by_price = np.lexsort((positions, catalog.prices, codes))
+        by_eco = np.lexsort((positions, -catalog.eco_scores, codes))
+        
+        group_codes, starts = np.unique(codes[by_price], return_index=True)
+        ends = np.append(starts[1:], len(catalog))
+        for code, start, end in zip(group_codes.tolist(), starts.tolist(), ends.tolist()):
+            price_order = by_price[start:end]
+            eco_order = by_eco[start:end]
+            self._groups[code] = (
+                price_order, catalog.prices[price_order],
+                eco_order, -catalog.eco_scores[eco_order]
+            )
+    
+    def query(self, category_code: int, max_price: float, original_eco_score: float,
+              min_score_improvement: float, exclude_id: int = -1,
+              max_results: int = 5, dietary_flags: int = 0) -> List[int]:
+        """
+        Posiciones de la categoría con precio <= max_price, eco-score al
+        menos min_score_improvement sobre el original y que cumplen las
+        restricciones de dietary_flags, de mayor a menor eco-score
+        """
+        group = self._groups.get(category_code)
+        if group is None or max_results <= 0:
+            return []
+        price_order, prices, eco_order, neg_eco_scores = group
+        catalog = self.catalog
+        accepted = self._filter(
+            max_price, original_eco_score, min_score_improvement, exclude_id, dietary_flags
+        )
+        
+        affordable = int(np.searchsorted(prices, max_price, side='right'))
+        # Umbral con holgura: la condición exacta la decide accepted()
+        threshold = -(original_eco_score + min_score_improvement) + 1e-9
+        improving = int(np.searchsorted(neg_eco_scores, threshold, side='right'))
+        
+        if improving <= affordable:
+            found = []
+            for i in eco_order[:improving].tolist():
+                if accepted(i):
+                    found.append(i)
+                    if len(found) == max_results:
+                        break
+            return found
+        
+        return heapq.nsmallest(
+            max_results,
+            (i for i in price_order[:affordable].tolist() if accepted(i)),
+            key=lambda i: (-catalog.eco_scores[i], i)
+        )
+    
+    def nearest(self, category_code: int, nutrients: np.ndarray, max_price: float,
+                original_eco_score: float, min_score_improvement: float,
+                exclude_id: int = -1, max_results: int = 5,
+                dietary_flags: int = 0) -> List[Tuple[int, float]]:
+        """
+        Los max_results productos de la categoría nutricionalmente más
+        cercanos a nutrients (macronutrientes sin normalizar) que cumplen los
+        mismos filtros de precio, eco-score y restricciones que query(). Retorna pares
+        (posición, distancia normalizada) de menor a mayor distancia
+        """
+        group = self._groups.get(category_code)
+        if group is None or max_results <= 0:
+            return []
+        
+        tree, positions = self._tree(category_code)
+        accepted = self._filter(
+            max_price, original_eco_score, min_score_improvement, exclude_id, dietary_flags
+        )
+        point = (np.asarray(nutrients, dtype=float) - self._nutrient_min) / self._nutrient_range
+        return [
+            (int(positions[i]), distance)
+            for i, distance in tree.query(point, max_results, lambda i: accepted(positions[i]))
+        ]
+    
+    def _filter(self, max_price: float, original_eco_score: float,
+                min_score_improvement: float, exclude_id: int,
+                dietary_flags: int = 0) -> Callable[[int], bool]:
+        catalog = self.catalog
+        
+        def accepted(i):
+            return (
+                catalog.eco_scores[i] - original_eco_score >= min_score_improvement
+                and catalog.prices[i] <= max_price
+                and catalog.ids[i] != exclude_id
+                and satisfies(int(catalog.dietary_flags[i]), dietary_flags)
+            )
+        
+        return accepted
+    
+    def _tree(self, category_code: int) -> Tuple[KDTree, np.ndarray]:
+        """
+        Árbol k-d de la categoría (y las posiciones de sus puntos), construido
+        la primera vez que se consulta
+        """
+        if self._nutrients is None:
+            nutrients = np.array(
+                [nutrient_vector(record) for record in self.catalog.records], dtype=float
+            ).reshape(len(self.catalog), len(NUTRIENT_FIELDS))
+            low = nutrients.min(axis=0) if len(nutrients) else np.zeros(len(NUTRIENT_FIELDS))
+            high = nutrients.max(axis=0) if len(nutrients) else np.zeros(len(NUTRIENT_FIELDS))
+            self._nutrient_min = low
+            self._nutrient_range = np.where(high > low, high - low, 1.0)
+            self._nutrients = (nutrients - low) / self._nutrient_range
+        
+        if category_code not in self._trees:
+            positions = np.sort(self._groups[category_code][0])
+            self._trees[category_code] = (KDTree(self._nutrients[positions]), positions)
+        return self._trees[category_code]
 
 class ProductSubstitution:
     def __init__(self):
         self.scorer = SustainabilityScorer()
     
-    def find_substitutes(self, original_product: Dict, available_products: List[Dict],
+    def find_substitutes(self, original_product: Dict,
+                        available_products: Union[List[Dict], ProductCatalog, SubstituteIndex],
                         max_price_increase: float = 0.2, min_score_improvement: float = 1.0,
-                        max_results: int = 5) -> List[Dict]:
+                        max_results: int = 5, similar_nutrition: bool = False,
+                        dietary_flags: int = 0) -> List[Dict]:
         """
         Encuentra productos sustitutos basándose en:
         - Misma categoría
         - Precio similar o menor
         - Mayor eco-score (puntuación ambiental)
+        available_products puede ser una lista de dicts, un ProductCatalog o
+        un SubstituteIndex ya construido (para reutilizarlo entre varias consultas)
+        similar_nutrition: entre los que cumplen los filtros, los más parecidos
+        en macronutrientes (distancia euclidiana normalizada) en vez de los de
+        mayor eco-score
+        dietary_flags: restricciones alimentarias que deben cumplir los
+        sustitutos (máscara de app/algorithms/dietary.py)
         """
-        if not available_products:
+        index = self._as_index(available_products)
+        catalog = index.catalog
+        if not len(catalog):
             return []
         
         original_category = original_product.get('category', '')
@@ -28,49 +207,81 @@ class ProductSubstitution:
         
         max_price = original_price * (1 + max_price_increase)
         
-        candidates = []
+        category_code = catalog.category_code(original_category)
+        if category_code is None:
+            return []
         
-        for product in available_products:
-            # Evitar el producto original
-            if product.get('id') == original_product.get('id'):
-                continue
-            
-            # Filtrar por categoría
-            if product.get('category') != original_category:
-                continue
-            
-            # Filtrar por precio
-            product_price = product.get('price', 0)
-            if product_price > max_price:
-                continue
-            
-            # Usar eco_score directamente
-            product_eco_score = product.get('eco_score', 0)
-            
-            # Verificar que sea MÁS sostenible (eco_score mayor)
-            score_improvement = product_eco_score - original_eco_score
-            if score_improvement < min_score_improvement:
-                continue
-            
-            # Calcular ahorro/costo adicional
-            price_diff = product_price - original_price
-            savings_percentage = ((original_price - product_price) / original_price) * 100
-            
-            candidates.append({
-                'product': product,
-                'score': product_eco_score,
-                'score_improvement': round(score_improvement, 2),
-                'price_difference': round(price_diff, 2),
-                'savings_percentage': round(savings_percentage, 2),
-                'recommendation_reason': self._generate_reason(
-                    score_improvement, price_diff, product_eco_score
+        # Misma categoría, precio máximo, MÁS sostenible (eco_score mayor) y
+        # distinto del producto original, ya ordenados por eco-score o por
+        # cercanía nutricional
+        exclude_id = original_product.get('id', -1)
+        if similar_nutrition:
+            neighbors = index.nearest(
+                category_code, nutrient_vector(original_product), max_price, original_eco_score,
+                min_score_improvement, exclude_id=exclude_id, max_results=max_results,
+                dietary_flags=dietary_flags
+            )
+        else:
+            neighbors = [
+                (i, None) for i in index.query(
+                    category_code, max_price, original_eco_score, min_score_improvement,
+                    exclude_id=exclude_id, max_results=max_results, dietary_flags=dietary_flags
                 )
-            })
+            ]
+        
+        candidates = []
+        
+        for i, distance in neighbors:
+            candidate = self.describe(
+                original_product, catalog.records[i],
+                float(catalog.prices[i]), float(catalog.eco_scores[i])
+            )
+            if distance is not None:
+                candidate['nutrition_distance'] = round(distance, 4)
+            candidates.append(candidate)
         
-        # Ordenar por score improvement (descendente)
-        candidates.sort(key=lambda x: x['score_improvement'], reverse=True)
+        return candidates
+    
+    def describe(self, original_product: Dict, product, product_price: float,
+                 product_eco_score: float) -> Dict:
+        """
+        Detalle de un sustituto respecto al producto original
+        """
+        original_price = original_product.get('price', 0)
+        score_improvement = product_eco_score - original_product.get('eco_score', 0)
+        
+        # Calcular ahorro/costo adicional
+        price_diff = product_price - original_price
+        savings_percentage = ((original_price - product_price) / original_price) * 100
         
-        return candidates[:max_results]
+        return {
+            'product': product,
+            'score': product_eco_score,
+            'score_improvement': round(score_improvement, 2),
+            'price_difference': round(price_diff, 2),
+            'savings_percentage': round(savings_percentage, 2),
+            'recommendation_reason': self._generate_reason(
+                score_improvement, price_diff, product_eco_score
+            )
+        }
+    
+    @staticmethod
+    def _as_catalog(products: Union[List[Dict], ProductCatalog]) -> ProductCatalog:
+        """
+        Reutiliza el catálogo si ya viene construido
+        """
+        if isinstance(products, ProductCatalog):
+            return products
+        return ProductCatalog.from_records(products, default_eco_score=0)
+    
+    @classmethod
+    def _as_index(cls, products: Union[List[Dict], ProductCatalog, SubstituteIndex]) -> SubstituteIndex:
+        """
+        Reutiliza el índice si ya viene construido
+        """
+        if isinstance(products, SubstituteIndex):
+            return products
+        return SubstituteIndex(cls._as_catalog(products))
     
     def _generate_reason(self, score_improvement: float, price_diff: float, 
                         eco_score: float) -> str:
@@ -101,28 +312,197 @@ class ProductSubstitution:
         
         return " • ".join(reasons)
     
-    def substitute_list(self, shopping_list: List[Dict], available_products: List[Dict],
-                       aggressive: bool = False) -> Dict:
+    def substitute_list(self, shopping_list: List[Dict],
+                       available_products: Union[List[Dict], ProductCatalog, SubstituteIndex],
+                       aggressive: bool = False, similar_nutrition: bool = False,
+                       dietary_flags: int = 0) -> Dict:
         """
         Aplica sustituciones a toda la lista de compras
         aggressive: True = sustituye aunque sea más caro si es mucho más sostenible
+        similar_nutrition: elige el sustituto más parecido en macronutrientes
+        dietary_flags: restricciones alimentarias que deben cumplir los sustitutos
+        """
+        candidates = self.candidate_sets(
+            shopping_list, available_products, aggressive=aggressive,
+            similar_nutrition=similar_nutrition, max_results=1, dietary_flags=dietary_flags
+        )
+        return self.summarize([(item, candidates[item.get('id')]) for item in shopping_list])
+    
+    def candidate_sets(self, shopping_list: List[Dict],
+                       available_products: Union[List[Dict], ProductCatalog, SubstituteIndex],
+                       aggressive: bool = False, similar_nutrition: bool = False,
+                       max_results: int = LIST_SUBSTITUTE_CANDIDATES,
+                       dietary_flags: int = 0) -> Dict[int, List[Dict]]:
         """
-        max_price_increase = 0.5 if aggressive else 0.35
-        min_score_improvement = 1.0 if aggressive else 2.0
+        Sustitutos candidatos (ordenados) de cada item de la lista por id,
+        con los umbrales de substitute_list
+        """
+        max_price_increase = 0.5 if aggressive else DEFAULT_MAX_PRICE_INCREASE
+        min_score_improvement = 1.0 if aggressive else DEFAULT_MIN_SCORE_IMPROVEMENT
         
-        substitutions = []
-        total_savings = 0
-        total_score_improvement = 0
+        # Un solo índice compartido por todos los items de la lista
+        index = self._as_index(available_products)
         
-        for item in shopping_list:
-            substitutes = self.find_substitutes(
+        return {
+            item.get('id'): self.find_substitutes(
                 item, 
-                available_products,
+                index,
                 max_price_increase=max_price_increase,
                 min_score_improvement=min_score_improvement,
-                max_results=1
+                max_results=max_results,
+                similar_nutrition=similar_nutrition,
+                dietary_flags=dietary_flags
             )
+            for item in shopping_list
+        }
+    
+    def substitute_list_within_budget(self, shopping_list: List[Dict],
+                                      candidates: Dict[int, List[Dict]],
+                                      budget: Optional[float] = None,
+                                      max_assignments: int = MAX_CATEGORY_ASSIGNMENTS) -> Dict:
+        """
+        Sustituciones de toda la lista elegidas en conjunto: maximiza la
+        mejora total de eco-score con el costo de la lista (precio × quantity
+        de cada item) dentro de budget, sin repetir un sustituto ni usar un
+        producto que ya está en la lista.
+        
+        candidates: sustitutos de cada item por id (como los de candidate_sets
+        o los precalculados), compartidos para no recorrer el catálogo por item.
+        
+        Los sustitutos son de la misma categoría, así que solo compiten entre
+        sí los items de una categoría: por categoría se enumeran las
+        asignaciones sin repetidos y se deja su frontera costo/mejora, y las
+        fronteras se combinan con la misma elección múltiple del modo
+        "sharded" del optimizador. Si ni las opciones más baratas caben en
+        budget se elige la mejor con el menor costo posible.
+        
+        Antes de enumerar se descartan los candidatos dominados (no cambia el
+        óptimo). Si aun así una categoría supera max_assignments se quitan
+        sus peores candidatos y la categoría queda en 'truncated_categories'
+        """
+        in_list = {item.get('id') for item in shopping_list}
+        groups: Dict[str, List[int]] = {}
+        for position, item in enumerate(shopping_list):
+            groups.setdefault(item.get('category') or '', []).append(position)
+        
+        def cost(item, candidate=None):
+            price = item.get('price', 0) + (candidate['price_difference'] if candidate else 0)
+            return int(np.ceil(price * (item.get('quantity') or 1)))
+        
+        # Frontera (costo, mejora) de cada categoría con su asignación
+        fronts = []
+        truncated = []
+        for category, positions in groups.items():
+            options = [
+                [None] + self._undominated(
+                    shopping_list[p], [
+                        c for c in candidates.get(shopping_list[p].get('id'), [])
+                        if self._candidate_id(c) not in in_list
+                    ],
+                    cost, len(positions)
+                )
+                for p in positions
+            ]
+            # Acotar la enumeración quitando los peores candidatos
+            if np.prod([len(o) for o in options], dtype=float) > max_assignments:
+                truncated.append(category)
+            while np.prod([len(o) for o in options], dtype=float) > max_assignments:
+                longest = max(range(len(options)), key=lambda j: len(options[j]))
+                options[longest].pop()
+            
+            assignments = []
             
+            def enumerate_choices(j, used, total_cost, gain, choice):
+                if j == len(positions):
+                    assignments.append((total_cost, -gain, choice))
+                    return
+                item = shopping_list[positions[j]]
+                for candidate in options[j]:
+                    if candidate is None:
+                        enumerate_choices(j + 1, used, total_cost + cost(item), gain, choice + (None,))
+                    elif self._candidate_id(candidate) not in used:
+                        enumerate_choices(
+                            j + 1, used | {self._candidate_id(candidate)},
+                            total_cost + cost(item, candidate),
+                            gain + candidate['score_improvement'], choice + (candidate,)
+                        )
+            
+            enumerate_choices(0, frozenset(), 0, 0.0, ())
+            assignments.sort(key=lambda a: (a[0], a[1]))
+            front = []
+            for total_cost, neg_gain, choice in assignments:
+                if not front or -neg_gain > front[-1][1] + 1e-9:
+                    front.append((total_cost, -neg_gain, choice))
+            fronts.append((positions, front))
+        
+        # Elección múltiple: un punto de cada frontera, gasto por sobre el mínimo
+        base = sum(front[0][0] for _, front in fronts)
+        extra = [np.array([point[0] - front[0][0] for point in front], dtype=np.int64) for _, front in fronts]
+        max_extra = int(sum(spends[-1] for spends in extra))
+        capacity = max_extra if budget is None else min(max_extra, max(0, int(budget) - base))
+        unit = max(1, int(np.gcd.reduce(np.concatenate(extra)))) if fronts else 1
+        frontiers = [
+            CategoryFrontier(
+                capacity, spends, np.array([point[1] for point in front]),
+                np.zeros((len(front), 0), dtype=np.uint8), 0
+            )
+            for spends, (_, front) in zip(extra, fronts)
+        ]
+        dp, choice = merge_frontiers(frontiers, unit, capacity // unit)
+        spend = int(np.argmax(dp))
+        
+        chosen = [None] * len(shopping_list)
+        total_cost = base
+        for g, k in backtrack_frontiers(frontiers, choice, unit, spend):
+            positions, front = fronts[g]
+            total_cost += int(extra[g][k])
+            for position, candidate in zip(positions, front[k][2]):
+                chosen[position] = candidate
+        
+        result = self.summarize([
+            (item, [candidate] if candidate is not None else [])
+            for item, candidate in zip(shopping_list, chosen)
+        ])
+        result['total_cost'] = total_cost
+        result['truncated_categories'] = truncated
+        return result
+    
+    @staticmethod
+    def _undominated(item: Dict, item_candidates: List[Dict], cost, group_size: int) -> List[Dict]:
+        """
+        Candidatos de un item sin los dominados. Uno es dominado si no mejora
+        a mantener el producto (cuesta lo mismo o más sin mejorar el eco-score)
+        o si al menos group_size candidatos del item cuestan menos o igual y
+        mejoran más o igual: los demás items de la categoría usan como mucho
+        group_size - 1 de ellos, así que siempre queda uno libre que no es peor
+        """
+        keep_cost = cost(item)
+        points = [(cost(item, c), c['score_improvement']) for c in item_candidates]
+        
+        def dominates(a, b):
+            return a[0] <= b[0] and a[1] >= b[1] and a != b
+        
+        return [
+            candidate for candidate, point in zip(item_candidates, points)
+            if not (point[0] >= keep_cost and point[1] <= 0)
+            and sum(dominates(other, point) for other in points) < group_size
+        ]
+    
+    @staticmethod
+    def _candidate_id(candidate: Dict):
+        product = candidate['product']
+        return product.get('id') if isinstance(product, dict) else getattr(product, 'id', None)
+    
+    def summarize(self, matches: List) -> Dict:
+        """
+        Resultado de substitute_list a partir de pares (item, sustitutos
+        ordenados); se usa el primero de cada item que tenga alguno
+        """
+        substitutions = []
+        total_savings = 0
+        total_score_improvement = 0
+        
+        for item, substitutes in matches:
             if substitutes:
                 best_substitute = substitutes[0]
                 substitutions.append({
@@ -145,10 +525,13 @@ class ProductSubstitution:
             )
         }
 
-def find_product_substitutes(product: Dict, available_products: List[Dict], 
-                            max_price_increase: float = 0.35,
-                            min_score_improvement: float = 2.0,
-                            max_results: int = 5) -> List[Dict]:
+def find_product_substitutes(product: Dict,
+                            available_products: Union[List[Dict], ProductCatalog, SubstituteIndex],
+                            max_price_increase: float = DEFAULT_MAX_PRICE_INCREASE,
+                            min_score_improvement: float = DEFAULT_MIN_SCORE_IMPROVEMENT,
+                            max_results: int = 5,
+                            similar_nutrition: bool = False,
+                            dietary_flags: int = 0) -> List[Dict]:
     """
     Función helper para encontrar sustitutos
     Retorna solo los productos (sin metadata) para compatibilidad con tests
@@ -159,7 +542,9 @@ def find_product_substitutes(product: Dict, available_products: List[Dict],
         available_products, 
         max_price_increase=max_price_increase,
         min_score_improvement=min_score_improvement,
-        max_results=max_results
+        max_results=max_results,
+        similar_nutrition=similar_nutrition,
+        dietary_flags=dietary_flags
     )
     # Extraer solo los productos de los resultados
     return [item['product'] for item in results]
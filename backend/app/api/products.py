@@ -8,9 +8,13 @@ from app.database import get_db
 from app.models.models import Product
 from app.api.auth import get_current_user
 from app.algorithms.sustainability import calculate_sustainability_score
-from app.algorithms.substitution import find_product_substitutes
+from app.algorithms.catalog import ProductCatalog
+from app.algorithms.dietary import dietary_mask
+from app.algorithms.substitution import SubstituteIndex, find_product_substitutes
 from app.services.external_api import OpenFoodFactsService, USDAService
 from app.config import USDA_API_KEY
+from app.services.optimization_cache import substitute_indexes
+from app.services.substitute_graph import SUBSTITUTE_GRAPH_SIZE, stored_substitutes
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 
@@ -31,6 +35,7 @@ class ProductCreate(BaseModel):
     protein: Optional[float] = None
     fat: Optional[float] = None
     carbs: Optional[float] = None
+    dietary_restrictions: List[str] = []
     image_url: Optional[str] = None
     description: Optional[str] = None
 
@@ -52,6 +57,9 @@ class ProductResponse(BaseModel):
     protein: Optional[float]
     fat: Optional[float]
     carbs: Optional[float]
+    nutrition_score: Optional[float] = None
+    dietary_flags: int = 0
+    dietary_restrictions: List[str] = []
     image_url: Optional[str]
     description: Optional[str]
     source_api: Optional[str]
@@ -59,6 +67,15 @@ class ProductResponse(BaseModel):
     class Config:
         from_attributes = True
 
+def parse_dietary_restrictions(restrictions: Optional[List[str]]) -> int:
+    """
+    Máscara de bits de las restricciones alimentarias pedidas (400 si alguna no existe)
+    """
+    try:
+        return dietary_mask(restrictions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/", response_model=List[ProductResponse])
 def get_products(
     skip: int = 0,
@@ -66,8 +83,14 @@ def get_products(
     category: Optional[str] = None,
     search: Optional[str] = None,
     min_eco_score: Optional[float] = None,
+    dietary_restrictions: List[str] = Query([]),
     db: Session = Depends(get_db)
 ):
+    """
+    dietary_restrictions: solo productos que cumplen todas las restricciones
+    (vegetarian, vegan, gluten_free; se puede repetir el parámetro)
+    """
+    dietary_flags = parse_dietary_restrictions(dietary_restrictions)
     query = db.query(Product)
     
     if category:
@@ -79,6 +102,9 @@ def get_products(
     if min_eco_score is not None:
         query = query.filter(Product.eco_score >= min_eco_score)
     
+    if dietary_flags:
+        query = query.filter(Product.dietary_flags.op('&')(dietary_flags) == dietary_flags)
+    
     products = query.offset(skip).limit(limit).all()
     return products
 
@@ -100,7 +126,9 @@ def create_product(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    db_product = Product(**product.dict(), source_api="manual")
+    data = product.dict()
+    dietary_flags = parse_dietary_restrictions(data.pop('dietary_restrictions'))
+    db_product = Product(**data, dietary_flags=dietary_flags, source_api="manual")
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
@@ -140,48 +168,65 @@ def get_product_sustainability(product_id: int, db: Session = Depends(get_db)):
     
     return calculate_sustainability_score(product_dict, all_products_dicts)
 
+def product_to_dict(p: Product) -> dict:
+    """
+    Campos del producto que usan las sustituciones (incluye macronutrientes
+    para la similitud nutricional)
+    """
+    return {
+        'id': p.id,
+        'name': p.name,
+        'price': p.price,
+        'category': p.category,
+        'eco_score': p.eco_score,
+        'carbon_footprint': p.carbon_footprint,
+        'water_usage': p.water_usage,
+        'packaging_score': p.packaging_score,
+        'social_score': p.social_score,
+        'calories': p.calories,
+        'protein': p.protein,
+        'fat': p.fat,
+        'carbs': p.carbs,
+        'dietary_flags': p.dietary_flags or 0
+    }
+
+def load_substitute_index(db: Session) -> SubstituteIndex:
+    """
+    Índice de sustitutos de todo el catálogo (por categoría, ordenado por
+    precio y eco-score). Se reutiliza mientras no haya escrituras sobre products
+    """
+    def load():
+        products = [product_to_dict(p) for p in db.query(Product).all()]
+        return SubstituteIndex(ProductCatalog.from_records(products, default_eco_score=0))
+    
+    return substitute_indexes.catalog(load)
+
 @router.get("/{product_id}/substitutes")
 def get_product_substitutes(
     product_id: int,
     max_results: int = 5,
+    similar_nutrition: bool = False,
+    dietary_restrictions: List[str] = Query([]),
     db: Session = Depends(get_db)
 ):
+    """
+    Con los umbrales por defecto se leen los sustitutos precalculados
+    (product_substitutes). similar_nutrition=true ordena las alternativas por
+    cercanía en macronutrientes (k vecinos más cercanos en el árbol k-d de la categoría).
+    dietary_restrictions: solo sustitutos que cumplen todas las restricciones
+    """
+    dietary_flags = parse_dietary_restrictions(dietary_restrictions)
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Obtener productos de la misma categoría
-    available = db.query(Product).filter(
-        Product.category == product.category,
-        Product.id != product.id
-    ).all()
-    
-    # Convertir a dicts
-    product_dict = {
-        'id': product.id,
-        'name': product.name,
-        'price': product.price,
-        'category': product.category,
-        'carbon_footprint': product.carbon_footprint,
-        'water_usage': product.water_usage,
-        'packaging_score': product.packaging_score,
-        'social_score': product.social_score,
-        'eco_score': product.eco_score
-    }
-    
-    available_dicts = [{
-        'id': p.id,
-        'name': p.name,
-        'price': p.price,
-        'category': p.category,
-        'carbon_footprint': p.carbon_footprint,
-        'water_usage': p.water_usage,
-        'packaging_score': p.packaging_score,
-        'social_score': p.social_score,
-        'eco_score': p.eco_score
-    } for p in available]
+    if not similar_nutrition and not dietary_flags and max_results <= SUBSTITUTE_GRAPH_SIZE:
+        return [product_to_dict(p) for p in stored_substitutes(db, product_id, max(max_results, 0))]
     
-    return find_product_substitutes(product_dict, available_dicts, max_results)
+    return find_product_substitutes(
+        product_to_dict(product), load_substitute_index(db),
+        max_results=max_results, similar_nutrition=similar_nutrition, dietary_flags=dietary_flags
+    )
 
 @router.get("/search/barcode/{barcode}")
 async def search_by_barcode(barcode: str, db: Session = Depends(get_db)):
@@ -1,16 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session, selectinload
+from typing import Dict, List, Optional
+import time
 from pydantic import BaseModel
 
 from app.database import get_db
 from app.models.models import ShoppingList, ShoppingListItem, Product, User
 from app.api.auth import get_current_user
-from app.algorithms.knapsack import optimize_shopping_list
-from app.algorithms.substitution import ProductSubstitution
+from app.api.products import load_substitute_index, parse_dietary_restrictions, product_to_dict
+from app.algorithms.knapsack import (
+    MultiObjectiveKnapsack, check_shopping_list_feasibility, optimize_shopping_list,
+    optimize_shopping_lists, required_cost, sweep_shopping_list, OPTIMIZATION_MODES
+)
+from app.algorithms.catalog import ProductCatalog
+from app.algorithms.pareto import pareto_shopping_lists
+from app.config import OPTIMIZER_WORKERS
+from app.algorithms.substitution import LIST_SUBSTITUTE_CANDIDATES, ProductSubstitution
+from app.services.optimization_cache import category_frontiers, optimization_cache, solver_states
+from app.services.substitute_graph import stored_substitute_sets
 
 router = APIRouter(prefix="/api/shopping-lists", tags=["shopping-lists"])
 
+# Máximo de presupuestos por llamada a /optimize/sweep
+MAX_SWEEP_BUDGETS = 20
+
+# Máximo de listas por llamada a /optimize/batch
+MAX_BATCH_LISTS = 5000
+
+# Tiempo máximo de la búsqueda local posterior en /optimize
+MAX_LOCAL_SEARCH_MS = 2000
+
 class ShoppingListCreate(BaseModel):
     name: str
     budget: Optional[float] = None
@@ -26,6 +46,14 @@ class ShoppingListUpdate(BaseModel):
     name: Optional[str] = None
     budget: Optional[float] = None
 
+class BudgetSweepRequest(BaseModel):
+    budgets: List[float]
+
+class BatchOptimizeRequest(BaseModel):
+    list_ids: List[int]
+    mode: str = "genetic"
+    max_quantity: int = 1
+
 class ShoppingListResponse(BaseModel):
     id: int
     name: str
@@ -42,6 +70,38 @@ class ShoppingListResponse(BaseModel):
 class ShoppingListDetailResponse(ShoppingListResponse):
     items: List[dict]
 
+def load_product_catalog(db: Session) -> ProductCatalog:
+    """
+    Obtiene todos los productos disponibles como catálogo compacto
+    (consulta por columnas, sin instanciar objetos ORM).
+    El score nutricional viene guardado en la tabla (filas sin backfill cuentan como 0).
+    Se reutiliza mientras no haya escrituras sobre products
+    """
+    def load():
+        rows = db.query(
+            Product.id, Product.name, Product.price, Product.eco_score,
+            Product.nutrition_score, Product.category, Product.dietary_flags
+        ).all()
+        available_products = [{
+            'id': row.id,
+            'name': row.name,
+            'price': row.price,
+            'eco_score': row.eco_score,
+            'nutrition_score': row.nutrition_score or 0,
+            'category': row.category,
+            'dietary_flags': row.dietary_flags
+        } for row in rows]
+        return ProductCatalog.from_records(available_products)
+    
+    return optimization_cache.catalog(load)
+
+def items_changed(shopping_list: ShoppingList):
+    """
+    Marca un cambio de items hecho por el usuario: /optimize deja de
+    reutilizar el resultado en caché de la versión anterior
+    """
+    shopping_list.items_version = (shopping_list.items_version or 0) + 1
+
 @router.get("/", response_model=List[ShoppingListResponse])
 def get_shopping_lists(
     current_user: User = Depends(get_current_user),
@@ -183,6 +243,7 @@ def add_item_to_list(
         ShoppingListItem.product_id == item.product_id
     ).first()
     
+    items_changed(shopping_list)
     if existing:
         existing.quantity += item.quantity
         db.commit()
@@ -226,6 +287,7 @@ def update_item_quantity(
         raise HTTPException(status_code=400, detail="Quantity must be at least 1")
     
     item.quantity = update_data.quantity
+    items_changed(shopping_list)
     db.commit()
     db.refresh(item)
     
@@ -256,16 +318,204 @@ def remove_item_from_list(
     
     # Simplemente eliminar el item (los totales se calculan dinámicamente en GET)
     db.delete(item)
+    items_changed(shopping_list)
     db.commit()
     
     return {"message": "Item deleted successfully"}
 
+def optimization_summary(result: dict) -> dict:
+    """
+    Resumen de un resultado de optimización en el formato de respuesta de la API
+    """
+    return {
+        "selected_items": len(result['products']),
+        "total_cost": result['metrics']['total_cost'],
+        "total_eco_score": result['metrics']['eco_score'],
+        "savings": result['metrics']['savings'],
+        "optimization_details": {
+            "budget_usage": result['metrics']['budget_usage'],
+            "total_products": result['metrics']['total_products'],
+            "quantities": result['quantities'],
+            "warm_start": result['metrics'].get('warm_start', False),
+            # Solo en branch_and_bound y fptas: brecha respecto a la cota superior (0 = óptimo)
+            "optimality_gap": result['metrics'].get('optimality_gap'),
+            # Solo en sharded: categorías resueltas y cuántas fronteras venían de la caché
+            "shards": result['metrics'].get('shards'),
+            "cached_shards": result['metrics'].get('cached_shards'),
+            # Candidatos descartados por dominancia (o por max_candidates) antes de optimizar
+            "pruned": result['metrics'].get('pruned', 0),
+            "local_search_moves": result['metrics'].get('local_search_moves', 0),
+            "products": result['products']
+        }
+    }
+
+@router.get("/optimize/cache")
+def get_optimization_cache_stats(current_user: User = Depends(get_current_user)):
+    """
+    Contadores de la caché de optimización (aciertos, fallos, entradas), de
+    los estados guardados para reoptimizar en caliente y de las fronteras por
+    categoría del modo sharded
+    """
+    stats = optimization_cache.stats()
+    stats["solver_states"] = solver_states.stats()
+    stats["category_frontiers"] = category_frontiers.stats()
+    return stats
+
+@router.post("/optimize/batch")
+def optimize_lists_batch(
+    batch: BatchOptimizeRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Optimiza muchas listas del usuario con un solo catálogo: las resoluciones
+    se reparten en el pool de procesos y los resultados se escriben con
+    sentencias masivas. Las listas inexistentes, sin presupuesto o cuyos
+    productos no caben en el presupuesto se omiten (en "skipped")
+    """
+    if batch.mode not in OPTIMIZATION_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid mode. Use one of: {', '.join(OPTIMIZATION_MODES)}")
+    
+    if not batch.list_ids or len(batch.list_ids) > MAX_BATCH_LISTS:
+        raise HTTPException(status_code=400, detail=f"Provide between 1 and {MAX_BATCH_LISTS} list ids")
+    
+    if batch.max_quantity < 1 or (batch.mode == "multiple_choice" and batch.max_quantity > 1):
+        raise HTTPException(status_code=400, detail="Invalid max_quantity for this mode")
+    
+    start = time.perf_counter()
+    
+    lists = db.query(ShoppingList).options(selectinload(ShoppingList.items)).filter(
+        ShoppingList.id.in_(batch.list_ids),
+        ShoppingList.owner_id == current_user.id
+    ).all()
+    found = {shopping_list.id: shopping_list for shopping_list in lists}
+    catalog = load_product_catalog(db)
+    
+    skipped = []
+    to_optimize = []
+    for list_id in dict.fromkeys(batch.list_ids):
+        if list_id not in found:
+            skipped.append({"list_id": list_id, "reason": "Shopping list not found"})
+            continue
+        shopping_list = found[list_id]
+        if not shopping_list.budget:
+            skipped.append({"list_id": list_id, "reason": "Budget is required for optimization"})
+            continue
+        # El mismo rechazo que /optimize: los requeridos deben caber
+        cost = required_cost(catalog, [item.product_id for item in shopping_list.items])
+        if cost > shopping_list.budget:
+            skipped.append({
+                "list_id": list_id,
+                "reason": f"Required products cost {cost:.0f}, "
+                          f"over the budget of {shopping_list.budget:.0f}"
+            })
+            continue
+        to_optimize.append(shopping_list)
+    
+    # Mismos requeridos y cantidades máximas que /optimize
+    jobs = [
+        {
+            "budget": shopping_list.budget,
+            "required_product_ids": [item.product_id for item in shopping_list.items],
+            "max_quantities": None if batch.mode == "multiple_choice" else {
+                item.product_id: max(item.quantity or 1, batch.max_quantity)
+                for item in shopping_list.items
+            }
+        }
+        for shopping_list in to_optimize
+    ]
+    results = optimize_shopping_lists(
+        catalog, jobs, mode=batch.mode, workers=OPTIMIZER_WORKERS,
+        max_quantity=batch.max_quantity
+    ) if jobs else []
+    
+    # Escritura masiva: un DELETE, un INSERT de items y un UPDATE de listas
+    optimized_ids = [shopping_list.id for shopping_list in to_optimize]
+    if optimized_ids:
+        db.query(ShoppingListItem).filter(
+            ShoppingListItem.shopping_list_id.in_(optimized_ids)
+        ).delete(synchronize_session=False)
+        
+        item_rows = [
+            {
+                "shopping_list_id": list_id,
+                "product_id": product['id'],
+                "quantity": result['quantities'][product['id']],
+                "is_substituted": False
+            }
+            for list_id, result in zip(optimized_ids, results)
+            for product in result['products']
+        ]
+        if item_rows:
+            db.execute(insert(ShoppingListItem), item_rows)
+        
+        db.execute(update(ShoppingList), [
+            {
+                "id": list_id,
+                "is_optimized": True,
+                "total_cost": result['metrics']['total_cost'],
+                "total_savings": result['metrics']['savings'],
+                "total_eco_score": result['metrics']['eco_score']
+            }
+            for list_id, result in zip(optimized_ids, results)
+        ])
+        db.commit()
+    
+    elapsed = time.perf_counter() - start
+    
+    return {
+        "optimized": len(optimized_ids),
+        "skipped": skipped,
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "lists_per_second": round(len(optimized_ids) / elapsed, 2) if elapsed > 0 else 0,
+        "results": [
+            {
+                "list_id": list_id,
+                "selected_items": len(result['products']),
+                "total_cost": result['metrics']['total_cost'],
+                "total_eco_score": result['metrics']['eco_score'],
+                "savings": result['metrics']['savings']
+            }
+            for list_id, result in zip(optimized_ids, results)
+        ]
+    }
+
+def parse_category_limits(entries: Optional[List[str]]) -> Dict[str, int]:
+    """
+    Cupos por categoría en formato "Categoría:N" (400 si alguno no es válido)
+    """
+    limits = {}
+    for entry in entries or []:
+        category, _, limit = entry.rpartition(':')
+        if not category or not limit.strip().isdigit():
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid category limit '{entry}'. Use Category:N with N >= 0"
+            )
+        limits[category.strip()] = int(limit)
+    return limits
+
 @router.post("/{list_id}/optimize")
 def optimize_list(
     list_id: int,
+    mode: str = "genetic",
+    parallel: bool = False,
+    deadline_ms: Optional[int] = None,
+    max_quantity: int = 1,
+    category_limit: int = 1,
+    category_limits: List[str] = Query([]),
+    epsilon: float = 0.1,
+    prune: bool = False,
+    max_candidates: Optional[int] = None,
+    local_search_ms: Optional[float] = None,
+    seed: Optional[int] = None,
+    warm_start: bool = False,
+    dietary_restrictions: List[str] = Query([]),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    dietary_flags = parse_dietary_restrictions(dietary_restrictions)
+    limits_by_category = parse_category_limits(category_limits)
     shopping_list = db.query(ShoppingList).filter(
         ShoppingList.id == list_id,
         ShoppingList.owner_id == current_user.id
@@ -277,39 +527,103 @@ def optimize_list(
     if not shopping_list.budget:
         raise HTTPException(status_code=400, detail="Budget is required for optimization")
     
-    # Obtener productos de la lista
-    current_products = []
-    for item in shopping_list.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        current_products.append({
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'eco_score': product.eco_score,
-            'protein': product.protein or 0,
-            'calories': product.calories or 0,
-            'fat': product.fat or 0,
-            'quantity': item.quantity
-        })
-    
-    # Obtener todos los productos disponibles
-    all_products = db.query(Product).all()
-    available_products = []
-    for p in all_products:
-        available_products.append({
-            'id': p.id,
-            'name': p.name,
-            'price': p.price,
-            'eco_score': p.eco_score,
-            'protein': p.protein or 0,
-            'calories': p.calories or 0,
-            'fat': p.fat or 0,
-            'category': p.category
-        })
-    
-    # Optimizar
-    required_ids = [p['id'] for p in current_products]
-    result = optimize_shopping_list(available_products, shopping_list.budget, required_ids)
+    if mode not in OPTIMIZATION_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid mode. Use one of: {', '.join(OPTIMIZATION_MODES)}")
+    
+    if deadline_ms is not None and deadline_ms <= 0:
+        raise HTTPException(status_code=400, detail="deadline_ms must be positive")
+    
+    if max_quantity < 1:
+        raise HTTPException(status_code=400, detail="max_quantity must be at least 1")
+    
+    if mode == "multiple_choice" and (max_quantity > 1 or category_limit < 0):
+        raise HTTPException(
+            status_code=400,
+            detail="multiple_choice requires max_quantity=1 and a non-negative category_limit"
+        )
+    
+    if limits_by_category and mode != "multiple_choice":
+        raise HTTPException(status_code=400, detail="category_limits requires mode=multiple_choice")
+    
+    if not 0 < epsilon < 1:
+        raise HTTPException(status_code=400, detail="epsilon must be between 0 and 1")
+    
+    if max_candidates is not None and max_candidates < 1:
+        raise HTTPException(status_code=400, detail="max_candidates must be at least 1")
+    
+    if local_search_ms is not None and not 0 < local_search_ms <= MAX_LOCAL_SEARCH_MS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"local_search_ms must be between 0 and {MAX_LOCAL_SEARCH_MS}"
+        )
+    
+    # Productos de la lista (requeridos)
+    required_ids = [item.product_id for item in shopping_list.items]
+    
+    # Unidades máximas: max_quantity para todo el catálogo, y al menos la
+    # cantidad que el usuario ya tenía en la lista para sus productos
+    # (multiple_choice elige productos distintos, una unidad de cada uno)
+    max_quantities = None
+    if mode != "multiple_choice":
+        max_quantities = {
+            item.product_id: max(item.quantity or 1, max_quantity)
+            for item in shopping_list.items
+        }
+    
+    # Rechazar antes de la búsqueda completa si los requeridos no caben (solo
+    # su costo: el gasto máximo por bitsets queda para /feasibility)
+    cost = required_cost(load_product_catalog(db), required_ids)
+    if cost > shopping_list.budget:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Required products cost {cost:.0f}, "
+                   f"over the budget of {shopping_list.budget:.0f}"
+        )
+    
+    # Optimizar (o reutilizar el resultado si nada relevante cambió: los
+    # requeridos y sus cantidades quedan cubiertos por la versión de los items)
+    # parallel: islas del algoritmo genético repartidas en el pool de procesos,
+    # o en modo sharded categorías resueltas a la vez en el pool de hilos
+    # deadline_ms: tiempo máximo del branch-and-bound (retorna la mejor solución hallada)
+    # epsilon: en fptas la solución vale al menos (1 - epsilon) del óptimo
+    # prune: opcional, descarta productos dominados en su categoría (no cambia el óptimo);
+    # max_candidates además limita los candidatos a los de mayor valor por peso
+    # local_search_ms: búsqueda local posterior (agregar / quitar / intercambiar)
+    # seed: semilla del algoritmo genético (mismo resultado en cada llamada)
+    # warm_start: parte del estado guardado del último cálculo de esta lista y
+    # guarda el nuevo (tabla o población, solo para quien reoptimiza seguido)
+    # category_limits: cupos de categorías puntuales en multiple_choice (las
+    # demás usan category_limit)
+    # dietary_restrictions: los productos agregados cumplen esas restricciones
+    workers = OPTIMIZER_WORKERS if parallel else 1
+    cache_key = optimization_cache.key(
+        list_id, shopping_list.items_version, shopping_list.budget,
+        MultiObjectiveKnapsack(shopping_list.budget).objective_weights(),
+        mode=mode, deadline_ms=deadline_ms, max_quantity=max_quantity,
+        category_limit=category_limit, category_limits=tuple(sorted(limits_by_category.items())),
+        epsilon=epsilon if mode == "fptas" else None,
+        prune=prune, max_candidates=max_candidates, local_search_ms=local_search_ms, seed=seed,
+        warm_start=warm_start, dietary_flags=dietary_flags
+    )
+    
+    def solve():
+        # Con warm_start se parte del estado del último cálculo de esta lista
+        # (si el catálogo no cambió)
+        result = optimize_shopping_list(
+            load_product_catalog(db), shopping_list.budget, required_ids, mode=mode, workers=workers,
+            deadline_ms=deadline_ms, max_quantity=max_quantity, max_quantities=max_quantities,
+            category_limit=category_limit, category_limits=limits_by_category,
+            warm_start=solver_states.get(list_id) if warm_start else None, keep_state=warm_start,
+            epsilon=epsilon, prune=prune, max_candidates=max_candidates,
+            local_search_ms=local_search_ms, frontier_cache=category_frontiers, seed=seed,
+            dietary_flags=dietary_flags
+        )
+        state = result.pop("state", None)
+        if state is not None:
+            solver_states.put(list_id, state)
+        return result
+    
+    result = optimization_cache.get_or_compute(cache_key, solve)
     
     # ELIMINAR items actuales
     db.query(ShoppingListItem).filter(
@@ -321,7 +635,7 @@ def optimize_list(
         new_item = ShoppingListItem(
             shopping_list_id=list_id,
             product_id=product['id'],
-            quantity=1,
+            quantity=result['quantities'][product['id']],
             is_substituted=False
         )
         db.add(new_item)
@@ -334,26 +648,132 @@ def optimize_list(
     
     db.commit()
     
-    return {
-        "message": "List optimized successfully",
-        "selected_items": len(result['products']),
-        "total_cost": result['metrics']['total_cost'],
-        "total_eco_score": result['metrics']['eco_score'],
-        "savings": result['metrics']['savings'],
-        "optimization_details": {
-            "budget_usage": result['metrics']['budget_usage'],
-            "total_products": result['metrics']['total_products'],
-            "products": result['products']
+    return {"message": "List optimized successfully", **optimization_summary(result)}
+
+@router.get("/{list_id}/feasibility")
+def get_list_feasibility(
+    list_id: int,
+    max_quantity: int = 1,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Consulta rápida (sin optimizar): si los productos de la lista caben en el
+    presupuesto y el mayor gasto posible agregando productos del catálogo
+    """
+    shopping_list = db.query(ShoppingList).filter(
+        ShoppingList.id == list_id,
+        ShoppingList.owner_id == current_user.id
+    ).first()
+    
+    if not shopping_list:
+        raise HTTPException(status_code=404, detail="Shopping list not found")
+    
+    if not shopping_list.budget:
+        raise HTTPException(status_code=400, detail="Budget is required for optimization")
+    
+    if max_quantity < 1:
+        raise HTTPException(status_code=400, detail="max_quantity must be at least 1")
+    
+    return check_shopping_list_feasibility(
+        load_product_catalog(db), shopping_list.budget,
+        [item.product_id for item in shopping_list.items],
+        max_quantity=max_quantity,
+        max_quantities={
+            item.product_id: max(item.quantity or 1, max_quantity)
+            for item in shopping_list.items
         }
+    )
+
+@router.post("/{list_id}/optimize/sweep")
+def optimize_list_sweep(
+    list_id: int,
+    sweep: BudgetSweepRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Listas óptimas (modo exacto) para varios presupuestos con una sola
+    resolución; no modifica la lista
+    """
+    shopping_list = db.query(ShoppingList).filter(
+        ShoppingList.id == list_id,
+        ShoppingList.owner_id == current_user.id
+    ).first()
+    
+    if not shopping_list:
+        raise HTTPException(status_code=404, detail="Shopping list not found")
+    
+    if not sweep.budgets or len(sweep.budgets) > MAX_SWEEP_BUDGETS:
+        raise HTTPException(status_code=400, detail=f"Provide between 1 and {MAX_SWEEP_BUDGETS} budgets")
+    
+    if any(budget <= 0 for budget in sweep.budgets):
+        raise HTTPException(status_code=400, detail="Budgets must be positive")
+    
+    required_ids = [item.product_id for item in shopping_list.items]
+    results = sweep_shopping_list(load_product_catalog(db), sweep.budgets, required_ids)
+    
+    return {
+        "total_budgets": len(results),
+        "results": [
+            {"budget": result['budget'], **optimization_summary(result)}
+            for result in results
+        ]
+    }
+
+@router.post("/{list_id}/optimize/pareto")
+def optimize_list_pareto(
+    list_id: int,
+    seed: Optional[int] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Frente de Pareto (NSGA-II) de listas no dominadas en costo, eco-score y
+    nutrición. No modifica la lista: el cliente elige la solución localmente.
+    Con seed el frente es el mismo en cada llamada
+    """
+    shopping_list = db.query(ShoppingList).filter(
+        ShoppingList.id == list_id,
+        ShoppingList.owner_id == current_user.id
+    ).first()
+    
+    if not shopping_list:
+        raise HTTPException(status_code=404, detail="Shopping list not found")
+    
+    if not shopping_list.budget:
+        raise HTTPException(status_code=400, detail="Budget is required for optimization")
+    
+    required_ids = [item.product_id for item in shopping_list.items]
+    result = pareto_shopping_lists(
+        load_product_catalog(db), shopping_list.budget, required_ids, seed=seed
+    )
+    
+    return {
+        "budget": shopping_list.budget,
+        "total_solutions": len(result['solutions']),
+        "solutions": result['solutions'],
+        "products": result['products']
     }
 
 @router.post("/{list_id}/substitute")
 def substitute_products(
     list_id: int,
     aggressive: bool = False,
+    similar_nutrition: bool = False,
+    within_budget: bool = False,
+    dietary_restrictions: List[str] = Query([]),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """
+    aggressive: acepta sustitutos más caros si son mucho más sostenibles
+    similar_nutrition: prefiere los sustitutos más parecidos en macronutrientes
+    within_budget: elige las sustituciones de toda la lista en conjunto
+    (máxima mejora de eco-score dentro del presupuesto, sin repetir sustitutos)
+    dietary_restrictions: solo sustitutos que cumplen todas las restricciones
+    """
+    dietary_flags = parse_dietary_restrictions(dietary_restrictions)
     shopping_list = db.query(ShoppingList).filter(
         ShoppingList.id == list_id,
         ShoppingList.owner_id == current_user.id
@@ -362,43 +782,46 @@ def substitute_products(
     if not shopping_list:
         raise HTTPException(status_code=404, detail="Shopping list not found")
     
-    # Obtener productos actuales
+    # Obtener productos actuales (con la cantidad de cada item)
     current_products = []
     for item in shopping_list.items:
         product = db.query(Product).filter(Product.id == item.product_id).first()
-        current_products.append({
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'category': product.category,
-            'eco_score': product.eco_score,
-            'carbon_footprint': product.carbon_footprint,
-            'water_usage': product.water_usage,
-            'packaging_score': product.packaging_score,
-            'social_score': product.social_score
-        })
-    
-    # Obtener productos disponibles
-    all_products = db.query(Product).all()
-    available_products = [{
-        'id': p.id,
-        'name': p.name,
-        'price': p.price,
-        'category': p.category,
-        'eco_score': p.eco_score,
-        'carbon_footprint': p.carbon_footprint,
-        'water_usage': p.water_usage,
-        'packaging_score': p.packaging_score,
-        'social_score': p.social_score
-    } for p in all_products]
-    
-    # Aplicar sustituciones
+        current_products.append({**product_to_dict(product), 'quantity': item.quantity})
+    
+    # Sustitutos candidatos de todos los items: con los umbrales por defecto
+    # los precalculados (una consulta), si no desde el índice de productos
     substitution_service = ProductSubstitution()
-    result = substitution_service.substitute_list(
-        current_products, 
-        available_products,
-        aggressive=aggressive
-    )
+    limit = LIST_SUBSTITUTE_CANDIDATES if within_budget else 1
+    if not aggressive and not similar_nutrition and not dietary_flags:
+        stored = stored_substitute_sets(db, [product['id'] for product in current_products], limit)
+        candidates = {
+            product['id']: [
+                substitution_service.describe(
+                    product, product_to_dict(substitute), substitute.price, substitute.eco_score or 0
+                )
+                for substitute in stored.get(product['id'], [])
+            ]
+            for product in current_products
+        }
+    else:
+        candidates = substitution_service.candidate_sets(
+            current_products, 
+            load_substitute_index(db),
+            aggressive=aggressive,
+            similar_nutrition=similar_nutrition,
+            max_results=limit,
+            dietary_flags=dietary_flags
+        )
+    
+    if within_budget:
+        # Elección conjunta: sin sustitutos repetidos y dentro del presupuesto de la lista
+        result = substitution_service.substitute_list_within_budget(
+            current_products, candidates, shopping_list.budget
+        )
+    else:
+        result = substitution_service.summarize([
+            (product, candidates[product['id']]) for product in current_products
+        ])
     
     # ACTUALIZAR items sustituidos en la base de datos
     total_savings = 0
@@ -440,15 +863,21 @@ def substitute_products(
     shopping_list.total_savings = total_savings
     if result.get('substitutions'):
         shopping_list.total_eco_score += total_score_improvement
+        items_changed(shopping_list)
     
     db.commit()
     
-    return {
+    response = {
         "message": f"{len(result.get('substitutions', []))} products substituted",
         "substitutions": result.get('substitutions', []),
         "total_savings": total_savings,
         "average_score_improvement": total_score_improvement / len(result.get('substitutions', [])) if result.get('substitutions') else 0
     }
+    if within_budget:
+        response["total_cost"] = result['total_cost']
+        # Categorías en que se descartaron candidatos para acotar la enumeración
+        response["truncated_categories"] = result['truncated_categories']
+    return response
 
 @router.delete("/{list_id}")
 def delete_shopping_list(
@@ -466,5 +895,6 @@ def delete_shopping_list(
     
     db.delete(shopping_list)
     db.commit()
+    optimization_cache.discard_list(list_id)
     
     return {"message": "Shopping list deleted successfully"}
@@ -0,0 +1,66 @@
+"""
+Script para completar la columna dietary_flags de productos existentes
+Agrega la columna si la tabla se creó antes de que existiera y copia las
+restricciones alimentarias de products_chile.json (por código de barras) a
+los productos cargados desde ese archivo.
+
+Uso: python app/backfill_dietary_flags.py [ruta/a/products_chile.json]
+"""
+
+import sys
+import os
+import json
+
+# Agregar el directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import Session
+
+from app.algorithms.dietary import dietary_mask
+from app.migrations import add_missing_columns
+from app.models.models import Product
+
+
+def backfill_dietary_flags(db: Session, products_data: list, batch_size: int = 1000) -> int:
+    """
+    Guarda la máscara de restricciones de cada producto del JSON que exista
+    en la base (por barcode). Retorna la cantidad de productos actualizados
+    """
+    flags = {
+        prod['barcode']: dietary_mask(prod.get('dietary_restrictions', []))
+        for prod in products_data if prod.get('barcode')
+    }
+    rows = db.query(Product.id, Product.barcode).filter(Product.barcode.in_(flags)).all()
+    
+    for start in range(0, len(rows), batch_size):
+        db.bulk_update_mappings(Product, [
+            {"id": row.id, "dietary_flags": flags[row.barcode]}
+            for row in rows[start:start + batch_size]
+        ])
+    db.commit()
+    return len(rows)
+
+
+def main():
+    from app.database import SessionLocal, engine
+    
+    json_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'products_chile.json'
+    )
+    with open(json_path, 'r', encoding='utf-8') as f:
+        products_data = json.load(f)
+    
+    add_missing_columns(engine)
+    db = SessionLocal()
+    try:
+        updated = backfill_dietary_flags(db, products_data)
+        print(f"✅ Se actualizó dietary_flags de {updated} productos")
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
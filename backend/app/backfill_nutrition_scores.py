@@ -0,0 +1,54 @@
+"""
+Script para completar la columna nutrition_score de productos existentes
+Agrega la columna si la tabla se creó antes de que existiera y calcula el
+score de cada producto con la misma fórmula que usa el modelo al guardar.
+
+Uso: python app/backfill_nutrition_scores.py
+"""
+
+import sys
+import os
+
+# Agregar el directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import Session
+
+from app.algorithms.catalog import calculate_nutrition_score
+from app.migrations import add_missing_columns
+from app.models.models import Product
+
+
+def backfill_nutrition_scores(db: Session, batch_size: int = 1000) -> int:
+    """
+    Recalcula nutrition_score de todos los productos en lotes.
+    Retorna la cantidad de productos actualizados
+    """
+    rows = db.query(Product.id, Product.protein, Product.calories, Product.fat).all()
+    
+    for start in range(0, len(rows), batch_size):
+        db.bulk_update_mappings(Product, [
+            {"id": row.id, "nutrition_score": calculate_nutrition_score(row.protein, row.calories, row.fat)}
+            for row in rows[start:start + batch_size]
+        ])
+    db.commit()
+    return len(rows)
+
+
+def main():
+    from app.database import SessionLocal, engine
+    
+    add_missing_columns(engine)
+    db = SessionLocal()
+    try:
+        updated = backfill_nutrition_scores(db)
+        print(f"✅ Se actualizó nutrition_score de {updated} productos")
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
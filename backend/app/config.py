@@ -8,3 +8,9 @@ SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 USDA_API_KEY = os.getenv("USDA_API_KEY", "DEMO_KEY")
+OPTIMIZER_WORKERS = int(os.getenv("OPTIMIZER_WORKERS", str(os.cpu_count() or 1)))
+OPTIMIZATION_CACHE_SIZE = int(os.getenv("OPTIMIZATION_CACHE_SIZE", "256"))
+OPTIMIZATION_CACHE_TTL = float(os.getenv("OPTIMIZATION_CACHE_TTL", "300"))
+SOLVER_STATE_CACHE_SIZE = int(os.getenv("SOLVER_STATE_CACHE_SIZE", "64"))
+SOLVER_STATE_CACHE_BYTES = int(os.getenv("SOLVER_STATE_CACHE_BYTES", str(256 * 1024 * 1024)))
+FRONTIER_CACHE_SIZE = int(os.getenv("FRONTIER_CACHE_SIZE", "512"))
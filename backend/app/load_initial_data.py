@@ -11,6 +11,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import SessionLocal, engine
 from app.models.models import Base, Product
+from app.algorithms.dietary import dietary_mask
+# Registra el recálculo de product_substitutes al hacer commit
+import app.services.substitute_graph  # noqa: F401
 
 # Crear tablas
 Base.metadata.create_all(bind=engine)
@@ -63,6 +66,7 @@ def load_products():
                 protein=prod.get('protein'),
                 fat=prod.get('fat'),
                 carbs=prod.get('carbs'),
+                dietary_flags=dietary_mask(prod.get('dietary_restrictions', [])),
                 image_url=prod.get('image_url'),
                 description=prod.get('description'),
                 source_api='manual'
@@ -1,14 +1,62 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.database import engine, Base, SessionLocal
 from app.api import auth, products, shopping_lists
 from app.models.models import Product
+from app.algorithms.dietary import dietary_mask
+from app.algorithms.parallel import shutdown_process_pool
+from app.backfill_dietary_flags import backfill_dietary_flags
+from app.backfill_nutrition_scores import backfill_nutrition_scores
+from app.migrations import add_missing_columns
+from app.services.substitute_graph import ensure_product_substitutes
 import json
 import os
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+def find_initial_data_file():
+    """Ruta de products_chile.json (None si no se encuentra)"""
+    possible_paths = [
+        '/app/products_chile.json',  # Docker
+        os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'products_chile.json'),
+        'data/products_chile.json',
+        '../data/products_chile.json'
+    ]
+    
+    for path in possible_paths:
+        if os.path.exists(path):
+            return path
+    return None
+
+def migrate_database():
+    """
+    Agrega las columnas nuevas de tablas existentes (create_all no las
+    agrega) y completa sus valores en los productos ya cargados
+    """
+    added = add_missing_columns(engine)
+    if not added:
+        return
+    
+    print(f"Columnas agregadas: {', '.join(added)}")
+    db = SessionLocal()
+    try:
+        if "products.nutrition_score" in added:
+            backfill_nutrition_scores(db)
+        json_path = find_initial_data_file()
+        if "products.dietary_flags" in added and json_path:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                backfill_dietary_flags(db, json.load(f))
+    except Exception as e:
+        print(f"ERROR: Error completando columnas nuevas: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+# Columnas nuevas de tablas que ya existían
+migrate_database()
+
 # Auto-load initial data if database is empty
 def load_initial_data_if_empty():
     """Carga productos iniciales si la base de datos está vacía"""
@@ -23,18 +71,7 @@ def load_initial_data_if_empty():
         print("Base de datos vacía, cargando productos iniciales...")
         
         # Buscar archivo JSON
-        possible_paths = [
-            '/app/products_chile.json',  # Docker
-            os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'products_chile.json'),
-            'data/products_chile.json',
-            '../data/products_chile.json'
-        ]
-        
-        json_path = None
-        for path in possible_paths:
-            if os.path.exists(path):
-                json_path = path
-                break
+        json_path = find_initial_data_file()
         
         if not json_path:
             print("ADVERTENCIA: No se encontró products_chile.json, base de datos quedará vacía")
@@ -62,6 +99,7 @@ def load_initial_data_if_empty():
                 protein=prod.get('protein'),
                 fat=prod.get('fat'),
                 carbs=prod.get('carbs'),
+                dietary_flags=dietary_mask(prod.get('dietary_restrictions', [])),
                 image_url=prod.get('image_url'),
                 description=prod.get('description'),
                 source_api='manual'
@@ -77,13 +115,34 @@ def load_initial_data_if_empty():
     finally:
         db.close()
 
+def build_product_substitutes_if_empty():
+    """Precalcula los sustitutos si la tabla product_substitutes está vacía"""
+    db = SessionLocal()
+    try:
+        saved = ensure_product_substitutes(db)
+        if saved:
+            print(f"Se precalcularon {saved} sustitutos de productos")
+    except Exception as e:
+        print(f"ERROR: Error precalculando sustitutos: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
 # Ejecutar al iniciar la aplicación
 load_initial_data_if_empty()
+build_product_substitutes_if_empty()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Cierra los pools de procesos e hilos compartidos al apagar la aplicación"""
+    yield
+    shutdown_process_pool()
 
 app = FastAPI(
     title="LiquiVerde API",
     description="API para plataforma de retail inteligente y compras sostenibles",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS - Configurar orígenes permitidos desde variable de entorno
@@ -0,0 +1,35 @@
+"""
+Migración de columnas agregadas a tablas existentes
+create_all solo crea las tablas que faltan: las columnas nuevas de una tabla
+que ya existía se agregan aquí al iniciar la aplicación (ver main.py)
+"""
+
+from typing import List
+
+from sqlalchemy import inspect, text
+
+# (tabla, columna, definición SQL) en el orden en que se agregaron al modelo
+ADDED_COLUMNS = [
+    ("products", "nutrition_score", "FLOAT DEFAULT 0"),
+    ("products", "dietary_flags", "INTEGER NOT NULL DEFAULT 0"),
+    ("shopping_lists", "items_version", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+
+def add_missing_columns(engine) -> List[str]:
+    """
+    Agrega las columnas de ADDED_COLUMNS que no existan en la base.
+    Retorna las agregadas como "tabla.columna"
+    """
+    inspector = inspect(engine)
+    added = []
+    
+    with engine.begin() as connection:
+        for table, column, definition in ADDED_COLUMNS:
+            if not inspector.has_table(table):
+                continue
+            if column not in {c["name"] for c in inspector.get_columns(table)}:
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+                added.append(f"{table}.{column}")
+    
+    return added
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
+from app.algorithms.catalog import calculate_nutrition_score
+from app.algorithms.dietary import restriction_names
 
 class User(Base):
     __tablename__ = "users"
@@ -40,6 +42,10 @@ class Product(Base):
     protein = Column(Float)
     fat = Column(Float)
     carbs = Column(Float)
+    nutrition_score = Column(Float, default=0.0)  # 0-100, derivado de los macronutrientes
+    
+    # Restricciones alimentarias que cumple (máscara de bits, ver app/algorithms/dietary.py)
+    dietary_flags = Column(Integer, default=0, nullable=False, server_default="0")
     
     # Metadata
     image_url = Column(String)
@@ -47,6 +53,30 @@ class Product(Base):
     source_api = Column(String)  # openfoodfacts, usda, manual
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    @property
+    def dietary_restrictions(self):
+        return restriction_names(self.dietary_flags)
+
+# nutrition_score se guarda al crear o modificar el producto para que el
+# optimizador lo lea directamente (ver backfill_nutrition_scores.py)
+@event.listens_for(Product, "before_insert")
+@event.listens_for(Product, "before_update")
+def _store_nutrition_score(mapper, connection, target):
+    target.nutrition_score = calculate_nutrition_score(target.protein, target.calories, target.fat)
+
+class ProductSubstitute(Base):
+    """
+    Sustitutos precalculados de cada producto con los umbrales por defecto
+    (rank 0 = mejor). Se recalculan por categoría al escribir productos
+    (ver app/services/substitute_graph.py)
+    """
+    __tablename__ = "product_substitutes"
+    
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    substitute_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    category = Column(String, nullable=False, index=True)  # "" = sin categoría
 
 class ShoppingList(Base):
     __tablename__ = "shopping_lists"
@@ -60,6 +90,7 @@ class ShoppingList(Base):
     total_savings = Column(Float, default=0.0)
     total_eco_score = Column(Float, default=0.0)
     total_carbon = Column(Float, default=0.0)
+    items_version = Column(Integer, default=0, nullable=False, server_default="0")  # Sube con cada cambio de items del usuario
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -6,6 +6,8 @@ import httpx
 from typing import Dict, Optional, List
 import json
 
+from app.algorithms.dietary import flags_from_tags
+
 class OpenFoodFactsService:
     BASE_URL = "https://world.openfoodfacts.org"
     
@@ -80,6 +82,10 @@ class OpenFoodFactsService:
                 'protein': float(nutriments.get('proteins_100g', 0)),
                 'fat': float(nutriments.get('fat_100g', 0)),
                 'carbs': float(nutriments.get('carbohydrates_100g', 0)),
+                # Restricciones alimentarias declaradas en las etiquetas
+                'dietary_flags': flags_from_tags(
+                    product.get('labels_tags', []) + product.get('ingredients_analysis_tags', [])
+                ),
                 'image_url': product.get('image_url', ''),
                 'source_api': 'openfoodfacts'
             }
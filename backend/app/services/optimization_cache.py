@@ -0,0 +1,225 @@
+"""
+Caché de resultados de optimización (LRU + TTL)
+Evita recalcular /optimize cuando el catálogo, la lista (id y versión de sus
+items), el presupuesto y los pesos no cambiaron. La versión de los items solo
+sube cuando el usuario los edita, no cuando /optimize los reescribe, así que
+repetir la optimización reutiliza el resultado. Cualquier escritura sobre la
+tabla products incrementa la versión del catálogo e invalida la caché.
+
+solver_states guarda por lista el estado del último cálculo (tabla de
+programación dinámica o población final) para reoptimizar en caliente; se
+descarta junto con la caché cuando cambia el catálogo. Como cada tabla
+ocupa memoria proporcional a productos × presupuesto, además del máximo de
+entradas tiene un máximo de bytes (SOLVER_STATE_CACHE_BYTES).
+
+category_frontiers guarda las fronteras por categoría del modo "sharded".
+Su clave ya incluye los productos de la categoría, así que no se invalida
+con cada escritura: solo dejan de usarse las fronteras de las categorías
+que cambiaron, y salen por LRU o TTL.
+
+substitute_indexes guarda el índice de sustitutos (por categoría y precio)
+de la versión actual del catálogo y se invalida junto con él.
+
+La versión vive en memoria del proceso: con varios procesos de API cada uno
+mantiene su propia caché y la invalida con sus propias escrituras.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import (
+    FRONTIER_CACHE_SIZE, OPTIMIZATION_CACHE_SIZE, OPTIMIZATION_CACHE_TTL,
+    SOLVER_STATE_CACHE_BYTES, SOLVER_STATE_CACHE_SIZE
+)
+from app.models.models import Product
+
+
+class OptimizationCache:
+    """
+    Caché LRU con expiración por tiempo y contadores de aciertos/fallos.
+    max_bytes: límite opcional de memoria; el tamaño de cada valor es su
+    atributo nbytes (0 si no lo tiene)
+    """
+    
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300.0,
+                 max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.catalog_version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._bytes = 0
+        self._catalog: Optional[Tuple[int, Any]] = None
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Retorna el valor guardado (o None) y actualiza los contadores
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+    
+    def put(self, key: Hashable, value: Any):
+        size = int(getattr(value, "nbytes", 0) or 0)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (time.monotonic(), value)
+            self._sizes[key] = size
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+    
+    def _remove(self, key: Hashable):
+        del self._entries[key]
+        self._bytes -= self._sizes.pop(key, 0)
+    
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Valor de la caché o, si no está, lo calcula y lo guarda
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+    
+    def catalog(self, load: Callable[[], Any]) -> Any:
+        """
+        Catálogo de productos de la versión actual: solo se recarga desde la
+        base de datos cuando la versión cambió
+        """
+        with self._lock:
+            version = self.catalog_version
+            cached = self._catalog
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        catalog = load()
+        with self._lock:
+            if version == self.catalog_version:
+                self._catalog = (version, catalog)
+        return catalog
+    
+    def invalidate(self):
+        """
+        Nueva versión del catálogo: descarta todas las entradas
+        """
+        with self._lock:
+            self.catalog_version += 1
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+            self._catalog = None
+    
+    def clear(self):
+        """
+        Descarta las entradas y reinicia los contadores
+        """
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+    
+    def key(self, list_id: int, items_version: int, budget: float,
+            weights: Tuple[float, ...], **options) -> Tuple:
+        """
+        Clave de un resultado: versión del catálogo, lista y versión de sus
+        items, presupuesto, pesos del objetivo y demás opciones del optimizador
+        """
+        return (
+            self.catalog_version,
+            list_id,
+            items_version,
+            float(budget),
+            tuple(weights),
+            tuple(sorted(options.items()))
+        )
+    
+    def discard_list(self, list_id: int):
+        """
+        Descarta los resultados de una lista (al eliminarla, para que otra
+        lista con el mismo id no los reutilice)
+        """
+        with self._lock:
+            for key in [k for k in self._entries if isinstance(k, tuple) and k[1] == list_id]:
+                self._remove(key)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "catalog_version": self.catalog_version
+            }
+
+
+optimization_cache = OptimizationCache(OPTIMIZATION_CACHE_SIZE, OPTIMIZATION_CACHE_TTL)
+solver_states = OptimizationCache(
+    SOLVER_STATE_CACHE_SIZE, OPTIMIZATION_CACHE_TTL, max_bytes=SOLVER_STATE_CACHE_BYTES
+)
+category_frontiers = OptimizationCache(FRONTIER_CACHE_SIZE, OPTIMIZATION_CACHE_TTL)
+substitute_indexes = OptimizationCache(1, OPTIMIZATION_CACHE_TTL)
+
+
+# Las escrituras sobre products marcan la sesión y la caché se invalida al
+# hacer commit, para que ninguna lectura previa al commit quede guardada
+# con la versión nueva
+@event.listens_for(Product, "after_insert")
+@event.listens_for(Product, "after_update")
+@event.listens_for(Product, "after_delete")
+def _product_changed(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info["products_changed"] = True
+
+
+# query(Product).update() / .delete() masivos
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _products_bulk_changed(context):
+    if context.mapper is not None and context.mapper.class_ is Product:
+        context.session.info["products_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop("products_changed", False):
+        optimization_cache.invalidate()
+        solver_states.invalidate()
+        substitute_indexes.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("products_changed", None)
@@ -0,0 +1,172 @@
+"""
+Grafo de sustitutos precalculado (tabla product_substitutes)
+Guarda para cada producto sus SUBSTITUTE_GRAPH_SIZE mejores sustitutos con
+los umbrales por defecto, así /api/products/{id}/substitutes y la
+sustitución no agresiva de listas se responden con una consulta indexada.
+
+Se mantiene de forma incremental: las escrituras sobre products anotan en la
+sesión las categorías afectadas (la anterior y la nueva si un producto cambia
+de categoría) y antes del commit se recalculan solo esas categorías, dentro
+de la misma transacción. Los update/delete masivos recalculan todo.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, event, insert, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from app.algorithms.catalog import ProductCatalog
+from app.algorithms.substitution import (
+    DEFAULT_MAX_PRICE_INCREASE, DEFAULT_MIN_SCORE_IMPROVEMENT, SubstituteIndex
+)
+from app.models.models import Product, ProductSubstitute
+
+# Sustitutos guardados por producto (max_results mayores se calculan al vuelo)
+SUBSTITUTE_GRAPH_SIZE = 5
+
+# Marca en session.info para "recalcular todas las categorías"
+ALL_CATEGORIES = "*"
+
+
+def refresh_product_substitutes(session: Session, categories: Optional[Iterable[str]] = None) -> int:
+    """
+    Recalcula los sustitutos de las categorías indicadas (None = todas;
+    "" = productos sin categoría). Retorna la cantidad de filas guardadas
+    """
+    query = session.query(Product.id, Product.price, Product.eco_score, Product.category)
+    if categories is not None:
+        categories = set(categories)
+        if not categories:
+            return 0
+        condition = Product.category.in_(categories)
+        if "" in categories:
+            condition = or_(condition, Product.category.is_(None), Product.category == "")
+        query = query.filter(condition)
+    
+    records = [{
+        'id': row.id,
+        'price': row.price,
+        'eco_score': row.eco_score or 0,
+        'category': row.category or ''
+    } for row in query.all()]
+    
+    clear = delete(ProductSubstitute)
+    if categories is not None:
+        clear = clear.where(ProductSubstitute.category.in_(categories))
+    session.execute(clear)
+    
+    index = SubstituteIndex(ProductCatalog.from_records(records, default_eco_score=0))
+    catalog = index.catalog
+    rows = []
+    for record in records:
+        positions = index.query(
+            catalog.category_code(record['category']),
+            record['price'] * (1 + DEFAULT_MAX_PRICE_INCREASE), record['eco_score'],
+            DEFAULT_MIN_SCORE_IMPROVEMENT, exclude_id=record['id'],
+            max_results=SUBSTITUTE_GRAPH_SIZE
+        )
+        rows.extend(
+            {'product_id': record['id'], 'rank': rank,
+             'substitute_id': int(catalog.ids[i]), 'category': record['category']}
+            for rank, i in enumerate(positions)
+        )
+    
+    if rows:
+        session.execute(insert(ProductSubstitute), rows)
+    return len(rows)
+
+
+def stored_substitutes(db: Session, product_id: int, limit: int = SUBSTITUTE_GRAPH_SIZE) -> List[Product]:
+    """
+    Sustitutos guardados de un producto, del mejor al peor
+    """
+    return (
+        db.query(Product)
+        .join(ProductSubstitute, ProductSubstitute.substitute_id == Product.id)
+        .filter(ProductSubstitute.product_id == product_id)
+        .order_by(ProductSubstitute.rank)
+        .limit(limit)
+        .all()
+    )
+
+
+def stored_substitute_sets(db: Session, product_ids: Iterable[int],
+                           limit: int = SUBSTITUTE_GRAPH_SIZE) -> Dict[int, List[Product]]:
+    """
+    Sustitutos guardados (los limit mejores, en orden) de varios productos
+    con una sola consulta; los productos sin sustitutos no aparecen
+    """
+    rows = (
+        db.query(ProductSubstitute.product_id, Product)
+        .join(Product, ProductSubstitute.substitute_id == Product.id)
+        .filter(ProductSubstitute.product_id.in_(set(product_ids)), ProductSubstitute.rank < limit)
+        .order_by(ProductSubstitute.product_id, ProductSubstitute.rank)
+        .all()
+    )
+    sets: Dict[int, List[Product]] = {}
+    for product_id, product in rows:
+        sets.setdefault(product_id, []).append(product)
+    return sets
+
+
+def ensure_product_substitutes(db: Session) -> int:
+    """
+    Calcula la tabla completa si está vacía y hay productos (bases de datos
+    creadas antes de que existiera). Retorna las filas guardadas
+    """
+    if db.query(ProductSubstitute.product_id).first() is not None:
+        return 0
+    if db.query(Product.id).first() is None:
+        return 0
+    saved = refresh_product_substitutes(db)
+    db.commit()
+    return saved
+
+
+def _mark_categories(session: Optional[Session], categories: Iterable[Optional[str]]):
+    if session is None:
+        return
+    pending: Set[str] = session.info.setdefault("substitute_categories", set())
+    pending.update(category or '' for category in categories)
+
+
+@event.listens_for(Product, "after_insert")
+@event.listens_for(Product, "after_delete")
+def _product_written(mapper, connection, target):
+    _mark_categories(Session.object_session(target), [target.category])
+
+
+@event.listens_for(Product, "before_update")
+def _product_updating(mapper, connection, target):
+    # También la categoría anterior si el producto se movió de categoría
+    # (se lee de la base: el valor anterior no siempre quedó cargado)
+    if inspect(target).attrs.category.history.has_changes():
+        previous = connection.scalar(select(Product.category).where(Product.id == target.id))
+        _mark_categories(Session.object_session(target), [target.category, previous])
+    else:
+        _mark_categories(Session.object_session(target), [target.category])
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _products_bulk_written(context):
+    if context.mapper is not None and context.mapper.class_ is Product:
+        _mark_categories(context.session, [ALL_CATEGORIES])
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_on_commit(session):
+    # Solo sesiones con productos escritos: si hay productos pendientes se
+    # escriben para que los listeners marquen todas las categorías
+    pending = (*session.new, *session.dirty, *session.deleted)
+    if any(isinstance(obj, Product) for obj in pending):
+        session.flush()
+    categories = session.info.pop("substitute_categories", None)
+    if not categories:
+        return
+    refresh_product_substitutes(session, None if ALL_CATEGORIES in categories else categories)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("substitute_categories", None)
@@ -0,0 +1,170 @@
+"""
+Scoreboard de calidad vs. latencia de los modos del optimizador
+Ejecuta cada modo sobre catálogos sintéticos (semilla fija) de distintos
+tamaños y presupuestos y registra tiempo, memoria máxima, fitness y brecha
+respecto al óptimo exacto cuando este se puede calcular. La salida es una
+tabla CSV (o JSON) con filas y columnas en orden estable para comparar
+versiones con diff.
+
+Uso (desde backend/):
+    python -m benchmarks.knapsack_scoreboard
+    python -m benchmarks.knapsack_scoreboard --sizes 100 1000 --budgets 20000 --output scoreboard.csv
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.algorithms.catalog import ProductCatalog
+from app.algorithms.knapsack import OPTIMIZATION_MODES, MultiObjectiveKnapsack
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+DEFAULT_BUDGETS = (10000, 50000)
+
+# Límites para no lanzar corridas que no terminan o no caben en memoria:
+# celdas (productos × columnas) de las tablas de programación dinámica y
+# productos del FPTAS, que es O(n²/epsilon)
+MAX_TABLE_CELLS = 5 * 10 ** 7
+MAX_FPTAS_PRODUCTS = 2000
+
+# Modos que resuelven el mismo problema que "exact" (la brecha tiene sentido)
+UNCONSTRAINED_MODES = ("genetic", "exact", "branch_and_bound", "fptas", "sharded")
+
+COLUMNS = (
+    "products", "budget", "mode", "status", "wall_ms", "peak_kb",
+    "fitness", "exact_fitness", "gap", "reported_gap", "total_cost", "total_products"
+)
+
+MODE_OPTIONS = {
+    "genetic": {"iterations": 300},
+    "branch_and_bound": {"deadline_ms": 2000},
+    "fptas": {"epsilon": 0.1},
+    "multiple_choice": {"category_limit": 1},
+}
+
+
+def synthetic_catalog(size: int, seed: int = 0, products_per_category: int = 50) -> ProductCatalog:
+    """
+    Catálogo sintético reproducible: precios múltiplos de 10 CLP entre 500 y
+    5000, eco-score y nutrición entre 0 y 100, categorías de ~50 productos
+    """
+    rng = np.random.default_rng(seed)
+    categories = max(1, size // products_per_category)
+    return ProductCatalog(
+        ids=np.arange(1, size + 1),
+        prices=rng.integers(50, 501, size) * 10.0,
+        eco_scores=rng.uniform(0, 100, size).round(1),
+        nutrition_scores=rng.uniform(0, 100, size).round(1),
+        quantities=np.ones(size),
+        categories=[f"Cat{i}" for i in rng.integers(0, categories, size)]
+    )
+
+
+def _skip_reason(mode: str, size: int, budget: float) -> Optional[str]:
+    # Las tablas usan unidades de 10 CLP (el mcd de los precios sintéticos)
+    cells = size * (budget // 10 + 1)
+    if mode in ("exact", "multiple_choice", "sharded") and cells > MAX_TABLE_CELLS:
+        return "skipped:table_too_large"
+    if mode == "fptas" and size > MAX_FPTAS_PRODUCTS:
+        return "skipped:too_many_products"
+    return None
+
+
+def _run(optimizer: MultiObjectiveKnapsack, catalog: ProductCatalog, mode: str, seed: int):
+    return optimizer.optimize_catalog(catalog, mode=mode, seed=seed, **MODE_OPTIONS.get(mode, {}))
+
+
+def run_scoreboard(sizes: Sequence[int] = DEFAULT_SIZES, budgets: Sequence[float] = DEFAULT_BUDGETS,
+                   modes: Sequence[str] = OPTIMIZATION_MODES, seed: int = 0) -> List[Dict]:
+    """
+    Ejecuta todas las combinaciones tamaño × presupuesto × modo.
+    El tiempo se mide sin tracemalloc y la memoria máxima en una segunda
+    corrida con tracemalloc (su costo no contamina los tiempos).
+    El modo exacto se ejecuta primero como referencia de la brecha
+    """
+    ordered_modes = sorted(modes, key=lambda mode: mode != "exact")
+    rows = []
+    
+    for size in sizes:
+        catalog = synthetic_catalog(size, seed)
+        for budget in budgets:
+            optimizer = MultiObjectiveKnapsack(budget)
+            exact_fitness = None
+            size_rows = {}
+            
+            for mode in ordered_modes:
+                row = dict.fromkeys(COLUMNS)
+                row.update(products=size, budget=budget, mode=mode)
+                reason = _skip_reason(mode, size, budget)
+                if reason:
+                    row["status"] = reason
+                    size_rows[mode] = row
+                    continue
+                
+                start = time.perf_counter()
+                positions, metrics = _run(optimizer, catalog, mode, seed)
+                row["wall_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                
+                tracemalloc.start()
+                _run(optimizer, catalog, mode, seed)
+                row["peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+                tracemalloc.stop()
+                
+                fitness = optimizer.fitness_of(catalog, positions)
+                if mode == "exact":
+                    exact_fitness = fitness
+                
+                row.update(
+                    status="ok",
+                    fitness=round(fitness, 6),
+                    exact_fitness=None if exact_fitness is None else round(exact_fitness, 6),
+                    reported_gap=metrics.get("optimality_gap"),
+                    total_cost=metrics["total_cost"],
+                    total_products=metrics["total_products"]
+                )
+                if exact_fitness and mode in UNCONSTRAINED_MODES:
+                    row["gap"] = round(max(0.0, (exact_fitness - fitness) / exact_fitness), 6)
+                size_rows[mode] = row
+            
+            # Filas en el orden pedido de modos, no en el de ejecución
+            rows.extend(size_rows[mode] for mode in modes)
+    
+    return rows
+
+
+def write_rows(rows: List[Dict], output, output_format: str = "csv"):
+    if output_format == "json":
+        json.dump(rows, output, indent=2)
+        output.write("\n")
+        return
+    writer = csv.DictWriter(output, fieldnames=COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Scoreboard de calidad vs. latencia del optimizador")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--budgets", type=float, nargs="+", default=list(DEFAULT_BUDGETS))
+    parser.add_argument("--modes", nargs="+", default=list(OPTIMIZATION_MODES), choices=OPTIMIZATION_MODES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", dest="output_format", choices=("csv", "json"), default="csv")
+    parser.add_argument("--output", help="Archivo de salida (por defecto stdout)")
+    args = parser.parse_args(argv)
+    
+    rows = run_scoreboard(args.sizes, args.budgets, args.modes, args.seed)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as output:
+            write_rows(rows, output, args.output_format)
+    else:
+        write_rows(rows, sys.stdout, args.output_format)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,9 @@ from app.main import app
 from app.database import Base, get_db
 from app.models.models import User, Product, ShoppingList, ShoppingListItem
 from app.api.auth import get_password_hash
+from app.services.optimization_cache import (
+    category_frontiers, optimization_cache, solver_states, substitute_indexes
+)
 
 # Base de datos en memoria para tests
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -27,6 +30,11 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engin
 def db():
     """Fixture de base de datos para cada test"""
     Base.metadata.create_all(bind=engine)
+    # La base se recrea fuera del ORM: descartar catálogos y resultados en caché
+    optimization_cache.invalidate()
+    solver_states.invalidate()
+    substitute_indexes.invalidate()
+    category_frontiers.clear()
     db = TestingSessionLocal()
     try:
         yield db
@@ -0,0 +1,82 @@
+"""
+Tests para el catálogo compacto de productos
+"""
+import pytest
+from app.algorithms.catalog import ProductCatalog, calculate_nutrition_score
+from app.algorithms.knapsack import optimize_shopping_list
+from app.algorithms.substitution import ProductSubstitution
+
+
+@pytest.fixture
+def products():
+    return [
+        {"id": 10, "name": "Leche", "price": 1000, "eco_score": 70, "protein": 8, "calories": 150, "fat": 8, "category": "Lácteos"},
+        {"id": 20, "name": "Yogurt", "price": 800, "eco_score": 85, "protein": 5, "calories": 100, "fat": 3, "category": "Lácteos"},
+        {"id": 30, "name": "Pan", "price": 1500, "eco_score": 60, "protein": 9, "calories": 265, "fat": 3.5, "category": "Panadería"},
+        {"id": 40, "name": "Sal", "price": 500, "eco_score": 40, "quantity": 2},
+    ]
+
+
+@pytest.mark.unit
+def test_catalog_arrays_and_lookup(products):
+    """Test que el catálogo guarda arreglos paralelos e índice por id"""
+    catalog = ProductCatalog.from_records(products)
+
+    assert len(catalog) == 4
+    assert catalog.position(30) == 2
+    assert catalog.position(999) is None
+    assert catalog.records[catalog.position(20)] is products[1]
+    assert catalog.total_prices[3] == 1000
+    assert catalog.nutrition_scores[0] == pytest.approx(calculate_nutrition_score(8, 150, 8))
+
+
+@pytest.mark.unit
+def test_catalog_uses_stored_nutrition_score():
+    """Test que el catálogo usa nutrition_score guardado en vez de recalcularlo"""
+    catalog = ProductCatalog.from_records([
+        {"id": 1, "price": 1000, "nutrition_score": 42.0},
+        {"id": 2, "price": 1000, "protein": 10, "calories": 200, "fat": 5},
+    ])
+
+    assert catalog.nutrition_scores[0] == 42.0
+    assert catalog.nutrition_scores[1] == pytest.approx(calculate_nutrition_score(10, 200, 5))
+
+
+@pytest.mark.unit
+def test_catalog_category_codes(products):
+    """Test de la codificación de categorías"""
+    catalog = ProductCatalog.from_records(products)
+
+    lacteos = catalog.category_code("Lácteos")
+    assert catalog.category_codes[0] == lacteos
+    assert catalog.category_codes[1] == lacteos
+    assert catalog.category_codes[3] == -1
+    assert catalog.category_code("") == -1
+    assert catalog.category_code("Inexistente") is None
+
+
+@pytest.mark.unit
+def test_catalog_shared_by_optimizer_and_substitution(products):
+    """Test que el mismo catálogo sirve para optimizar y buscar sustitutos"""
+    catalog = ProductCatalog.from_records(products)
+
+    result = optimize_shopping_list(catalog, 5000, required_product_ids=[10], mode="exact")
+    assert any(p["id"] == 10 for p in result["products"])
+    assert result["metrics"]["total_cost"] <= 5000
+
+    substitutes = ProductSubstitution().find_substitutes(products[0], catalog)
+    assert [s["product"]["id"] for s in substitutes] == [20]
+
+
+@pytest.mark.unit
+def test_catalog_take_with_multipliers(products):
+    """Test que take() arma un catálogo con filas repetidas y cantidades escaladas"""
+    catalog = ProductCatalog.from_records(products)
+
+    packs = catalog.take([0, 0, 3], [1, 2, 1])
+
+    assert len(packs) == 3
+    assert list(packs.total_prices) == [1000, 2000, 1000]
+    assert packs.position(10) == 0
+    assert packs.category_codes[1] == catalog.category_code("Lácteos")
+    assert packs.records[1] is products[0]
@@ -0,0 +1,94 @@
+"""
+Tests para las restricciones alimentarias (máscara de bits)
+"""
+import pytest
+from app.algorithms.catalog import ProductCatalog
+from app.algorithms.dietary import (
+    GLUTEN_FREE, VEGAN, VEGETARIAN, dietary_mask, flags_from_tags, restriction_names, satisfies
+)
+from app.algorithms.knapsack import optimize_shopping_list
+from app.algorithms.substitution import ProductSubstitution
+
+
+@pytest.fixture
+def products():
+    return [
+        {"id": 1, "name": "Leche", "category": "Lácteos", "price": 1000, "eco_score": 50,
+         "dietary_flags": VEGETARIAN | GLUTEN_FREE},
+        {"id": 2, "name": "Leche Avena", "category": "Lácteos", "price": 1100, "eco_score": 80,
+         "dietary_flags": VEGETARIAN | VEGAN},
+        {"id": 3, "name": "Leche Almendra", "category": "Lácteos", "price": 1200, "eco_score": 70,
+         "dietary_flags": VEGETARIAN | VEGAN | GLUTEN_FREE},
+        {"id": 4, "name": "Pollo", "category": "Carnes", "price": 3000, "eco_score": 90,
+         "dietary_flags": GLUTEN_FREE},
+        {"id": 5, "name": "Tofu", "category": "Carnes", "price": 2500, "eco_score": 60,
+         "dietary_flags": VEGETARIAN | VEGAN | GLUTEN_FREE},
+    ]
+
+
+@pytest.mark.unit
+def test_dietary_mask():
+    """Test de nombres a máscara: lo vegano también es vegetariano"""
+    assert dietary_mask([]) == 0
+    assert dietary_mask(None) == 0
+    assert dietary_mask(["vegan"]) == VEGAN | VEGETARIAN
+    assert dietary_mask(["Gluten-Free", "vegetarian"]) == GLUTEN_FREE | VEGETARIAN
+    assert restriction_names(dietary_mask(["vegan"])) == ["vegetarian", "vegan"]
+
+    with pytest.raises(ValueError):
+        dietary_mask(["paleo"])
+
+
+@pytest.mark.unit
+def test_flags_from_openfoodfacts_tags():
+    """Test de las etiquetas de OpenFoodFacts (se ignoran las desconocidas)"""
+    assert flags_from_tags(["en:organic", "en:no-gluten"]) == GLUTEN_FREE
+    assert flags_from_tags(["en:vegan", "en:palm-oil-free"]) == VEGAN | VEGETARIAN
+    assert flags_from_tags(["en:non-vegan", "en:maybe-vegetarian"]) == 0
+    assert flags_from_tags(None) == 0
+
+
+@pytest.mark.unit
+def test_catalog_compatible(products):
+    """Test que el catálogo filtra con un AND sobre las máscaras"""
+    catalog = ProductCatalog.from_records(products)
+    required = dietary_mask(["vegan", "gluten_free"])
+
+    assert catalog.compatible(required).tolist() == [False, False, True, False, True]
+    assert catalog.compatible(0).all()
+    assert [satisfies(flags, required) for flags in catalog.dietary_flags.tolist()] == \
+        catalog.compatible(required).tolist()
+    assert catalog.take([4, 0]).dietary_flags.tolist() == [products[4]["dietary_flags"], products[0]["dietary_flags"]]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("mode", ["exact", "genetic", "branch_and_bound", "multiple_choice", "sharded"])
+def test_optimizer_respects_dietary_flags(products, mode):
+    """Test que el optimizador solo agrega productos compatibles"""
+    required = dietary_mask(["vegan"])
+    result = optimize_shopping_list(
+        products, budget=10000, required_product_ids=[1], mode=mode, dietary_flags=required, seed=1
+    )
+
+    ids = [p["id"] for p in result["products"]]
+    assert 1 in ids
+    assert all(satisfies(p["dietary_flags"], required) for p in result["products"] if p["id"] != 1)
+    assert 4 not in ids
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("similar_nutrition", [False, True])
+def test_substitutes_respect_dietary_flags(products, similar_nutrition):
+    """Test que los sustitutos cumplen las restricciones pedidas"""
+    substitution = ProductSubstitution()
+
+    unrestricted = substitution.find_substitutes(
+        products[0], products, max_price_increase=0.5, similar_nutrition=similar_nutrition
+    )
+    assert {c["product"]["id"] for c in unrestricted} == {2, 3}
+
+    restricted = substitution.find_substitutes(
+        products[0], products, max_price_increase=0.5, similar_nutrition=similar_nutrition,
+        dietary_flags=dietary_mask(["vegan", "gluten_free"])
+    )
+    assert [c["product"]["id"] for c in restricted] == [3]
@@ -0,0 +1,42 @@
+"""
+Tests para el árbol k-d de vecinos más cercanos
+"""
+import numpy as np
+import pytest
+from app.algorithms.kdtree import KDTree
+
+
+def brute_force(points, point, k, accepted):
+    offsets = points - point
+    distances = np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
+    return sorted((distances[i], i) for i in range(len(points)) if accepted[i])[:k]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("leaf_size", [1, 4, 16])
+def test_kdtree_matches_brute_force(leaf_size):
+    """Test que los vecinos coinciden con revisar todos los puntos (con empates y filtro)"""
+    rng = np.random.default_rng(5)
+
+    for _ in range(50):
+        # Coordenadas en una grilla para forzar empates de distancia
+        points = rng.integers(0, 6, (int(rng.integers(1, 150)), 4)) / 5
+        accepted = rng.random(len(points)) < 0.6
+        point = rng.integers(0, 6, 4) / 5
+        k = int(rng.integers(1, 10))
+
+        tree = KDTree(points, leaf_size=leaf_size)
+        neighbors = tree.query(point, k, lambda i: bool(accepted[i]))
+
+        expected = brute_force(points, point, k, accepted)
+        assert [i for i, _ in neighbors] == [i for _, i in expected]
+        assert np.allclose([d for _, d in neighbors], [d for d, _ in expected])
+
+
+@pytest.mark.unit
+def test_kdtree_empty_and_duplicates():
+    """Test con árbol vacío y con puntos repetidos"""
+    assert KDTree(np.zeros((0, 4))).query(np.zeros(4), 3) == []
+
+    tree = KDTree(np.ones((40, 2)), leaf_size=4)
+    assert tree.query(np.ones(2), 3) == [(0, 0.0), (1, 0.0), (2, 0.0)]
@@ -2,7 +2,7 @@
 Tests para el algoritmo de Knapsack Multi-Objetivo
 """
 import pytest
-from app.algorithms.knapsack import optimize_shopping_list
+from app.algorithms.knapsack import MultiObjectiveKnapsack, optimize_shopping_list
 
 
 @pytest.mark.unit
@@ -126,3 +126,578 @@ def test_knapsack_returns_correct_structure():
     assert "savings" in metrics
     assert "total_products" in metrics
     assert "budget_usage" in metrics
+
+
+@pytest.mark.unit
+def test_knapsack_exact_mode_finds_optimum():
+    """Test que el modo exacto encuentra el óptimo (comparado con fuerza bruta)"""
+    from itertools import combinations
+    from app.algorithms.knapsack import MultiObjectiveKnapsack, Product
+
+    products = [
+        Product(1, "A", 2990, 85, 20, category="Lácteos"),
+        Product(2, "B", 1590, 40, 60, category="Arroz"),
+        Product(3, "C", 4490, 95, 35, category="Carnes"),
+        Product(4, "D", 990, 30, 10, category="Verduras"),
+        Product(5, "E", 3490, 70, 45, category="Frutas"),
+        Product(6, "F", 2190, 60, 25, category="Panadería"),
+    ]
+    optimizer = MultiObjectiveKnapsack(budget=8000)
+
+    best = max(
+        optimizer.fitness(list(combo))
+        for r in range(len(products) + 1)
+        for combo in combinations(products, r)
+    )
+
+    solution, metrics = optimizer.optimize(products, mode="exact")
+
+    assert optimizer.fitness(solution) == pytest.approx(best)
+    assert metrics["total_cost"] <= 8000
+
+
+@pytest.mark.unit
+def test_knapsack_exact_mode_keeps_required_products():
+    """Test que el modo exacto mantiene los productos requeridos"""
+    products = [
+        {"id": 1, "name": "Requerido", "price": 2000, "eco_score": 50, "protein": 5, "calories": 100, "fat": 2, "category": "Lácteos"},
+        {"id": 2, "name": "Opcional", "price": 1500, "eco_score": 90, "protein": 12, "calories": 200, "fat": 3, "category": "Carnes"},
+        {"id": 3, "name": "Caro", "price": 9000, "eco_score": 99, "protein": 20, "calories": 300, "fat": 1, "category": "Frutas"},
+    ]
+
+    result = optimize_shopping_list(products, 5000, required_product_ids=[1], mode="exact")
+
+    selected_ids = {p["id"] for p in result["products"]}
+    assert selected_ids == {1, 2}
+    assert result["metrics"]["total_cost"] == 3500
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("mode", ["genetic", "exact", "branch_and_bound", "multiple_choice", "fptas", "sharded"])
+def test_knapsack_keeps_required_when_all_products_are_required(mode):
+    """Test que si todo el catálogo es requerido se conserva (el mejor de cada categoría)"""
+    products = [
+        {"id": 1, "name": "Leche", "price": 1000, "eco_score": 50, "category": "Lácteos"},
+        {"id": 2, "name": "Pan", "price": 900, "eco_score": 60, "category": "Panadería"},
+        {"id": 3, "name": "Pan Peor", "price": 800, "eco_score": 40, "category": "Panadería"},
+    ]
+
+    result = optimize_shopping_list(products, 5000, required_product_ids=[1, 2, 3], mode=mode, seed=1)
+
+    assert sorted(p["id"] for p in result["products"]) == [1, 2]
+    assert result["metrics"]["total_cost"] == 1900
+
+
+@pytest.mark.unit
+def test_knapsack_invalid_mode():
+    """Test que un modo desconocido lanza error"""
+    products = [
+        {"id": 1, "name": "Producto", "price": 1000, "eco_score": 80, "category": "Test"},
+    ]
+
+    with pytest.raises(ValueError):
+        optimize_shopping_list(products, 2000, mode="magic")
+
+
+@pytest.mark.unit
+def test_knapsack_genetic_reports_generations():
+    """Test que el algoritmo genético reporta generaciones y se detiene al converger"""
+    from app.algorithms.knapsack import MultiObjectiveKnapsack, Product
+
+    products = [
+        Product(i, f"P{i}", 500 + 137 * i, 40 + i, 10 + i, category=f"Cat{i}")
+        for i in range(15)
+    ]
+    optimizer = MultiObjectiveKnapsack(budget=6000)
+
+    solution, metrics = optimizer.optimize(products, iterations=1000)
+
+    assert "generations" in metrics
+    assert 0 < metrics["generations"] < 1000
+    assert metrics["total_cost"] <= 6000
+    assert optimizer.fitness(solution) > 0
+
+
+@pytest.mark.unit
+def test_knapsack_genetic_close_to_exact():
+    """Test que el algoritmo genético llega cerca del óptimo exacto"""
+    from app.algorithms.knapsack import MultiObjectiveKnapsack, Product
+
+    products = [
+        Product(i, f"P{i}", 300 + (i * 733) % 2500, 20 + (i * 37) % 80, (i * 53) % 60, category=f"Cat{i % 7}")
+        for i in range(40)
+    ]
+    optimizer = MultiObjectiveKnapsack(budget=15000)
+
+    exact_solution, _ = optimizer.optimize(products, mode="exact")
+    genetic_solution, _ = optimizer.optimize(products, mode="genetic")
+
+    exact_fitness = optimizer.fitness(exact_solution)
+    assert optimizer.fitness(genetic_solution) >= 0.95 * exact_fitness
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("workers", [1, 2])
+def test_knapsack_genetic_seed_is_reproducible(workers):
+    """Test que con la misma semilla el algoritmo genético entrega la misma solución"""
+    from app.algorithms.knapsack import MultiObjectiveKnapsack, Product
+
+    products = [
+        Product(i, f"P{i}", 300 + (i * 733) % 2500, 20 + (i * 37) % 80, (i * 53) % 60, category=f"Cat{i % 7}")
+        for i in range(40)
+    ]
+    optimizer = MultiObjectiveKnapsack(budget=15000)
+
+    runs = [
+        optimizer.optimize(products, iterations=30, workers=workers, seed=42)
+        for _ in range(2)
+    ]
+
+    assert [p.id for p in runs[0][0]] == [p.id for p in runs[1][0]]
+    assert runs[0][1] == runs[1][1]
+
+
+@pytest.mark.unit
+def test_genetic_islands_use_spawned_processes():
+    """Test que las islas corren en procesos spawn y reciben solo arreglos"""
+    import pickle
+    from app.algorithms.knapsack import _genetic_search
+    from app.algorithms.parallel import get_process_pool
+
+    assert get_process_pool()._mp_context.get_start_method() == "spawn"
+    # Se envía por referencia (función de módulo), sin el optimizador ni su estado
+    assert pickle.loads(pickle.dumps(_genetic_search)) is _genetic_search
+
+
+@pytest.mark.unit
+def test_batch_fitness_matches_fitness():
+    """Test que la evaluación vectorizada coincide con fitness() producto a producto"""
+    import numpy as np
+    from app.algorithms.knapsack import MultiObjectiveKnapsack, Product
+
+    required = [Product(0, "Requerido", 1000, 60, 20, category="Base")]
+    products = [
+        Product(1, "A", 1500, 80, 30, category="Lácteos"),
+        Product(2, "B", 2500, 50, 10, category="Carnes"),
+        Product(3, "C", 4000, 90, 45, quantity=2, category="Frutas"),
+    ]
+    optimizer = MultiObjectiveKnapsack(budget=6000)
+
+    selection = np.array([
+        [False, False, False],
+        [True, False, False],
+        [True, True, False],
+        [True, True, True],  # Excede el presupuesto
+    ])
+    scores = optimizer.batch_fitness(
+        selection,
+        np.array([p.total_price() for p in products]),
+        np.array([p.total_eco_score() for p in products]),
+        np.array([p.total_nutrition() for p in products]),
+        fixed_totals=[
+            sum(p.total_price() for p in required),
+            sum(p.total_eco_score() for p in required),
+            sum(p.total_nutrition() for p in required)
+        ]
+    )
+
+    for row, score in zip(selection, scores):
+        chosen = required + [p for p, selected in zip(products, row) if selected]
+        assert score == pytest.approx(optimizer.fitness(chosen))
+    assert scores[-1] == -1000.0
+
+
+@pytest.mark.unit
+def test_knapsack_parallel_islands():
+    """Test del modo paralelo: varias islas en el pool de procesos compartido"""
+    from app.algorithms.knapsack import MultiObjectiveKnapsack, Product
+    from app.algorithms.parallel import get_process_pool
+
+    products = [
+        Product(i, f"P{i}", 300 + (i * 733) % 2500, 20 + (i * 37) % 80, (i * 53) % 60, category=f"Cat{i % 7}")
+        for i in range(40)
+    ]
+    optimizer = MultiObjectiveKnapsack(budget=15000)
+
+    solution, metrics = optimizer.optimize(products, workers=3)
+    exact_solution, _ = optimizer.optimize(products, mode="exact")
+
+    assert set(metrics) == {"total_cost", "eco_score", "savings", "total_products", "budget_usage", "generations"}
+    assert metrics["total_cost"] <= 15000
+    assert optimizer.fitness(solution) >= 0.95 * optimizer.fitness(exact_solution)
+    # El pool se reutiliza entre llamadas
+    assert get_process_pool() is get_process_pool()
+
+
+@pytest.mark.unit
+def test_knapsack_branch_and_bound_matches_exact():
+    """Test que branch-and-bound sin límite de tiempo demuestra el óptimo"""
+    from itertools import combinations
+    from app.algorithms.knapsack import MultiObjectiveKnapsack, Product
+
+    products = [
+        Product(i, f"P{i}", 500 + (i * 911) % 3000, 10 + (i * 41) % 90, (i * 29) % 50, category=f"Cat{i}")
+        for i in range(12)
+    ]
+    optimizer = MultiObjectiveKnapsack(budget=9000)
+
+    best = max(
+        optimizer.fitness(list(combo))
+        for r in range(len(products) + 1)
+        for combo in combinations(products, r)
+    )
+
+    solution, metrics = optimizer.optimize(products, mode="branch_and_bound")
+
+    assert optimizer.fitness(solution) == pytest.approx(best)
+    assert metrics["optimality_gap"] == 0
+
+
+@pytest.mark.unit
+def test_knapsack_branch_and_bound_deadline():
+    """Test que con un deadline muy corto retorna una solución factible y su brecha"""
+    from app.algorithms.knapsack import MultiObjectiveKnapsack, Product
+
+    products = [
+        Product(i, f"P{i}", 300 + (i * 733) % 2500, 20 + (i * 37) % 80, (i * 53) % 60, category=f"Cat{i}")
+        for i in range(400)
+    ]
+    optimizer = MultiObjectiveKnapsack(budget=40000)
+
+    solution, metrics = optimizer.optimize(products, mode="branch_and_bound", deadline_ms=0.001)
+    exact_solution, _ = optimizer.optimize(products, mode="exact")
+
+    assert metrics["total_cost"] <= 40000
+    assert 0 <= metrics["optimality_gap"] < 1
+    # La brecha reportada acota la distancia real al óptimo
+    upper = optimizer.fitness(solution) / (1 - metrics["optimality_gap"])
+    assert optimizer.fitness(exact_solution) <= upper + 1e-9
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("epsilon", [0.5, 0.1, 0.01])
+def test_knapsack_fptas_guarantee(epsilon):
+    """Test que fptas queda dentro de (1 - epsilon) del óptimo y reporta su brecha"""
+    from itertools import combinations
+    from app.algorithms.knapsack import MultiObjectiveKnapsack, Product
+
+    products = [
+        Product(i, f"P{i}", 500 + (i * 911) % 3000, 10 + (i * 41) % 90, (i * 29) % 50, category=f"Cat{i}")
+        for i in range(12)
+    ]
+    optimizer = MultiObjectiveKnapsack(budget=9000)
+
+    best = max(
+        optimizer.fitness(list(combo))
+        for r in range(len(products) + 1)
+        for combo in combinations(products, r)
+    )
+    # La garantía aplica a la ganancia sobre la lista vacía
+    base = optimizer.fitness([])
+
+    solution, metrics = optimizer.optimize(products, mode="fptas", epsilon=epsilon)
+
+    assert metrics["total_cost"] <= 9000
+    assert metrics["epsilon"] == epsilon
+    assert optimizer.fitness(solution) - base >= (1 - epsilon) * (best - base) - 1e-9
+    assert 0 <= metrics["optimality_gap"] <= epsilon
+
+
+@pytest.mark.unit
+def test_knapsack_fptas_invalid_epsilon():
+    """Test que fptas rechaza epsilon fuera de (0, 1)"""
+    from app.algorithms.knapsack import MultiObjectiveKnapsack, Product
+
+    products = [Product(1, "P1", 1000, 50, 20, category="Cat1")]
+    optimizer = MultiObjectiveKnapsack(budget=5000)
+
+    with pytest.raises(ValueError):
+        optimizer.optimize(products, mode="fptas", epsilon=1.0)
+
+
+@pytest.mark.unit
+def test_knapsack_bounded_quantities_exact():
+    """Test que el modo exacto con cantidades acotadas coincide con fuerza bruta"""
+    from itertools import product as cartesian
+    from app.algorithms.catalog import calculate_nutrition_score
+    from app.algorithms.knapsack import MultiObjectiveKnapsack
+
+    products = [
+        {"id": 1, "name": "Arroz", "price": 1200, "eco_score": 70, "protein": 7, "calories": 350, "fat": 1, "category": "Arroz"},
+        {"id": 2, "name": "Leche", "price": 990, "eco_score": 60, "protein": 8, "calories": 150, "fat": 8, "category": "Lácteos"},
+        {"id": 3, "name": "Carne", "price": 4500, "eco_score": 40, "protein": 26, "calories": 250, "fat": 15, "category": "Carnes"},
+    ]
+    caps = {1: 5, 2: 3, 3: 2}
+    budget = 9000
+    optimizer = MultiObjectiveKnapsack(budget)
+
+    def score(counts):
+        cost = sum(p["price"] * c for p, c in zip(products, counts))
+        if cost > budget:
+            return -1000
+        value = sum(
+            optimizer.eco_weight * p["eco_score"] / 100 * c
+            + optimizer.nutrition_weight * calculate_nutrition_score(p["protein"], p["calories"], p["fat"]) / 100 * c
+            for p, c in zip(products, counts)
+        )
+        return optimizer.price_weight * (budget - cost) / budget + value
+
+    best = max(score(c) for c in cartesian(*(range(caps[p["id"]] + 1) for p in products)))
+
+    result = optimize_shopping_list(products, budget, mode="exact", max_quantities=caps)
+    counts = [result["quantities"].get(p["id"], 0) for p in products]
+
+    assert score(counts) == pytest.approx(best)
+    assert all(counts[i] <= caps[p["id"]] for i, p in enumerate(products))
+    assert result["metrics"]["total_products"] == sum(counts)
+    assert len(result["products"]) == sum(1 for c in counts if c)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("mode", ["genetic", "branch_and_bound"])
+def test_knapsack_bounded_quantities_respects_caps(mode):
+    """Test que los demás modos respetan presupuesto y máximos, y mantienen requeridos"""
+    products = [
+        {"id": i, "name": f"P{i}", "price": 400 + (i * 317) % 1500, "eco_score": 30 + (i * 13) % 70,
+         "protein": i % 10, "calories": 100 + i * 7, "fat": i % 5, "category": f"Cat{i}"}
+        for i in range(1, 16)
+    ]
+
+    result = optimize_shopping_list(products, 12000, required_product_ids=[1], mode=mode, max_quantity=4)
+
+    assert result["metrics"]["total_cost"] <= 12000
+    assert 1 <= result["quantities"][1] <= 4
+    assert all(1 <= q <= 4 for q in result["quantities"].values())
+    assert sum(result["quantities"].values()) == result["metrics"]["total_products"]
+
+
+@pytest.mark.unit
+def test_knapsack_multiple_choice_matches_brute_force():
+    """Test que el modo multiple_choice es óptimo respetando el límite por categoría"""
+    from itertools import combinations
+    from app.algorithms.knapsack import MultiObjectiveKnapsack, Product
+
+    products = [
+        Product(1, "Leche", 990, 60, 30, category="Lácteos"),
+        Product(2, "Yogurt", 790, 85, 25, category="Lácteos"),
+        Product(3, "Queso", 2990, 70, 45, category="Lácteos"),
+        Product(4, "Pan", 1290, 55, 40, category="Panadería"),
+        Product(5, "Marraqueta", 990, 65, 35, category="Panadería"),
+        Product(6, "Sal", 390, 40, 0),
+        Product(7, "Azúcar", 890, 30, 10),
+    ]
+    optimizer = MultiObjectiveKnapsack(budget=6000)
+
+    def per_category_ok(combo, limit):
+        categories = [p.category for p in combo if p.category]
+        return all(categories.count(c) <= limit for c in categories)
+
+    for limit in (0, 1, 2):
+        best = max(
+            optimizer.fitness(list(combo))
+            for r in range(len(products) + 1)
+            for combo in combinations(products, r)
+            if per_category_ok(combo, limit)
+        )
+
+        solution, metrics = optimizer.optimize(products, mode="multiple_choice", category_limit=limit)
+
+        assert per_category_ok(solution, limit)
+        assert optimizer.fitness(solution) == pytest.approx(best)
+        assert metrics["total_cost"] <= 6000
+
+
+@pytest.mark.unit
+def test_knapsack_multiple_choice_category_limits():
+    """Test de límites por categoría: los requeridos ocupan cupo y 0 excluye la categoría"""
+    products = [
+        {"id": 1, "name": "Leche", "price": 990, "eco_score": 60, "category": "Lácteos"},
+        {"id": 2, "name": "Yogurt", "price": 790, "eco_score": 85, "category": "Lácteos"},
+        {"id": 3, "name": "Pan", "price": 1290, "eco_score": 55, "category": "Panadería"},
+        {"id": 4, "name": "Manzana", "price": 590, "eco_score": 90, "category": "Frutas"},
+        {"id": 5, "name": "Pera", "price": 690, "eco_score": 88, "category": "Frutas"},
+    ]
+
+    result = optimize_shopping_list(
+        products, 10000, required_product_ids=[1], mode="multiple_choice",
+        category_limits={"Panadería": 0, "Frutas": 2}
+    )
+
+    selected_ids = {p["id"] for p in result["products"]}
+    assert selected_ids == {1, 4, 5}
+
+    with pytest.raises(ValueError):
+        optimize_shopping_list(products, 10000, mode="multiple_choice", max_quantity=2)
+
+
+@pytest.mark.unit
+def test_genetic_leaves_budget_unspent_when_it_pays():
+    """Test que el genético no rellena con productos cuyo precio resta más de lo que aportan"""
+    from app.algorithms.catalog import ProductCatalog
+
+    products = [
+        {"id": 1, "price": 500, "eco_score": 90, "protein": 20, "calories": 200, "fat": 1, "category": "A"},
+        {"id": 2, "price": 400, "eco_score": 80, "protein": 10, "calories": 300, "fat": 2, "category": "B"},
+        {"id": 3, "price": 1000, "eco_score": 5, "protein": 0, "calories": 0, "fat": 0, "category": "C"},
+        {"id": 4, "price": 600, "eco_score": 10, "protein": 1, "calories": 20, "fat": 0, "category": "D"},
+    ]
+    catalog = ProductCatalog.from_records(products)
+    exact = MultiObjectiveKnapsack(1503)
+    optimum = exact.fitness_of(catalog, exact.optimize_catalog(catalog, mode="exact")[0])
+
+    for seed in range(5):
+        optimizer = MultiObjectiveKnapsack(1503)
+        positions, metrics = optimizer.optimize_catalog(catalog, mode="genetic", seed=seed)
+
+        assert optimizer.fitness_of(catalog, positions) == pytest.approx(optimum)
+        assert metrics["total_cost"] < 1503 - 500
+
+
+@pytest.fixture
+def warm_start_products():
+    return [
+        {"id": i, "name": f"P{i}", "price": 300 + (i * 733) % 2500, "eco_score": 20 + (i * 37) % 80,
+         "protein": (i * 53) % 30, "calories": 100 + (i * 17) % 300, "fat": i % 7, "category": f"Cat{i % 9}"}
+        for i in range(1, 61)
+    ]
+
+
+@pytest.mark.unit
+def test_knapsack_exact_warm_start_reuses_table(warm_start_products):
+    """Test que el modo exacto reutiliza la tabla al cambiar el presupuesto"""
+    first = optimize_shopping_list(warm_start_products, 15000, [1], mode="exact", keep_state=True)
+    assert first["metrics"]["warm_start"] is False
+
+    for budget in (12000, 16500):
+        warm = optimize_shopping_list(
+            warm_start_products, budget, [1], mode="exact", warm_start=first["state"], keep_state=True
+        )
+        cold = optimize_shopping_list(warm_start_products, budget, [1], mode="exact")
+
+        assert warm["metrics"]["warm_start"] is True
+        assert warm["state"] is first["state"]
+        assert warm["quantities"] == cold["quantities"]
+
+    # Más allá de la holgura de la tabla se vuelve a calcular completa
+    far = optimize_shopping_list(
+        warm_start_products, 40000, [1], mode="exact", warm_start=first["state"], keep_state=True
+    )
+    assert far["metrics"]["warm_start"] is False
+
+
+@pytest.mark.unit
+def test_knapsack_exact_warm_start_with_pruning(warm_start_products):
+    """Test que la poda (que depende del presupuesto) no impide reutilizar la tabla"""
+    products = warm_start_products + [
+        {"id": 100, "name": "Caja", "price": 9000, "eco_score": 90, "protein": 10, "calories": 200, "fat": 1, "category": "Cajas"},
+        {"id": 101, "name": "Caja cara", "price": 9500, "eco_score": 50, "protein": 10, "calories": 200, "fat": 1, "category": "Cajas"},
+        {"id": 102, "name": "Bolsa", "price": 5000, "eco_score": 90, "protein": 10, "calories": 200, "fat": 1, "category": "Bolsas"},
+        {"id": 103, "name": "Bolsa cara", "price": 6000, "eco_score": 50, "protein": 10, "calories": 200, "fat": 1, "category": "Bolsas"},
+    ]
+    first = optimize_shopping_list(products, 15000, [1], mode="exact", prune=True, keep_state=True)
+    assert first["metrics"]["pruned"] > 0
+
+    state = first["state"]
+    pruned_ids, nbytes = state.pruned_ids, state.nbytes
+    for budget in (14000, 12000, 16500):
+        warm = optimize_shopping_list(
+            products, budget, [1], mode="exact", prune=True, warm_start=state, keep_state=True
+        )
+        cold = optimize_shopping_list(products, budget, [1], mode="exact")
+
+        assert warm["metrics"]["warm_start"] is True
+        assert warm["quantities"] == cold["quantities"]
+
+    # El estado reutilizado (ya guardado en la caché) no se modifica
+    assert state.pruned_ids is pruned_ids
+    assert state.nbytes == nbytes
+
+
+@pytest.mark.unit
+def test_knapsack_exact_warm_start_after_changing_max_quantity():
+    """Test que la tabla no se reutiliza si cambian los paquetes de unidades"""
+    products = [
+        {"id": 1, "name": "Arroz", "price": 1000, "eco_score": 80, "protein": 7, "calories": 350, "fat": 1, "category": "Granos"},
+        {"id": 2, "name": "Leche", "price": 500, "eco_score": 60, "protein": 3, "calories": 60, "fat": 3, "category": "Lácteos"},
+    ]
+    state = None
+    for max_quantity in (4, 5, 6):
+        warm = optimize_shopping_list(
+            products, 5500, [1], mode="exact", max_quantity=max_quantity,
+            warm_start=state, keep_state=True
+        )
+        cold = optimize_shopping_list(products, 5500, [1], mode="exact", max_quantity=max_quantity)
+        state = warm["state"]
+
+        assert warm["metrics"]["total_cost"] <= 5500
+        assert warm["quantities"] == cold["quantities"]
+
+
+@pytest.mark.unit
+def test_knapsack_genetic_warm_start_after_adding_item(warm_start_products):
+    """Test que el genético parte de la población anterior aunque cambien los requeridos"""
+    first = optimize_shopping_list(warm_start_products, 15000, [1], mode="genetic", keep_state=True)
+
+    warm = optimize_shopping_list(
+        warm_start_products, 14000, [1, 2], mode="genetic", warm_start=first["state"], keep_state=True
+    )
+
+    assert warm["metrics"]["warm_start"] is True
+    assert warm["metrics"]["total_cost"] <= 14000
+    assert {1, 2} <= set(warm["quantities"])
+    assert warm["state"].population.shape[1] == len(warm["state"].candidate_ids)
+
+
+@pytest.mark.unit
+def test_knapsack_genetic_warm_start_without_shared_candidates(warm_start_products):
+    """Test que sin candidatos en común el genético arranca en frío"""
+    first = optimize_shopping_list(warm_start_products, 15000, mode="genetic", keep_state=True, seed=1)
+    others = [dict(product, id=product["id"] + 1000) for product in warm_start_products]
+
+    warm = optimize_shopping_list(
+        others, 15000, mode="genetic", warm_start=first["state"], keep_state=True, seed=1
+    )
+    cold = optimize_shopping_list(others, 15000, mode="genetic", seed=1)
+
+    assert warm["metrics"]["warm_start"] is False
+    assert warm["quantities"] == cold["quantities"]
+
+
+@pytest.mark.unit
+def test_sweep_matches_individual_solves(warm_start_products):
+    """Test que el barrido de presupuestos coincide con resolver cada uno por separado"""
+    from app.algorithms.knapsack import sweep_shopping_list
+
+    budgets = [8000, 20000, 12000, 500]
+
+    results = sweep_shopping_list(warm_start_products, budgets, [1, 2])
+
+    assert [r["budget"] for r in results] == budgets
+    for result, budget in zip(results, budgets):
+        single = optimize_shopping_list(warm_start_products, budget, [1, 2], mode="exact")
+        assert result["metrics"] == single["metrics"]
+        assert result["quantities"] == single["quantities"]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("workers", [1, 2])
+def test_optimize_shopping_lists_batch(warm_start_products, workers):
+    """Test que el lote coincide con optimizar cada lista por separado y respeta el orden"""
+    from app.algorithms.knapsack import optimize_shopping_lists
+
+    jobs = [
+        {"budget": 9000, "required_product_ids": [1, 2]},
+        {"budget": 15000, "required_product_ids": [5], "max_quantities": {5: 3}},
+        {"budget": 4000},
+    ]
+
+    results = optimize_shopping_lists(warm_start_products, jobs, mode="exact", workers=workers)
+
+    assert len(results) == 3
+    for job, result in zip(jobs, results):
+        single = optimize_shopping_list(
+            warm_start_products, job["budget"], job.get("required_product_ids"),
+            mode="exact", max_quantities=job.get("max_quantities")
+        )
+        assert result["metrics"] == single["metrics"]
+        assert result["quantities"] == single["quantities"]
@@ -0,0 +1,89 @@
+"""
+Tests para la búsqueda local de post-optimización
+"""
+import numpy as np
+import pytest
+from app.algorithms.catalog import ProductCatalog
+from app.algorithms.knapsack import MultiObjectiveKnapsack
+from app.algorithms.local_search import hill_climb
+
+
+@pytest.mark.unit
+def test_hill_climb_add_drop_and_swap():
+    """Test que agrega lo que cabe, quita lo que resta y cambia por algo mejor"""
+    gains = np.array([0.5, -0.1, 0.3, 0.9])
+    prices = np.array([100.0, 50.0, 100.0, 180.0])
+
+    # Parte con el producto de ganancia negativa y con el peor de los que cuestan 100
+    units, moves = hill_climb(gains, prices, np.array([0, 1, 1, 0]), np.ones(4), capacity=300)
+
+    assert units.tolist() == [1, 0, 0, 1]
+    assert moves > 0
+    assert units @ prices <= 300
+
+
+@pytest.mark.unit
+def test_hill_climb_respects_category_quota():
+    """Test que con cupo lleno solo cambia dentro de la misma categoría"""
+    gains = np.array([0.2, 0.8, 0.9])
+    prices = np.array([100.0, 100.0, 100.0])
+    codes = np.array([0, 0, 1])
+    limits = np.array([1, 0])
+
+    units, _ = hill_climb(
+        gains, prices, np.array([1, 0, 0]), np.ones(3), capacity=1000, codes=codes, limits=limits
+    )
+
+    assert units.tolist() == [0, 1, 0]
+
+
+@pytest.mark.unit
+def test_local_search_multiple_choice_without_categories():
+    """Test que sin productos con categoría (cupos vacíos) la búsqueda local funciona"""
+    products = [
+        {"id": i + 1, "name": f"P{i}", "price": 500 + 100 * i, "eco_score": 40 + 5 * i,
+         "protein": 5, "calories": 100, "fat": 2}
+        for i in range(6)
+    ]
+    catalog = ProductCatalog.from_records(products)
+    optimizer = MultiObjectiveKnapsack(budget=3000)
+
+    positions, metrics = optimizer.optimize_catalog(
+        catalog, mode="multiple_choice", local_search_ms=50
+    )
+
+    assert metrics["total_cost"] <= 3000
+    assert "local_search_moves" in metrics
+
+    units, _ = hill_climb(
+        np.array([0.5, 0.1]), np.array([100.0, 100.0]), np.array([0, 0]), np.ones(2),
+        capacity=100, codes=np.array([-1, -1]), limits=np.array([], dtype=np.int64)
+    )
+    assert units.tolist() == [1, 0]
+
+
+@pytest.mark.unit
+def test_local_search_never_worsens_solution():
+    """Test que la búsqueda local mejora (o mantiene) la solución de cualquier modo"""
+    products = [
+        {
+            "id": i + 1, "name": f"P{i}", "price": 300 + (i * 733) % 2500,
+            "eco_score": 20 + (i * 37) % 80, "protein": (i * 53) % 30, "calories": 100,
+            "fat": 2, "category": f"Cat{i % 9}"
+        }
+        for i in range(300)
+    ]
+    catalog = ProductCatalog.from_records(products)
+    optimizer = MultiObjectiveKnapsack(budget=25000)
+
+    for mode, options in [("genetic", {"iterations": 5}), ("fptas", {"epsilon": 0.5}),
+                          ("multiple_choice", {"category_limit": 2})]:
+        base, _ = optimizer.optimize_catalog(catalog, mode=mode, **options)
+        improved, metrics = optimizer.optimize_catalog(
+            catalog, mode=mode, local_search_ms=200, **options
+        )
+
+        assert metrics["total_cost"] <= 25000
+        assert "local_search_moves" in metrics
+        if mode != "genetic":
+            assert optimizer.fitness_of(catalog, improved) >= optimizer.fitness_of(catalog, base) - 1e-9
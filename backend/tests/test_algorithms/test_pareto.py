@@ -0,0 +1,104 @@
+"""
+Tests para el frente de Pareto (NSGA-II)
+"""
+import numpy as np
+import pytest
+from app.algorithms.catalog import ProductCatalog
+from app.algorithms.knapsack import MultiObjectiveKnapsack, Product
+from app.algorithms.pareto import (
+    ParetoKnapsack, crowding_distance, non_dominated_sort, pareto_shopping_lists
+)
+
+
+@pytest.fixture
+def products():
+    return [
+        Product(i, f"P{i}", 300 + (i * 733) % 2500, 20 + (i * 37) % 80, (i * 53) % 60, category=f"Cat{i % 7}")
+        for i in range(30)
+    ]
+
+
+@pytest.mark.unit
+def test_non_dominated_sort():
+    """Test del ordenamiento no dominado (todos los objetivos se maximizan)"""
+    objectives = np.array([
+        [3, 3],
+        [1, 1],  # Dominado por todos
+        [4, 1],
+        [2, 2],  # Dominado por [3, 3]
+    ])
+
+    ranks = non_dominated_sort(objectives)
+
+    assert list(ranks) == [0, 2, 0, 1]
+
+
+@pytest.mark.unit
+def test_crowding_distance_extremes_are_infinite():
+    """Test que los extremos del frente tienen distancia infinita"""
+    objectives = np.array([[0, 4], [1, 3], [2, 1], [4, 0]], dtype=float)
+
+    distance = crowding_distance(objectives)
+
+    assert np.isinf(distance[0]) and np.isinf(distance[3])
+    assert np.all(np.isfinite(distance[1:3]))
+
+
+@pytest.mark.unit
+def test_pareto_front_is_non_dominated_and_within_budget(products):
+    """Test que el frente es no dominado, respeta el presupuesto y está ordenado por costo"""
+    catalog = ProductCatalog.from_products(products)
+    front = ParetoKnapsack(budget=10000).pareto_front(catalog)
+
+    assert len(front) > 1
+    costs = [s["metrics"]["total_cost"] for s in front]
+    assert costs == sorted(costs)
+    assert all(cost <= 10000 for cost in costs)
+
+    objectives = np.array([
+        [-s["metrics"]["total_cost"], s["metrics"]["total_eco"], s["metrics"]["total_nutrition"]]
+        for s in front
+    ])
+    assert np.all(non_dominated_sort(objectives) == 0)
+
+
+@pytest.mark.unit
+def test_pareto_front_contains_weighted_optimum(products):
+    """Test que el frente incluye (o se acerca a) el óptimo del fitness ponderado"""
+    catalog = ProductCatalog.from_products(products)
+    front = ParetoKnapsack(budget=10000).pareto_front(catalog)
+
+    optimizer = MultiObjectiveKnapsack(budget=10000)
+    exact_solution, _ = optimizer.optimize(products, mode="exact")
+    best_in_front = max(
+        optimizer.fitness([products[i] for i in s["positions"]]) for s in front
+    )
+
+    assert best_in_front >= 0.95 * optimizer.fitness(exact_solution)
+
+
+@pytest.mark.unit
+def test_pareto_shopping_lists_keeps_required():
+    """Test del helper: productos requeridos presentes en todas las soluciones"""
+    products = [
+        {"id": 1, "name": "Requerido", "price": 1000, "eco_score": 50, "category": "Lácteos"},
+        {"id": 2, "name": "A", "price": 1500, "eco_score": 90, "protein": 12, "category": "Carnes"},
+        {"id": 3, "name": "B", "price": 800, "eco_score": 40, "protein": 20, "category": "Frutas"},
+    ]
+
+    result = pareto_shopping_lists(products, 4000, required_product_ids=[1])
+
+    assert result["solutions"]
+    assert all(1 in s["product_ids"] for s in result["solutions"])
+    assert {p["id"] for p in result["products"]} >= {1}
+
+
+@pytest.mark.unit
+def test_pareto_front_is_reproducible_with_seed(products):
+    """Test que la misma semilla produce el mismo frente"""
+    catalog = ProductCatalog.from_products(products)
+
+    first = ParetoKnapsack(budget=10000).pareto_front(catalog, seed=7)
+    second = ParetoKnapsack(budget=10000).pareto_front(catalog, seed=7)
+
+    assert [s["positions"] for s in first] == [s["positions"] for s in second]
@@ -0,0 +1,99 @@
+"""
+Tests para la poda por dominancia de candidatos
+"""
+import random
+
+import numpy as np
+import pytest
+from app.algorithms.catalog import ProductCatalog
+from app.algorithms.knapsack import MultiObjectiveKnapsack, optimize_shopping_list
+from app.algorithms.pruning import dominance, prune_candidates
+
+
+@pytest.fixture
+def records():
+    return [
+        {"id": 1, "name": "Leche A", "price": 1000, "eco_score": 80, "protein": 8, "calories": 150, "fat": 3, "category": "Lácteos"},
+        # Más cara, peor eco y misma nutrición que Leche A
+        {"id": 2, "name": "Leche B", "price": 1200, "eco_score": 60, "protein": 8, "calories": 150, "fat": 3, "category": "Lácteos"},
+        # Más cara pero con mejor eco: no está dominada
+        {"id": 3, "name": "Leche C", "price": 1500, "eco_score": 95, "protein": 8, "calories": 150, "fat": 3, "category": "Lácteos"},
+        # Peor que Leche A pero de otra categoría
+        {"id": 4, "name": "Pan", "price": 1300, "eco_score": 50, "protein": 8, "calories": 150, "fat": 3, "category": "Panadería"},
+        {"id": 5, "name": "Sal", "price": 1400, "eco_score": 40, "protein": 0, "calories": 0, "fat": 0},
+    ]
+
+
+@pytest.mark.unit
+def test_dominance_within_category(records):
+    """Test que solo se cuentan dominadores de la misma categoría"""
+    catalog = ProductCatalog.from_records(records)
+
+    counts, costs = dominance(catalog, range(len(records)))
+
+    assert counts.tolist() == [0, 1, 0, 0, 0]
+    assert costs[1] == 1000
+
+
+@pytest.mark.unit
+def test_prune_candidates_by_capacity(records):
+    """Test que un dominado se poda solo si no cabe junto a sus dominadores"""
+    catalog = ProductCatalog.from_records(records)
+    values = MultiObjectiveKnapsack(3000).item_values(catalog)
+    candidates = np.arange(len(records))
+
+    kept, pruned = prune_candidates(catalog, candidates, 2000, values)
+    assert pruned == 1
+    assert 1 not in kept.tolist()
+
+    # Con presupuesto para ambos Leche B aún puede estar en el óptimo
+    kept, pruned = prune_candidates(catalog, candidates, 2200, values)
+    assert pruned == 0
+
+    # Con cupo de un producto por categoría basta un dominador
+    limits = np.ones(len(catalog.categories), dtype=np.int64)
+    kept, pruned = prune_candidates(catalog, candidates, 10000, values, limits=limits)
+    assert kept.tolist() == [0, 2, 3, 4]
+
+    kept, pruned = prune_candidates(catalog, candidates, 10000, values, max_candidates=2)
+    assert len(kept) == 2 and pruned == 3
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("mode,options", [
+    ("exact", {}),
+    ("exact", {"max_quantity": 3}),
+    ("multiple_choice", {"category_limit": 1}),
+    ("multiple_choice", {"category_limit": 2}),
+])
+def test_pruning_keeps_optimum(mode, options):
+    """Test que la poda por dominancia no cambia el valor óptimo"""
+    rng = random.Random(7)
+    pruned_total = 0
+
+    for _ in range(40):
+        records = [
+            {
+                "id": i + 1, "name": f"P{i}", "price": rng.choice([1, 2, 3, 4]) * 500,
+                "eco_score": rng.choice([20, 40, 60, 80]), "protein": rng.choice([0, 5, 10]),
+                "calories": 100, "fat": 1, "category": rng.choice("AB")
+            }
+            for i in range(10)
+        ]
+        budget = rng.randint(2, 16) * 500
+        catalog = ProductCatalog.from_records(records)
+        optimizer = MultiObjectiveKnapsack(budget)
+
+        def fitness(result):
+            positions = [
+                catalog.position(pid) for pid, units in result["quantities"].items() for _ in range(units)
+            ]
+            return optimizer.fitness_of(catalog, positions)
+
+        full = optimize_shopping_list(catalog, budget, mode=mode, **options)
+        pruned = optimize_shopping_list(catalog, budget, mode=mode, prune=True, **options)
+
+        assert fitness(pruned) == pytest.approx(fitness(full))
+        pruned_total += pruned["metrics"]["pruned"]
+
+    assert pruned_total > 0
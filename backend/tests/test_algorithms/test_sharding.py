@@ -0,0 +1,66 @@
+"""
+Tests para la resolución por categorías (modo sharded)
+"""
+import pytest
+from app.algorithms.catalog import ProductCatalog
+from app.algorithms.knapsack import MultiObjectiveKnapsack, optimize_shopping_list
+from app.services.optimization_cache import OptimizationCache
+
+
+@pytest.fixture
+def records():
+    return [
+        {
+            "id": i + 1, "name": f"P{i}", "price": 300 + (i * 733) % 2500,
+            "eco_score": 20 + (i * 37) % 80, "protein": (i * 53) % 30, "calories": 100,
+            "fat": 2, "category": f"Cat{i % 6}" if i % 11 else None
+        }
+        for i in range(120)
+    ]
+
+
+def fitness(optimizer, catalog, result):
+    positions = [catalog.position(pid) for pid, units in result["quantities"].items() for _ in range(units)]
+    return optimizer.fitness_of(catalog, positions)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("max_quantity", [1, 3])
+def test_sharded_matches_exact(records, workers, max_quantity):
+    """Test que combinar las fronteras por categoría da el óptimo de la mochila exacta"""
+    catalog = ProductCatalog.from_records(records)
+    optimizer = MultiObjectiveKnapsack(budget=12000)
+
+    exact = optimize_shopping_list(catalog, 12000, [5, 6], mode="exact", max_quantity=max_quantity)
+    sharded = optimize_shopping_list(
+        catalog, 12000, [5, 6], mode="sharded", workers=workers, max_quantity=max_quantity
+    )
+
+    assert fitness(optimizer, catalog, sharded) == pytest.approx(fitness(optimizer, catalog, exact))
+    assert sharded["metrics"]["total_cost"] <= 12000
+    # Seis categorías más el grupo sin categoría
+    assert sharded["metrics"]["shards"] == 7
+
+
+@pytest.mark.unit
+def test_sharded_frontier_cache(records):
+    """Test que las fronteras se reutilizan hasta que cambian los productos de su categoría"""
+    cache = OptimizationCache(max_entries=64, ttl_seconds=60)
+
+    first = optimize_shopping_list(records, 12000, mode="sharded", frontier_cache=cache)
+    assert first["metrics"]["cached_shards"] == 0
+
+    # Presupuesto menor: las mismas fronteras sirven
+    smaller = optimize_shopping_list(records, 10000, mode="sharded", frontier_cache=cache)
+    assert smaller["metrics"]["cached_shards"] == smaller["metrics"]["shards"]
+
+    # Cambia un producto de Cat1: solo esa frontera se recalcula
+    records[1] = {**records[1], "price": records[1]["price"] + 10}
+    changed = optimize_shopping_list(records, 12000, mode="sharded", frontier_cache=cache)
+    assert changed["metrics"]["cached_shards"] == changed["metrics"]["shards"] - 1
+
+    exact = optimize_shopping_list(records, 12000, mode="exact")
+    catalog = ProductCatalog.from_records(records)
+    optimizer = MultiObjectiveKnapsack(budget=12000)
+    assert fitness(optimizer, catalog, changed) == pytest.approx(fitness(optimizer, catalog, exact))
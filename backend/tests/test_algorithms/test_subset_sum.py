@@ -0,0 +1,83 @@
+"""
+Tests para la suma de subconjuntos con bitsets (factibilidad y gasto máximo)
+"""
+import itertools
+import random
+
+import numpy as np
+import pytest
+from app.algorithms.catalog import ProductCatalog
+from app.algorithms.knapsack import check_shopping_list_feasibility, required_cost
+from app.algorithms.subset_sum import max_spend, reachable_sums
+
+
+@pytest.mark.unit
+def test_reachable_sums_bits():
+    """Test que cada bit encendido es una suma alcanzable"""
+    bits = reachable_sums(np.array([2, 3, 7]), 10)
+
+    sums = [s for s in range(11) if (bits >> s) & 1]
+    assert sums == [0, 2, 3, 5, 7, 9, 10]
+
+
+@pytest.mark.unit
+def test_max_spend_matches_brute_force():
+    """Test que el gasto máximo coincide con la enumeración de cantidades"""
+    rng = random.Random(7)
+
+    for _ in range(100):
+        prices = np.array([rng.randint(1, 60) * 10.0 for _ in range(rng.randint(0, 7))])
+        counts = np.array([rng.randint(0, 3) for _ in prices], dtype=np.int64)
+        capacity = rng.randint(0, 1500)
+
+        spends = {
+            float(np.dot(units, prices)) if len(prices) else 0.0
+            for units in itertools.product(*[range(c + 1) for c in counts])
+        }
+
+        assert max_spend(prices, capacity, counts) == max(s for s in spends if s <= capacity)
+
+
+@pytest.mark.unit
+def test_max_spend_rounds_prices_up():
+    """Test que los precios con decimales no permiten exceder el presupuesto"""
+    assert max_spend(np.array([999.5, 1000.0]), 1999) == 1000
+
+
+@pytest.mark.unit
+def test_max_spend_with_fractional_prices():
+    """Test que el gasto con decimales no se reporta por sobre el real"""
+    assert max_spend(np.array([999.5]), 2000) == 999.5
+    assert max_spend(np.array([999.5, 1000.0]), 1999.5) == 1999.5
+    assert max_spend(np.array([10.1, 20.2]), 30.3) == pytest.approx(30.3)
+    assert max_spend(np.array([10.1, 20.2]), 30.29) == pytest.approx(20.2)
+
+
+@pytest.mark.unit
+def test_feasibility_of_shopping_list():
+    """Test de la consulta rápida con productos requeridos"""
+    records = [
+        {"id": 1, "name": "Leche", "price": 1200, "eco_score": 80, "protein": 8, "calories": 150, "fat": 3, "category": "Lácteos"},
+        {"id": 2, "name": "Pan", "price": 900, "eco_score": 60, "protein": 5, "calories": 250, "fat": 2, "category": "Panadería"},
+        {"id": 3, "name": "Arroz", "price": 1500, "eco_score": 70, "protein": 7, "calories": 350, "fat": 1, "category": "Granos"},
+    ]
+
+    result = check_shopping_list_feasibility(records, 3000, [1])
+    assert result["feasible"]
+    assert result["required_cost"] == 1200
+    assert result["max_spend"] == 2700
+
+    # Con dos unidades de pan cabe justo el presupuesto
+    assert check_shopping_list_feasibility(records, 3000, [1], max_quantity=2)["max_spend"] == 3000
+
+    infeasible = check_shopping_list_feasibility(records, 2000, [1, 3])
+    assert not infeasible["feasible"]
+    assert infeasible["max_spend"] is None
+
+    # El rechazo de /optimize solo calcula el costo de los requeridos
+    assert required_cost(ProductCatalog.from_records(records), [1, 3, 99]) == infeasible["required_cost"] == 2700
+
+    # Con cantidad en el catálogo el costo es el mismo que cuenta el optimizador
+    records[0]["quantity"] = 2
+    assert required_cost(ProductCatalog.from_records(records), [1]) == 2400
+    assert check_shopping_list_feasibility(records, 3000, [1])["required_cost"] == 2400
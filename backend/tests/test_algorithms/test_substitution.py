@@ -289,3 +289,137 @@ def test_find_substitutes_with_empty_list():
     substitutes = find_product_substitutes(target_product, all_products)
     
     assert len(substitutes) == 0
+
+
+@pytest.mark.unit
+def test_substitute_index_matches_full_scan():
+    """Test que el índice por categoría y precio entrega lo mismo que revisar todo el catálogo"""
+    import random
+    from app.algorithms.catalog import ProductCatalog
+    from app.algorithms.substitution import SubstituteIndex
+    
+    rng = random.Random(11)
+    products = [
+        {
+            "id": i,
+            "name": f"Producto {i}",
+            "category": rng.choice(["Lácteos", "Panadería", "Granos"]),
+            "price": rng.randint(5, 30) * 100,
+            "eco_score": rng.randint(0, 20) * 5
+        }
+        for i in range(300)
+    ]
+    index = SubstituteIndex(ProductCatalog.from_records(products, default_eco_score=0))
+    
+    for target in rng.sample(products, 40):
+        for max_price_increase, min_score_improvement, max_results in [(0.0, 1.0, 3), (0.5, 30.0, 5), (0.2, 0.0, 50)]:
+            expected = sorted(
+                (
+                    p for p in products
+                    if p["category"] == target["category"] and p["id"] != target["id"]
+                    and p["price"] <= target["price"] * (1 + max_price_increase)
+                    and p["eco_score"] - target["eco_score"] >= min_score_improvement
+                ),
+                key=lambda p: -p["eco_score"]
+            )[:max_results]
+            
+            substitutes = find_product_substitutes(
+                target, index,
+                max_price_increase=max_price_increase,
+                min_score_improvement=min_score_improvement,
+                max_results=max_results
+            )
+            
+            assert [s["id"] for s in substitutes] == [p["id"] for p in expected]
+
+
+@pytest.mark.unit
+def test_find_substitutes_similar_nutrition():
+    """Test que similar_nutrition ordena por cercanía en macronutrientes y respeta los filtros"""
+    target_product = {
+        "id": 1, "name": "Leche Entera", "category": "Lácteos", "price": 1000, "eco_score": 50,
+        "calories": 150, "protein": 8, "fat": 8, "carbs": 12
+    }
+    all_products = [
+        target_product,
+        # Mejor eco-score pero nutricionalmente muy distinto
+        {"id": 2, "name": "Queso", "category": "Lácteos", "price": 1000, "eco_score": 95,
+         "calories": 400, "protein": 25, "fat": 33, "carbs": 1},
+        {"id": 3, "name": "Leche Semidescremada", "category": "Lácteos", "price": 1000, "eco_score": 60,
+         "calories": 120, "protein": 8, "fat": 4, "carbs": 12},
+        {"id": 4, "name": "Yogur", "category": "Lácteos", "price": 1000, "eco_score": 70,
+         "calories": 100, "protein": 5, "fat": 3, "carbs": 17},
+        # Muy parecida pero demasiado cara
+        {"id": 5, "name": "Leche Premium", "category": "Lácteos", "price": 5000, "eco_score": 90,
+         "calories": 150, "protein": 8, "fat": 8, "carbs": 12},
+    ]
+    
+    by_eco = find_product_substitutes(target_product, all_products)
+    by_nutrition = find_product_substitutes(target_product, all_products, similar_nutrition=True)
+    
+    assert [p["id"] for p in by_eco] == [2, 4, 3]
+    assert [p["id"] for p in by_nutrition] == [3, 4, 2]
+
+
+@pytest.mark.unit
+def test_substitute_list_within_budget():
+    """Test que la sustitución conjunta no repite sustitutos y respeta el presupuesto"""
+    from app.algorithms.substitution import ProductSubstitution
+    
+    all_products = [
+        {"id": 1, "name": "Leche A", "category": "Lácteos", "price": 1000, "eco_score": 40},
+        {"id": 2, "name": "Leche B", "category": "Lácteos", "price": 1000, "eco_score": 45},
+        {"id": 3, "name": "Leche Eco", "category": "Lácteos", "price": 1100, "eco_score": 90},
+        {"id": 4, "name": "Leche Media", "category": "Lácteos", "price": 1000, "eco_score": 72},
+    ]
+    shopping_list = all_products[:2]
+    substitution = ProductSubstitution()
+    
+    # Por item ambos eligen el mismo sustituto
+    greedy = substitution.substitute_list(shopping_list, all_products)
+    assert [s["substitute"]["id"] for s in greedy["substitutions"]] == [3, 3]
+    
+    candidates = substitution.candidate_sets(shopping_list, all_products)
+    
+    result = substitution.substitute_list_within_budget(shopping_list, candidates, budget=2100)
+    assert sorted(s["substitute"]["id"] for s in result["substitutions"]) == [3, 4]
+    assert result["total_cost"] == 2100
+    
+    # Sin espacio para la más cara: la mejor mejora con una sola sustitución
+    result = substitution.substitute_list_within_budget(shopping_list, candidates, budget=2000)
+    assert [(s["original"]["id"], s["substitute"]["id"]) for s in result["substitutions"]] == [(1, 4)]
+    assert result["total_cost"] == 2000
+
+
+@pytest.mark.unit
+def test_substitute_list_within_budget_reports_truncation():
+    """Test que los dominados no cuentan para el tope y que el recorte se informa"""
+    from app.algorithms.substitution import ProductSubstitution
+    
+    all_products = [
+        {"id": 1, "name": "Leche A", "category": "Lácteos", "price": 1000, "eco_score": 40},
+        {"id": 2, "name": "Leche Eco", "category": "Lácteos", "price": 1100, "eco_score": 90},
+        {"id": 3, "name": "Leche Cara", "category": "Lácteos", "price": 1200, "eco_score": 80},
+        {"id": 4, "name": "Leche Media", "category": "Lácteos", "price": 1000, "eco_score": 70},
+        {"id": 5, "name": "Pan", "category": "Panadería", "price": 800, "eco_score": 50},
+    ]
+    substitution = ProductSubstitution()
+    
+    # Leche Cara es dominada por Leche Eco: quedan 3 asignaciones sin recortar
+    shopping_list = [all_products[0]]
+    candidates = substitution.candidate_sets(shopping_list, all_products)
+    assert len(candidates[1]) == 3
+    result = substitution.substitute_list_within_budget(shopping_list, candidates, max_assignments=3)
+    assert result["truncated_categories"] == []
+    assert [s["substitute"]["id"] for s in result["substitutions"]] == [2]
+    
+    # Con un tope menor se quitan candidatos y la categoría se informa
+    result = substitution.substitute_list_within_budget(shopping_list, candidates, max_assignments=2)
+    assert result["truncated_categories"] == ["Lácteos"]
+    assert len(result["substitutions"]) == 1
+    
+    shopping_list = [all_products[0], all_products[4]]
+    candidates = substitution.candidate_sets(shopping_list, all_products)
+    result = substitution.substitute_list_within_budget(shopping_list, candidates, budget=1900, max_assignments=2)
+    assert result["truncated_categories"] == ["Lácteos"]
+    assert result["total_cost"] <= 1900
@@ -113,6 +113,109 @@ def test_get_product_substitutes(client, sample_products, auth_headers):
     assert isinstance(data, list)
 
 
+@pytest.mark.integration
+def test_get_product_substitutes_max_results(client, sample_products, auth_headers, db):
+    """Test que max_results limita la cantidad de alternativas"""
+    from app.models.models import Product
+    
+    original = sample_products[0]
+    for i in range(4):
+        db.add(Product(
+            name=f"Alternativa {i}", category=original.category, price=original.price,
+            eco_score=original.eco_score + 10 + i, protein=1.0, calories=100.0, fat=1.0
+        ))
+    db.commit()
+    
+    response = client.get(
+        f"/api/products/{original.id}/substitutes?max_results=2",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert [p["name"] for p in data] == ["Alternativa 3", "Alternativa 2"]
+
+
+@pytest.mark.integration
+def test_get_product_substitutes_similar_nutrition(client, sample_products, auth_headers, db):
+    """Test que similar_nutrition prioriza la alternativa más parecida en macronutrientes"""
+    from app.models.models import Product
+    
+    original = sample_products[0]
+    db.add(Product(
+        name="Muy sostenible", category=original.category, price=original.price,
+        eco_score=original.eco_score + 30, protein=40.0, calories=900.0, fat=50.0, carbs=0.0
+    ))
+    db.add(Product(
+        name="Parecida", category=original.category, price=original.price,
+        eco_score=original.eco_score + 10, protein=original.protein, calories=original.calories,
+        fat=original.fat, carbs=original.carbs
+    ))
+    db.commit()
+    
+    response = client.get(
+        f"/api/products/{original.id}/substitutes?similar_nutrition=true",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    assert [p["name"] for p in response.json()] == ["Parecida", "Muy sostenible"]
+
+
+@pytest.mark.integration
+def test_get_products_with_dietary_restrictions(client, sample_products, auth_headers, db):
+    """Test de filtro por restricciones alimentarias (todas deben cumplirse)"""
+    from app.algorithms.dietary import GLUTEN_FREE, VEGAN, VEGETARIAN
+    
+    sample_products[0].dietary_flags = VEGETARIAN | GLUTEN_FREE
+    sample_products[1].dietary_flags = VEGETARIAN | VEGAN
+    db.commit()
+    
+    response = client.get(
+        "/api/products/",
+        params={"dietary_restrictions": ["vegetarian"]},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert {p["name"] for p in response.json()} == {sample_products[0].name, sample_products[1].name}
+    
+    response = client.get(
+        "/api/products/",
+        params={"dietary_restrictions": ["vegetarian", "gluten_free"]},
+        headers=auth_headers
+    )
+    assert [p["name"] for p in response.json()] == [sample_products[0].name]
+    assert response.json()[0]["dietary_restrictions"] == ["vegetarian", "gluten_free"]
+    
+    response = client.get("/api/products/", params={"dietary_restrictions": ["paleo"]})
+    assert response.status_code == 400
+
+
+@pytest.mark.integration
+def test_get_product_substitutes_with_dietary_restrictions(client, sample_products, auth_headers, db):
+    """Test que los sustitutos respetan las restricciones alimentarias pedidas"""
+    from app.algorithms.dietary import dietary_mask
+    from app.models.models import Product
+    
+    original = sample_products[0]
+    db.add(Product(name="Más sostenible", category=original.category, price=original.price,
+                   eco_score=original.eco_score + 20))
+    db.add(Product(name="Vegana", category=original.category, price=original.price,
+                   eco_score=original.eco_score + 10, dietary_flags=dietary_mask(["vegan"])))
+    db.commit()
+    
+    response = client.get(f"/api/products/{original.id}/substitutes", headers=auth_headers)
+    assert [p["name"] for p in response.json()] == ["Más sostenible", "Vegana"]
+    
+    response = client.get(
+        f"/api/products/{original.id}/substitutes",
+        params={"dietary_restrictions": ["vegan"]},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert [p["name"] for p in response.json()] == ["Vegana"]
+
+
 @pytest.mark.integration
 def test_get_categories(client, sample_products, auth_headers):
     """Test para obtener todas las categorías"""
@@ -158,6 +261,33 @@ def test_create_product(client, auth_headers):
     assert "id" in data
 
 
+@pytest.mark.integration
+def test_create_product_with_dietary_restrictions(client, auth_headers):
+    """Test que al crear un producto se guardan sus restricciones alimentarias"""
+    new_product = {
+        "name": "Leche de Avena",
+        "category": "Bebidas Vegetales",
+        "price": 2200.0,
+        "dietary_restrictions": ["vegan"]
+    }
+    
+    response = client.post(
+        "/api/products/",
+        json=new_product,
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    assert response.json()["dietary_restrictions"] == ["vegetarian", "vegan"]
+    
+    response = client.post(
+        "/api/products/",
+        json={**new_product, "dietary_restrictions": ["paleo"]},
+        headers=auth_headers
+    )
+    assert response.status_code == 400
+
+
 @pytest.mark.integration
 def test_get_products_unauthorized(client, sample_products):
     """Test que verifica que la lista de productos es pública (no requiere autenticación)"""
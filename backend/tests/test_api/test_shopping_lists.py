@@ -164,6 +164,530 @@ def test_optimize_shopping_list(client, sample_shopping_list, auth_headers):
     assert data["total_cost"] <= 10000.0  # Budget de sample_shopping_list
 
 
+@pytest.mark.integration
+def test_optimize_keeps_list_when_every_product_is_required(client, sample_shopping_list, auth_headers):
+    """Test que si todo el catálogo ya está en la lista la optimización la conserva"""
+    list_id = sample_shopping_list.id
+    
+    for _ in range(2):
+        response = client.post(f"/api/shopping-lists/{list_id}/optimize?mode=exact", headers=auth_headers)
+        assert response.status_code == 200
+        
+        items = client.get(f"/api/shopping-lists/{list_id}", headers=auth_headers).json()["items"]
+        assert len(items) == 3
+
+
+@pytest.mark.integration
+def test_optimize_shopping_list_exact_mode(client, sample_shopping_list, auth_headers):
+    """Test para optimizar lista con el modo exacto (programación dinámica)"""
+    list_id = sample_shopping_list.id
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?mode=exact",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert "optimization_details" in data
+    assert data["total_cost"] <= 10000.0
+
+
+@pytest.mark.integration
+def test_optimize_shopping_list_branch_and_bound(client, sample_shopping_list, auth_headers):
+    """Test para optimizar lista con branch-and-bound y límite de tiempo"""
+    list_id = sample_shopping_list.id
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?mode=branch_and_bound&deadline_ms=200",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_cost"] <= 10000.0
+    assert "optimality_gap" in data["optimization_details"]
+
+
+@pytest.mark.integration
+def test_optimize_shopping_list_fptas(client, sample_shopping_list, auth_headers, db):
+    """Test para optimizar lista con la aproximación fptas"""
+    from app.models.models import Product
+    
+    db.add(Product(name="Arroz granel", category="Granos", price=500.0, eco_score=90.0, protein=7.0, calories=350.0, fat=1.0))
+    db.commit()
+    list_id = sample_shopping_list.id
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?mode=fptas&epsilon=0.05",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_cost"] <= 10000.0
+    assert data["optimization_details"]["optimality_gap"] <= 0.05
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?mode=fptas&epsilon=1.5",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 400
+
+
+@pytest.mark.integration
+def test_optimize_shopping_list_pruning(client, sample_shopping_list, auth_headers, db):
+    """Test que el optimizador informa los candidatos podados por dominancia"""
+    from app.models.models import Product
+    
+    db.add(Product(name="Arroz granel", category="Granos", price=500.0, eco_score=90.0, protein=7.0, calories=350.0, fat=1.0))
+    db.add(Product(name="Arroz caro", category="Granos", price=9800.0, eco_score=60.0, protein=7.0, calories=350.0, fat=1.0))
+    db.commit()
+    list_id = sample_shopping_list.id
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?mode=exact&prune=true",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    assert response.json()["optimization_details"]["pruned"] >= 1
+    
+    # Sin pedirla no hay poda
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?mode=exact",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    assert response.json()["optimization_details"]["pruned"] == 0
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?mode=exact&max_candidates=0",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 400
+
+
+@pytest.mark.integration
+def test_optimize_shopping_list_local_search(client, sample_shopping_list, auth_headers, db):
+    """Test de la búsqueda local posterior a la optimización"""
+    from app.models.models import Product
+    
+    db.add(Product(name="Arroz granel", category="Granos", price=500.0, eco_score=90.0, protein=7.0, calories=350.0, fat=1.0))
+    db.commit()
+    list_id = sample_shopping_list.id
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?local_search_ms=100",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_cost"] <= 10000.0
+    assert data["optimization_details"]["local_search_moves"] >= 0
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?local_search_ms=60000",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 400
+
+
+@pytest.mark.integration
+def test_optimize_shopping_list_sharded(client, sample_shopping_list, sample_products, auth_headers, db):
+    """Test del modo sharded: las fronteras de categorías sin cambios se reutilizan"""
+    from app.models.models import Product, ShoppingList, ShoppingListItem
+    
+    fruta = Product(name="Manzana", category="Frutas", price=900.0, eco_score=85.0, protein=0.5, calories=52.0, fat=0.2)
+    db.add(Product(name="Arroz granel", category="Granos", price=500.0, eco_score=90.0, protein=7.0, calories=350.0, fat=1.0))
+    db.add(fruta)
+    db.commit()
+    list_id = sample_shopping_list.id
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?mode=sharded",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    details = response.json()["optimization_details"]
+    assert details["shards"] >= 2
+    assert details["cached_shards"] == 0
+    
+    # Cambiar un producto invalida la caché de resultados pero solo la frontera de su categoría.
+    # Otra lista igual a la original (la primera ya quedó optimizada)
+    fruta.price = 950.0
+    copy = ShoppingList(name="Lista Copia", budget=10000.0, owner_id=sample_shopping_list.owner_id)
+    db.add(copy)
+    db.commit()
+    for product in sample_products:
+        db.add(ShoppingListItem(shopping_list_id=copy.id, product_id=product.id, quantity=2))
+    db.commit()
+    
+    response = client.post(
+        f"/api/shopping-lists/{copy.id}/optimize?mode=sharded",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    details = response.json()["optimization_details"]
+    assert details["cached_shards"] == details["shards"] - 1
+
+
+@pytest.mark.integration
+def test_optimize_shopping_list_dietary_restrictions(client, sample_shopping_list, auth_headers, db):
+    """Test que el optimizador solo agrega productos que cumplen las restricciones"""
+    from app.algorithms.dietary import dietary_mask
+    from app.models.models import Product, ShoppingListItem
+    
+    arroz = Product(name="Arroz granel", category="Granos", price=500.0, eco_score=90.0,
+                    protein=7.0, calories=350.0, fat=1.0, dietary_flags=dietary_mask(["vegan"]))
+    jamon = Product(name="Jamón", category="Fiambres", price=600.0, eco_score=95.0,
+                    protein=20.0, calories=150.0, fat=4.0)
+    db.add_all([arroz, jamon])
+    db.commit()
+    list_id = sample_shopping_list.id
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?mode=exact&dietary_restrictions=vegan",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    product_ids = {
+        item.product_id for item in
+        db.query(ShoppingListItem).filter(ShoppingListItem.shopping_list_id == list_id)
+    }
+    assert arroz.id in product_ids
+    assert jamon.id not in product_ids
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?dietary_restrictions=paleo",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 400
+
+
+@pytest.mark.integration
+def test_shopping_list_feasibility(client, sample_shopping_list, auth_headers, db):
+    """Test de la consulta rápida de factibilidad y gasto máximo"""
+    from app.models.models import Product
+    
+    db.add(Product(name="Arroz granel", category="Granos", price=500.0, eco_score=90.0, protein=7.0, calories=350.0, fat=1.0))
+    db.commit()
+    list_id = sample_shopping_list.id
+    
+    response = client.get(f"/api/shopping-lists/{list_id}/feasibility", headers=auth_headers)
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["feasible"] is True
+    assert data["required_cost"] == 4670
+    # Segunda unidad de cada requerido (la lista tiene 2 de cada uno) más el arroz
+    assert data["max_spend"] == 9840
+
+
+@pytest.mark.integration
+def test_optimize_shopping_list_rejects_infeasible(client, sample_shopping_list, auth_headers, db):
+    """Test que /optimize rechaza sin optimizar si los requeridos no caben en el presupuesto"""
+    sample_shopping_list.budget = 3000.0
+    db.commit()
+    list_id = sample_shopping_list.id
+    
+    response = client.post(f"/api/shopping-lists/{list_id}/optimize", headers=auth_headers)
+    
+    assert response.status_code == 400
+    assert "4670" in response.json()["detail"]
+    
+    response = client.get(f"/api/shopping-lists/{list_id}/feasibility", headers=auth_headers)
+    assert response.json()["feasible"] is False
+
+
+@pytest.mark.integration
+def test_optimize_shopping_list_bounded_quantities(client, sample_shopping_list, auth_headers, db):
+    """Test que el optimizador elige cantidades y las guarda en los items"""
+    from app.models.models import Product, ShoppingListItem
+    
+    db.add(Product(name="Arroz granel", category="Granos", price=500.0, eco_score=90.0, protein=7.0, calories=350.0, fat=1.0))
+    db.commit()
+    list_id = sample_shopping_list.id
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?mode=exact&max_quantity=3",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    quantities = response.json()["optimization_details"]["quantities"]
+    assert all(1 <= q <= 3 for q in quantities.values())
+    
+    items = db.query(ShoppingListItem).filter(ShoppingListItem.shopping_list_id == list_id).all()
+    assert {str(item.product_id): item.quantity for item in items} == quantities
+
+
+@pytest.mark.integration
+def test_optimize_shopping_list_multiple_choice(client, sample_shopping_list, auth_headers):
+    """Test para optimizar lista con a lo más un producto por categoría"""
+    list_id = sample_shopping_list.id
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?mode=multiple_choice&category_limit=1",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    products = response.json()["optimization_details"]["products"]
+    categories = [p["category"] for p in products if p["category"]]
+    assert len(categories) == len(set(categories))
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?mode=multiple_choice&max_quantity=2",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 400
+
+
+@pytest.mark.integration
+def test_optimize_shopping_list_category_limits(client, sample_shopping_list, auth_headers, db):
+    """Test de cupos por categoría en multiple_choice (validados y parte de la caché)"""
+    from app.models.models import Product
+    
+    db.add_all([
+        Product(name="Yogurt", category="Lácteos", price=990.0, eco_score=88.0, protein=4.0, calories=90.0, fat=2.0),
+        Product(name="Queso", category="Lácteos", price=990.0, eco_score=85.0, protein=8.0, calories=110.0, fat=6.0),
+    ])
+    db.commit()
+    list_id = sample_shopping_list.id
+    url = f"/api/shopping-lists/{list_id}/optimize?mode=multiple_choice"
+    
+    def dairy(response):
+        assert response.status_code == 200
+        products = response.json()["optimization_details"]["products"]
+        return sorted(p["name"] for p in products if p["category"] == "Lácteos")
+    
+    # Con el cupo por defecto la leche de la lista ocupa el único lugar
+    assert dairy(client.post(url, headers=auth_headers)) == ["Leche Colun Entera"]
+    assert dairy(client.post(f"{url}&category_limits=Lácteos:3", headers=auth_headers)) == [
+        "Leche Colun Entera", "Queso", "Yogurt"
+    ]
+    
+    for query in ("category_limits=Lácteos", "category_limits=Lácteos:-1", "category_limits=:2"):
+        response = client.post(f"{url}&{query}", headers=auth_headers)
+        assert response.status_code == 400
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?mode=exact&category_limits=Lácteos:3",
+        headers=auth_headers
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.integration
+def test_optimize_shopping_list_cached(client, sample_shopping_list, auth_headers, db):
+    """Test que repetir la optimización reutiliza el resultado en caché"""
+    from app.models.models import Product
+    
+    list_id = sample_shopping_list.id
+    url = f"/api/shopping-lists/{list_id}/optimize?mode=exact"
+    
+    def items():
+        response = client.get(f"/api/shopping-lists/{list_id}", headers=auth_headers)
+        return sorted((item["product"]["id"], item["quantity"]) for item in response.json()["items"])
+    
+    # Repetir la optimización (que reescribió los items) usa la caché y deja la lista igual
+    first = client.post(url, headers=auth_headers).json()
+    optimized = items()
+    stats = client.get("/api/shopping-lists/optimize/cache", headers=auth_headers).json()
+    second = client.post(url, headers=auth_headers).json()
+    after = client.get("/api/shopping-lists/optimize/cache", headers=auth_headers).json()
+    
+    assert second == first
+    assert items() == optimized
+    assert after["hits"] == stats["hits"] + 1
+    
+    # Un cambio del usuario en los items no reutiliza el resultado
+    item_id = client.get(f"/api/shopping-lists/{list_id}", headers=auth_headers).json()["items"][0]["id"]
+    client.patch(f"/api/shopping-lists/{list_id}/items/{item_id}", json={"quantity": 2}, headers=auth_headers)
+    client.post(url, headers=auth_headers)
+    edited = client.get("/api/shopping-lists/optimize/cache", headers=auth_headers).json()
+    assert edited["misses"] == after["misses"] + 1
+    after = edited
+    
+    # Un cambio en el catálogo invalida la caché
+    db.add(Product(name="Extra", category="Frutas", price=990.0, eco_score=88.0, protein=1.0, calories=52.0, fat=0.2))
+    db.commit()
+    client.post(url, headers=auth_headers)
+    invalidated = client.get("/api/shopping-lists/optimize/cache", headers=auth_headers).json()
+    
+    assert invalidated["catalog_version"] > after["catalog_version"]
+    assert invalidated["misses"] == after["misses"] + 1
+
+
+@pytest.mark.integration
+def test_optimize_shopping_list_warm_start(client, sample_shopping_list, auth_headers, db):
+    """Test que tras cambiar el presupuesto se reoptimiza desde el estado anterior"""
+    from app.models.models import Product
+    from app.services.optimization_cache import solver_states
+    
+    db.add(Product(name="Extra", category="Frutas", price=990.0, eco_score=88.0, protein=1.0, calories=52.0, fat=0.2))
+    db.add(Product(name="Caro", category="Carnes", price=50000.0, eco_score=95.0, protein=25.0, calories=250.0, fat=10.0))
+    db.commit()
+    list_id = sample_shopping_list.id
+    
+    # Sin warm_start no se guarda estado
+    client.post(f"/api/shopping-lists/{list_id}/optimize", headers=auth_headers)
+    assert solver_states.stats()["entries"] == 0
+    
+    first = client.post(f"/api/shopping-lists/{list_id}/optimize?warm_start=true", headers=auth_headers)
+    assert first.json()["optimization_details"]["warm_start"] is False
+    assert solver_states.stats()["entries"] == 1
+    
+    client.patch(f"/api/shopping-lists/{list_id}", json={"budget": 9000.0}, headers=auth_headers)
+    second = client.post(f"/api/shopping-lists/{list_id}/optimize?warm_start=true", headers=auth_headers)
+    
+    assert second.status_code == 200
+    assert second.json()["optimization_details"]["warm_start"] is True
+    assert second.json()["total_cost"] <= 9000.0
+
+
+@pytest.mark.integration
+def test_optimize_shopping_list_sweep(client, sample_shopping_list, auth_headers, db):
+    """Test del barrido de presupuestos: una lista óptima por presupuesto sin modificar la lista"""
+    from app.models.models import Product
+    
+    db.add(Product(name="Extra", category="Frutas", price=990.0, eco_score=88.0, protein=1.0, calories=52.0, fat=0.2))
+    db.commit()
+    list_id = sample_shopping_list.id
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize/sweep",
+        json={"budgets": [5000.0, 10000.0, 2000.0]},
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_budgets"] == 3
+    for result in data["results"]:
+        assert result["total_cost"] <= result["budget"] or result["selected_items"] == 3
+        assert "optimization_details" in result
+    
+    # La lista no cambia
+    detail = client.get(f"/api/shopping-lists/{list_id}", headers=auth_headers).json()
+    assert len(detail["items"]) == 3
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize/sweep",
+        json={"budgets": []},
+        headers=auth_headers
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.integration
+def test_optimize_shopping_lists_batch(client, sample_shopping_list, auth_headers, db, test_user, sample_products):
+    """Test de optimización en lote: escribe los resultados de todas las listas"""
+    from app.models.models import Product, ShoppingList, ShoppingListItem
+    
+    db.add(Product(name="Extra", category="Frutas", price=990.0, eco_score=88.0, protein=1.0, calories=52.0, fat=0.2))
+    second_list = ShoppingList(name="Lista 2", budget=3000.0, owner_id=test_user.id)
+    no_budget = ShoppingList(name="Sin presupuesto", owner_id=test_user.id)
+    over_budget = ShoppingList(name="Excedida", budget=1000.0, owner_id=test_user.id)
+    db.add_all([second_list, no_budget, over_budget])
+    db.commit()
+    db.add(ShoppingListItem(shopping_list_id=over_budget.id, product_id=sample_products[0].id, quantity=1))
+    db.commit()
+    
+    response = client.post(
+        "/api/shopping-lists/optimize/batch",
+        json={
+            "list_ids": [sample_shopping_list.id, second_list.id, no_budget.id, over_budget.id, 9999],
+            "mode": "exact"
+        },
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["optimized"] == 2
+    assert {s["list_id"] for s in data["skipped"]} == {no_budget.id, over_budget.id, 9999}
+    
+    # La lista cuyos requeridos no caben no se reescribe
+    db.refresh(over_budget)
+    assert not over_budget.is_optimized
+    items = db.query(ShoppingListItem).filter(ShoppingListItem.shopping_list_id == over_budget.id).all()
+    assert [item.product_id for item in items] == [sample_products[0].id]
+    assert data["lists_per_second"] > 0
+    
+    for result in data["results"]:
+        items = db.query(ShoppingListItem).filter(ShoppingListItem.shopping_list_id == result["list_id"]).all()
+        assert len(items) == result["selected_items"]
+        shopping_list = db.query(ShoppingList).filter(ShoppingList.id == result["list_id"]).first()
+        db.refresh(shopping_list)
+        assert shopping_list.is_optimized
+        assert shopping_list.total_cost == result["total_cost"]
+
+
+@pytest.mark.integration
+def test_optimize_shopping_list_invalid_mode(client, sample_shopping_list, auth_headers):
+    """Test que rechaza modos de optimización desconocidos"""
+    list_id = sample_shopping_list.id
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?mode=magic",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 400
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize?mode=branch_and_bound&deadline_ms=0",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 400
+
+
+@pytest.mark.integration
+def test_optimize_shopping_list_pareto(client, sample_shopping_list, auth_headers, db):
+    """Test para obtener el frente de Pareto sin modificar la lista"""
+    from app.models.models import Product
+    
+    db.add(Product(name="Extra", category="Frutas", price=990.0, eco_score=88.0, protein=1.0, calories=52.0, fat=0.2))
+    db.commit()
+    list_id = sample_shopping_list.id
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/optimize/pareto",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_solutions"] == len(data["solutions"]) >= 1
+    for solution in data["solutions"]:
+        assert solution["metrics"]["total_cost"] <= 10000.0
+        assert "total_nutrition" in solution["metrics"]
+    
+    # La lista no se modifica
+    response = client.get(f"/api/shopping-lists/{list_id}", headers=auth_headers)
+    assert len(response.json()["items"]) == 3
+    
+    # Con seed el frente es reproducible
+    first, second = (
+        client.post(f"/api/shopping-lists/{list_id}/optimize/pareto?seed=3", headers=auth_headers).json()
+        for _ in range(2)
+    )
+    assert first["solutions"] == second["solutions"]
+
+
 @pytest.mark.integration
 def test_substitute_products(client, sample_shopping_list, auth_headers):
     """Test para buscar sustituciones"""
@@ -180,6 +704,31 @@ def test_substitute_products(client, sample_shopping_list, auth_headers):
     assert isinstance(data["substitutions"], list)
 
 
+@pytest.mark.integration
+def test_substitute_products_within_budget(client, sample_shopping_list, auth_headers, db, sample_products):
+    """Test de la sustitución conjunta de la lista dentro del presupuesto"""
+    from app.models.models import Product
+    
+    original = sample_products[0]
+    db.add(Product(
+        name="Alternativa", category=original.category, price=original.price,
+        eco_score=original.eco_score + 5, protein=1.0, calories=100.0, fat=1.0
+    ))
+    db.commit()
+    list_id = sample_shopping_list.id
+    
+    response = client.post(
+        f"/api/shopping-lists/{list_id}/substitute?within_budget=true",
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert [s["substitute"]["name"] for s in data["substitutions"]] == ["Alternativa"]
+    assert data["total_cost"] <= sample_shopping_list.budget
+    assert data["truncated_categories"] == []
+
+
 @pytest.mark.integration
 def test_delete_shopping_list(client, sample_shopping_list, auth_headers):
     """Test para eliminar lista"""
@@ -239,3 +788,18 @@ def test_cannot_access_other_user_list(client, sample_shopping_list, db):
     
     # La API devuelve 404 para no revelar que la lista existe (mejor seguridad)
     assert response.status_code == 404
+
+
+@pytest.mark.integration
+def test_shutdown_closes_shared_pools():
+    """Test que al apagar la aplicación se cierran los pools compartidos"""
+    from fastapi.testclient import TestClient
+    from app.algorithms import parallel
+    from app.main import app
+    
+    with TestClient(app):
+        parallel.get_thread_pool()
+        assert parallel._thread_pool is not None
+    
+    assert parallel._thread_pool is None
+    assert parallel._pool is None
@@ -233,3 +233,88 @@ def test_cascade_delete_shopping_list(db, test_user, sample_products):
     # Verificar que items también fueron eliminados
     items = db.query(ShoppingListItem).filter_by(shopping_list_id=list_id).all()
     assert len(items) == 0
+
+
+@pytest.mark.unit
+def test_product_nutrition_score_stored(db):
+    """Test que nutrition_score se calcula al crear y al modificar el producto"""
+    from app.algorithms.catalog import calculate_nutrition_score
+    
+    product = Product(name="Avena", category="Cereales", price=1500.0, protein=13.0, calories=380.0, fat=7.0)
+    db.add(product)
+    db.commit()
+    db.refresh(product)
+    
+    assert product.nutrition_score == pytest.approx(calculate_nutrition_score(13.0, 380.0, 7.0))
+    
+    product.protein = 20.0
+    db.commit()
+    db.refresh(product)
+    
+    assert product.nutrition_score == pytest.approx(calculate_nutrition_score(20.0, 380.0, 7.0))
+
+
+@pytest.mark.unit
+def test_add_missing_columns(tmp_path):
+    """Test que la migración agrega las columnas nuevas a una tabla existente"""
+    from sqlalchemy import create_engine, inspect, text
+    from app.migrations import add_missing_columns
+    
+    # Tabla products creada antes de nutrition_score y dietary_flags
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE products (id INTEGER PRIMARY KEY, name VARCHAR)"))
+        connection.execute(text("INSERT INTO products (id, name) VALUES (1, 'Leche')"))
+    
+    assert add_missing_columns(engine) == ["products.nutrition_score", "products.dietary_flags"]
+    assert add_missing_columns(engine) == []
+    
+    columns = {column["name"] for column in inspect(engine).get_columns("products")}
+    assert {"nutrition_score", "dietary_flags"} <= columns
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT dietary_flags FROM products")).scalar() == 0
+    engine.dispose()
+
+
+@pytest.mark.unit
+def test_backfill_nutrition_scores(db, sample_products):
+    """Test que el backfill completa nutrition_score de filas existentes"""
+    from app.algorithms.catalog import calculate_nutrition_score
+    from app.backfill_nutrition_scores import backfill_nutrition_scores
+    
+    # Simular filas creadas antes de la columna
+    db.query(Product).update({Product.nutrition_score: None})
+    db.commit()
+    
+    updated = backfill_nutrition_scores(db, batch_size=2)
+    
+    assert updated == len(sample_products)
+    for product in db.query(Product).all():
+        db.refresh(product)
+        assert product.nutrition_score == pytest.approx(
+            calculate_nutrition_score(product.protein, product.calories, product.fat)
+        )
+
+
+@pytest.mark.unit
+def test_backfill_dietary_flags(db, sample_products):
+    """Test que el backfill copia las restricciones del JSON por código de barras"""
+    from app.algorithms.dietary import GLUTEN_FREE, VEGAN, VEGETARIAN
+    from app.backfill_dietary_flags import backfill_dietary_flags
+    
+    products_data = [
+        {"barcode": sample_products[0].barcode, "dietary_restrictions": ["vegetarian", "gluten_free"]},
+        {"barcode": sample_products[1].barcode, "dietary_restrictions": ["vegan"]},
+        {"barcode": "0000000000000", "dietary_restrictions": ["vegan"]},
+    ]
+    
+    updated = backfill_dietary_flags(db, products_data, batch_size=1)
+    
+    assert updated == 2
+    db.refresh(sample_products[0])
+    db.refresh(sample_products[1])
+    db.refresh(sample_products[2])
+    assert sample_products[0].dietary_flags == VEGETARIAN | GLUTEN_FREE
+    assert sample_products[1].dietary_flags == VEGAN | VEGETARIAN
+    assert sample_products[1].dietary_restrictions == ["vegetarian", "vegan"]
+    assert sample_products[2].dietary_flags == 0
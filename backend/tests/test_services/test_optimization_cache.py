@@ -0,0 +1,106 @@
+"""
+Tests para la caché de resultados de optimización
+"""
+import pytest
+from app.models.models import Product
+from app.services.optimization_cache import OptimizationCache, optimization_cache
+
+
+@pytest.mark.unit
+def test_cache_lru_eviction():
+    """Test que al superar el tamaño se descarta la entrada menos usada"""
+    cache = OptimizationCache(max_entries=2, ttl_seconds=60)
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.mark.unit
+def test_cache_byte_limit():
+    """Test que con max_bytes se descartan las entradas más antiguas por memoria"""
+    import numpy as np
+
+    cache = OptimizationCache(max_entries=10, ttl_seconds=60, max_bytes=1000)
+
+    cache.put("a", np.zeros(50))
+    cache.put("b", np.zeros(50))
+    assert cache.stats()["bytes"] == 800
+    cache.put("c", np.zeros(50))
+
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.stats()["bytes"] == 800
+
+    # Un valor más grande que el límite no se guarda
+    cache.put("d", np.zeros(200))
+    assert cache.get("d") is None
+    assert cache.stats()["entries"] == 2
+
+
+@pytest.mark.unit
+def test_cache_ttl_expiration():
+    """Test que las entradas vencidas no se retornan"""
+    cache = OptimizationCache(max_entries=10, ttl_seconds=0)
+
+    cache.put("a", 1)
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.unit
+def test_cache_key_includes_catalog_version():
+    """Test que la clave cambia con la versión de los items, las opciones y el catálogo"""
+    cache = OptimizationCache()
+    weights = (0.5, 0.3, 0.2)
+
+    key = cache.key(1, 0, 10000, weights, mode="exact")
+    assert key == cache.key(1, 0, 10000, weights, mode="exact")
+    assert key != cache.key(1, 1, 10000, weights, mode="exact")
+    assert key != cache.key(2, 0, 10000, weights, mode="exact")
+    assert key != cache.key(1, 0, 10000, weights, mode="genetic")
+
+    cache.invalidate()
+    assert key != cache.key(1, 0, 10000, weights, mode="exact")
+
+
+@pytest.mark.unit
+def test_cache_discard_list():
+    """Test que al eliminar una lista se descartan solo sus resultados"""
+    cache = OptimizationCache()
+    weights = (0.5, 0.3, 0.2)
+    cache.put(cache.key(1, 0, 10000, weights), "lista 1")
+    cache.put(cache.key(2, 0, 10000, weights), "lista 2")
+
+    cache.discard_list(1)
+
+    assert cache.get(cache.key(1, 0, 10000, weights)) is None
+    assert cache.get(cache.key(2, 0, 10000, weights)) == "lista 2"
+
+
+@pytest.mark.unit
+def test_cache_invalidated_by_product_writes(db):
+    """Test que las escrituras sobre products invalidan la caché al hacer commit"""
+    optimization_cache.put("resultado", {"products": []})
+    version = optimization_cache.catalog_version
+
+    product = Product(name="Nuevo", category="Frutas", price=990.0, eco_score=80.0)
+    db.add(product)
+    db.flush()
+    assert optimization_cache.catalog_version == version
+
+    db.commit()
+    assert optimization_cache.catalog_version == version + 1
+    assert optimization_cache.get("resultado") is None
+
+    db.query(Product).filter(Product.id == product.id).update({"price": 890.0})
+    db.commit()
+    assert optimization_cache.catalog_version == version + 2
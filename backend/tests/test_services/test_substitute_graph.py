@@ -0,0 +1,113 @@
+"""
+Tests para el grafo de sustitutos precalculado (product_substitutes)
+"""
+import pytest
+from app.algorithms.substitution import find_product_substitutes
+from app.api.products import product_to_dict
+from app.models.models import Product, ProductSubstitute, User
+from app.services import substitute_graph
+
+
+def make_product(name, category, price, eco_score):
+    return Product(name=name, category=category, price=price, eco_score=eco_score,
+                   protein=1.0, calories=100.0, fat=1.0)
+
+
+def stored(db):
+    rows = db.query(ProductSubstitute).order_by(ProductSubstitute.product_id, ProductSubstitute.rank)
+    graph = {}
+    for row in rows:
+        graph.setdefault(row.product_id, []).append(row.substitute_id)
+    return graph
+
+
+def expected(db):
+    products = [product_to_dict(p) for p in db.query(Product).all()]
+    graph = {}
+    for product in products:
+        substitutes = find_product_substitutes(product, products, max_results=substitute_graph.SUBSTITUTE_GRAPH_SIZE)
+        if substitutes:
+            graph[product["id"]] = [s["id"] for s in substitutes]
+    return graph
+
+
+@pytest.mark.integration
+def test_graph_matches_on_the_fly_substitutes(db):
+    """Test que la tabla coincide con calcular los sustitutos al vuelo"""
+    for i in range(8):
+        db.add(make_product(f"Leche {i}", "Lácteos", 1000 + 100 * i, 40 + 7 * i))
+        db.add(make_product(f"Pan {i}", "Panadería", 800 + 50 * i, 90 - 6 * i))
+    db.add(make_product("Sin categoría", None, 500, 10))
+    db.commit()
+
+    graph = stored(db)
+
+    assert graph == expected(db)
+    assert all(len(ids) <= substitute_graph.SUBSTITUTE_GRAPH_SIZE for ids in graph.values())
+
+
+@pytest.mark.integration
+def test_graph_refreshes_only_affected_categories(db, monkeypatch):
+    """Test que al escribir un producto solo se recalculan sus categorías"""
+    leche = make_product("Leche", "Lácteos", 1000, 40)
+    db.add_all([leche, make_product("Pan", "Panadería", 900, 50)])
+    db.commit()
+
+    refreshed = []
+    original_refresh = substitute_graph.refresh_product_substitutes
+
+    def spy(session, categories=None):
+        refreshed.append(categories)
+        return original_refresh(session, categories)
+
+    monkeypatch.setattr(substitute_graph, "refresh_product_substitutes", spy)
+
+    db.add(make_product("Leche Eco", "Lácteos", 1100, 80))
+    db.commit()
+    assert refreshed == [{"Lácteos"}]
+
+    # Al cambiar de categoría se recalculan la anterior y la nueva
+    leche.category = "Panadería"
+    db.commit()
+    assert refreshed[-1] == {"Lácteos", "Panadería"}
+    assert stored(db) == expected(db)
+
+
+@pytest.mark.integration
+def test_graph_drops_deleted_products(db):
+    """Test que un producto eliminado deja de aparecer como sustituto"""
+    leche = make_product("Leche", "Lácteos", 1000, 40)
+    leche_eco = make_product("Leche Eco", "Lácteos", 1100, 80)
+    db.add_all([leche, leche_eco])
+    db.commit()
+    assert stored(db) == {leche.id: [leche_eco.id]}
+
+    db.delete(leche_eco)
+    db.commit()
+
+    assert stored(db) == {}
+
+
+@pytest.mark.integration
+def test_ensure_builds_missing_graph(db):
+    """Test que una tabla vacía (base anterior a la tabla) se completa"""
+    db.add_all([make_product("Leche", "Lácteos", 1000, 40), make_product("Leche Eco", "Lácteos", 1100, 80)])
+    db.commit()
+    db.query(ProductSubstitute).delete()
+    db.commit()
+
+    assert substitute_graph.ensure_product_substitutes(db) == 1
+    assert substitute_graph.ensure_product_substitutes(db) == 0
+    assert stored(db) == expected(db)
+
+
+@pytest.mark.integration
+def test_commit_without_products_is_not_flushed_early(db):
+    """Test que el listener no escribe por adelantado sesiones sin productos"""
+    db.add(User(email="otro@test.com", username="otro", hashed_password="x"))
+    substitute_graph._refresh_on_commit(db)
+    assert len(db.new) == 1
+
+    db.add(make_product("Leche", "Lácteos", 1000, 40))
+    substitute_graph._refresh_on_commit(db)
+    assert len(db.new) == 0